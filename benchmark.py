@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+"""End-to-end benchmark of matching and uploading against local stand-ins
+
+A local HTTP server stands in for WDQS and the MediaWiki API and can inject
+latency and errors. The lexemes and the SO word list are synthetic and their
+size is adjustable. The stages are the same as in lexso upload:
+
+    fetch      sharded WDQS query for the lexemes without an SO identifier
+    load       load_dictionary_into_memory
+    match      plan_edits
+    upload     prefetch with wbgetentities and one write per edit
+
+WikibaseIntegrator is used for the writes if it is installed, otherwise the
+same requests are sent with httpx. With --max-rows the stand-in answers a
+query of a range with more lexemes like WDQS answers a query that times out."""
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Tuple
+from urllib.parse import parse_qs, urlparse
+
+import config
+
+categories = [("Q1084", "subst."), ("Q24905", "verb"), ("Q34698", "adj."), ("Q380057", "adv.")]
+syllables = ["ba", "de", "fi", "go", "ku", "la", "me", "ni", "po", "ru", "sa", "te", "vi", "å", "ä", "ö"]
+
+
+def synthetic_data(lexemes: int, seed: int = 1) -> Tuple[List[Dict], List[List[str]]]:
+    """Lexemes as WDQS bindings and rows of the SO word list.
+    About 70% of the lemmas are in SO with the same category, 10% with another
+    category, 5% are homographs and the rest are missing"""
+    generator = random.Random(seed)
+    bindings = []
+    rows = []
+    lemmas = set()
+    so_id = 100000
+    while len(bindings) < lexemes:
+        lemma = "".join(generator.choice(syllables) for _ in range(generator.randint(2, 5)))
+        if lemma in lemmas:
+            continue
+        lemmas.add(lemma)
+        qid, category = generator.choice(categories)
+        number = len(bindings) + 1
+        bindings.append({
+            "lexemeId": {"type": "uri", "value": f"{config.wd_prefix}L{number}"},
+            "lemma": {"type": "literal", "value": lemma},
+            "category": {"type": "uri", "value": f"{config.wd_prefix}{qid}"},
+        })
+        draw = generator.random()
+        if draw < 0.85:
+            if draw < 0.70:
+                so_category = category
+            elif draw < 0.80:
+                so_category = next(other for _, other in categories if other != category)
+            else:
+                so_category = category
+                so_id += 1
+                rows.append([str(so_id), lemma, so_category, lemma])
+            so_id += 1
+            rows.append([str(so_id), lemma, so_category, lemma])
+    return bindings, rows
+
+
+class StandIn(ThreadingHTTPServer):
+    """WDQS and the MediaWiki API on localhost"""
+    daemon_threads = True
+
+    def __init__(self, bindings: List[Dict], latency: float = 0.0, error_rate: float = 0.0, seed: int = 1,
+                 max_rows: int = 0):
+        super().__init__(("127.0.0.1", 0), StandInHandler)
+        self.bindings = bindings
+        self.numbers = [int(binding["lexemeId"]["value"].rsplit("/L", 1)[1]) for binding in bindings]
+        self.max_rows = max_rows
+        self.latency = latency
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests: Dict[str, int] = {}
+        self.errors = 0
+        self.edits = 0
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def fail(self) -> bool:
+        with self.lock:
+            failed = self.random.random() < self.error_rate
+            self.errors += failed
+            return failed
+
+    def count(self, name: str):
+        with self.lock:
+            self.requests[name] = self.requests.get(name, 0) + 1
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+        self.server_close()
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    server: StandIn
+
+    def log_message(self, *args):
+        pass
+
+    def __params(self) -> Dict[str, str]:
+        params = parse_qs(urlparse(self.path).query)
+        if self.command == "POST":
+            length = int(self.headers.get("Content-Length", 0))
+            params.update(parse_qs(self.rfile.read(length).decode("utf-8")))
+        return {key: values[0] for key, values in params.items()}
+
+    def __reply(self, status: int, body: Dict):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def __handle(self):
+        params = self.__params()
+        time.sleep(self.server.latency)
+        if self.server.fail():
+            return self.__reply(503, {"error": "injected"})
+        if urlparse(self.path).path == "/sparql":
+            self.server.count("sparql")
+            query = params.get("query", "")
+            limit = int(re.search(r"limit (\d+)", query).group(1)) if "limit" in query else len(self.server.bindings)
+            offset = int(re.search(r"offset (\d+)", query).group(1)) if "offset" in query else 0
+            bindings = self.server.bindings
+            if "MAX(" in query:
+                # the highest L-id read by modules/sharded_query.py
+                return self.__reply(200, {"head": {"vars": ["highest"]}, "results": {"bindings": [
+                    {"highest": {"type": "literal", "value": str(max(self.server.numbers, default=0))}}]}})
+            shard = re.search(r">= (\d+)(?: && .* < (\d+))?\)", query)
+            if shard:
+                # the range filter of modules/sharded_query.py, the last range has no upper bound
+                low, high = int(shard.group(1)), int(shard.group(2) or 0)
+                bindings = [binding for binding, number in zip(bindings, self.server.numbers)
+                            if low <= number and (not high or number < high)]
+            if self.server.max_rows and len(bindings) > self.server.max_rows:
+                return self.__reply(500, {"error": "java.util.concurrent.TimeoutException"})
+            return self.__reply(200, {"head": {"vars": ["lexemeId", "lemma", "category"]},
+                                      "results": {"bindings": bindings[offset:offset + limit]}})
+        action = params.get("action")
+        self.server.count(action or "")
+        if action == "wbgetentities":
+            return self.__reply(200, {"entities": {
+                id_: {"id": id_, "type": "lexeme", "lastrevid": 1, "claims": {}}
+                for id_ in params["ids"].split("|")}})
+        if action == "query":
+            # tokens and logins of WBI
+            return self.__reply(200, {"query": {"tokens": {"csrftoken": "+\\\\", "logintoken": "+\\\\"}}})
+        if action in ("wbeditentity", "wbsetclaim", "wbcreateclaim"):
+            with self.server.lock:
+                self.server.edits += 1
+            return self.__reply(200, {"success": 1, "entity": {"id": params.get("id", ""), "lastrevid": 2}})
+        return self.__reply(400, {"error": f"unknown action {action}"})
+
+    def do_GET(self):
+        self.__handle()
+
+    def do_POST(self):
+        self.__handle()
+
+
+def wbi_available() -> bool:
+    try:
+        import wikibaseintegrator  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def fetch_lexemes(stand_in: StandIn) -> List:
+    """Fetch the lexemes with LexemeLanguage.fetch_all_lexemes_without_so_id"""
+    from models.wikidata import LexemeLanguage
+    language = LexemeLanguage("sv")
+    language.lexemes = []
+    language.fetch_all_lexemes_without_so_id(endpoint_url=f"{stand_in.url}/sparql", min_width=1, retry_delay=0.05)
+    return language.lexemes
+
+
+class StandInLogin:
+    """Enough of wbi_login.Login for ItemEngine.write against the stand-in"""
+    def __init__(self):
+        import requests
+        self.session = requests.Session()
+
+    def get_session(self):
+        return self.session
+
+    def get_edit_token(self):
+        return "+\\"
+
+
+def upload(plan, stand_in: StandIn, use_wbi: bool) -> int:
+    """Upload the value edits of the plan like lexso.apply_plan"""
+    import httpx
+    from models.wikidata import ForeignID, Lexeme
+    from modules.prefetch import EntityPrefetcher, has_claim
+    api_url = f"{stand_in.url}/w/api.php"
+    with httpx.Client(timeout=30) as client:
+        prefetcher = EntityPrefetcher((edit.lexeme_id for edit in plan.edits), api_url=api_url, client=client,
+                                      retries=5, retry_delay=0.05)
+        if use_wbi:
+            from wikibaseintegrator.wbi_config import config as wbi_config
+            wbi_config["MEDIAWIKI_API_URL"] = api_url
+            config.login_instance = StandInLogin()
+        edits = 0
+        for edit in plan.edits:
+            entity = prefetcher.get(edit.lexeme_id)
+            if entity is None or has_claim(entity, config.foreign_id_property):
+                continue
+            if use_wbi:
+                Lexeme(id=edit.lexeme_id, lemma=edit.lemma).upload_foreign_id_to_wikidata(foreign_id=ForeignID(
+                    id=edit.so_id, property=config.foreign_id_property, source_item_id=config.source_item_id
+                ), entity=entity)
+            else:
+                data = json.dumps({"claims": [{"mainsnak": {
+                    "snaktype": "value", "property": config.foreign_id_property,
+                    "datavalue": {"value": edit.so_id, "type": "string"}}, "type": "statement", "rank": "normal"}]})
+                for attempt in range(5):
+                    response = client.post(api_url, data={"action": "wbeditentity", "id": edit.lexeme_id,
+                                                          "data": data, "token": "+\\", "format": "json"})
+                    if response.status_code == 200:
+                        break
+                    time.sleep(0.05 * 2 ** attempt)
+                response.raise_for_status()
+            edits += 1
+    return edits
+
+
+def run(lexemes: int = 10000, latency: float = 0.0, error_rate: float = 0.0, max_edits: int = 1000,
+        seed: int = 1, use_wbi: bool = None, max_rows: int = 0) -> Dict:
+    """Run all stages and return the timings"""
+    import lexso
+    if use_wbi is None:
+        use_wbi = wbi_available()
+    bindings, rows = synthetic_data(lexemes, seed=seed)
+    timings: Dict[str, float] = {}
+    with tempfile.TemporaryDirectory() as directory, StandIn(bindings, latency, error_rate, seed,
+                                                                 max_rows) as stand_in:
+        csv_file = os.path.join(directory, "P9837.csv")
+        with open(csv_file, "w", encoding="UTF-8") as f:
+            f.writelines("\t".join(row) + "\n" for row in rows)
+        start = time.perf_counter()
+        fetched = fetch_lexemes(stand_in)
+        timings["fetch"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        dictionary_data = lexso.load_dictionary_into_memory(csv_file)
+        timings["load"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        plan = lexso.plan_edits(lexemes=fetched, dictionary_data=dictionary_data)
+        timings["match"] = time.perf_counter() - start
+
+        values = plan.filter(actions=["value"])
+        values.edits = values.edits[:max_edits]
+        start = time.perf_counter()
+        edits = upload(values, stand_in, use_wbi)
+        timings["upload"] = time.perf_counter() - start
+        requests = dict(stand_in.requests)
+        errors = stand_in.errors
+    return {
+        "lexemes": len(fetched),
+        "so_rows": len(rows),
+        "planned_values": plan.count("value"),
+        "edits": edits,
+        "wbi": use_wbi,
+        "latency": latency,
+        "error_rate": error_rate,
+        "injected_errors": errors,
+        "requests": requests,
+        "seconds": {stage: round(seconds, 4) for stage, seconds in timings.items()},
+        "lexemes_per_second": round(len(fetched) / (timings["load"] + timings["match"]), 1),
+        "edits_per_second": round(edits / timings["upload"], 1) if timings["upload"] else 0.0,
+    }
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lexemes", type=int, default=10000, help="number of synthetic lexemes")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of responses that fail with 503")
+    parser.add_argument("--max-edits", type=int, default=1000, help="number of planned edits to upload")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--max-rows", type=int, default=0,
+                        help="answer queries with more rows like WDQS answers a query that timed out")
+    parser.add_argument("--min-lexemes-per-second", type=float, default=0.0,
+                        help="exit with an error if matching is slower than this")
+    parser.add_argument("--min-edits-per-second", type=float, default=0.0,
+                        help="exit with an error if uploading is slower than this")
+    args = parser.parse_args(argv)
+    report = run(lexemes=args.lexemes, latency=args.latency, error_rate=args.error_rate,
+                 max_edits=args.max_edits, seed=args.seed, max_rows=args.max_rows)
+    print(json.dumps(report, indent=1))
+    if (report["lexemes_per_second"] < args.min_lexemes_per_second or
+            report["edits_per_second"] < args.min_edits_per_second):
+        print("Slower than the required minimum", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,12 +6,17 @@ username = ""
 password = ""
 
 # Global variables
-count_only = False
 add_no_value = False
 tool_url = "Wikidata:Tools/LexSO"
 user_agent = f"LexSO (WikidataIntegrator/0.11.0) User:So9q " + tool_url
 wd_prefix = "http://www.wikidata.org/entity/"
 foreign_id_property = "P9837"
 source_item_id = "Q108312794"
+mediawiki_api_url = "https://www.wikidata.org/w/api.php"
+sparql_endpoint_url = "https://query.wikidata.org/sparql"
 
 login_instance = None
+
+# Extraction and crawling
+version = 1  # suffix of the JSONL files written by the extractor
+max_ids_to_scrape = 70000
@@ -1,56 +1,164 @@
-# #!/usr/bin/env python3
-#
-# # Code from https://gist.github.com/salgo60/73dc99d71fcdeb75e4d69bd73b71acf9
-# # based on https://github.com/Torbacka/wordlist/blob/master/client.py
-# from datetime import datetime
-# import requests
-# from bs4 import BeautifulSoup
-#
-# data = {
-#     'action': 'myprefix_scrollist',
-#     'unik': '0',
-#     'dir': 'ned',
-#     'dict': 'so'
-# }
-# headers = {
-#     'User-Agent': 'Mozilla/5.0 (X11; Fedora; Linux x86_64; rv:63.0) Gecko/20100101 Firefox/63.0'
-# }
-# date = datetime.today().strftime("%Y-%m-%d")
-# print(date)
-# file = open(f"so_{date}.csv", "a", encoding='UTF-8')
-#
-#
-# def main():
-#     for i in range(1, 20000):
-#         if i % 10 == 0:
-#             print(i)
-#         response = requests.post('https://svenska.se/wp-admin/admin-ajax.php', data=data, headers=headers)
-#         unik = parse_response(response)
-#         if unik == -1:
-#             break
-#         data['unik'] = unik
-#
-#
-# # Parse the html response from svenska.se
-# def parse_response(response):
-#     soup = BeautifulSoup(response.text, features="html.parser")
-#     links = soup.findAll("a", class_='slank')
-#     if len(links) == 0:
-#         return -1
-#     for link in links[1:]:
-#         gather_information(link)
-#     div = soup.findAll("div", class_='pilned')
-#     return div[0].a['unik']
-#
-#
-# def gather_information(link):
-#     span = link.findAll('span')
-#     file.write(span[0].getText().strip() +
-#                "," + span[1].getText().strip() +
-#                "," + span[2].getText().strip() +
-#                "," + span[3].getText().strip() +
-#                "," + link['href'].strip() + "\n")
-#
-#
-# if __name__ == '__main__':
-#     main()
+#!/usr/bin/env python3
+"""Enumerate the word list of SO and write it in the format of data/P9837.csv
+
+Based on https://gist.github.com/salgo60/73dc99d71fcdeb75e4d69bd73b71acf9 and
+https://github.com/Torbacka/wordlist/blob/master/client.py
+
+The list is walked through the scroll list of admin-ajax.php where every
+response holds the cursor (unik) of the next one. The next request is sent
+before the rows of the current one are written and the cursor is
+checkpointed after every page, so an interrupted run resumes where it stopped.
+The checkpoint is removed at the end of the list and the next run fetches the
+whole list again."""
+import asyncio
+import csv
+import json
+import os
+from typing import List, Optional, Set, Tuple
+from urllib.parse import parse_qs, urlparse
+
+import config
+
+url = "https://svenska.se/wp-admin/admin-ajax.php"
+
+
+def span_text(link, class_: str) -> str:
+    span = link.find("span", class_=class_)
+    return span.getText().strip() if span is not None else ""
+
+
+def parse_response(html: str) -> Tuple[List[List[str]], Optional[str]]:
+    """Rows of id, lemma, category and headword like in data/P9837.csv and the
+    cursor of the next page, which is None when the end of the list is reached"""
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, features="html.parser")
+    links = soup.find_all("a", class_="slank")
+    if len(links) == 0:
+        return [], None
+    rows = []
+    # The first link is the last one of the previous page
+    for link in links[1:]:
+        href = link["href"].strip()
+        id_ = parse_qs(urlparse(href).query).get("id", [href])[0]
+        # The link holds <span class="dig"> with the homograph number, the lemma in
+        # <span class="plain"> and either the category in <span class="wordclass">
+        # or the headword of a compound in <span class="mdr">, e.g. (honorär)
+        lemma = next((span.getText().strip() for span in link.find_all("span")
+                      if not {"dig", "wordclass", "mdr"} & set(span.get("class", []))), "")
+        category = span_text(link, "wordclass")
+        headword = span_text(link, "mdr").strip("()") or lemma
+        # The categories in P9837.csv start with a space
+        rows.append([id_, lemma, f" {category}" if category else "", headword])
+    pilned = soup.find("div", class_="pilned")
+    unik = pilned.a["unik"] if pilned is not None and pilned.a is not None else None
+    return rows, unik
+
+
+def read_ids(csv_file: str) -> Set[str]:
+    with open(csv_file, "r", encoding="UTF-8") as f:
+        return {line.split("\t", 1)[0] for line in f if line.strip()}
+
+
+def diff_ids(old_csv: str, new_csv: str) -> Tuple[List[str], List[str]]:
+    """Ids that were added and removed in the new list"""
+    old, new = read_ids(old_csv), read_ids(new_csv)
+    return sorted(new - old), sorted(old - new)
+
+
+class WordListEnumerator:
+    output: str
+    checkpoint: str
+    pages: int
+    rows: int
+
+    def __init__(self, output: str = "data/P9837.new.csv", url_: str = url, retries: int = 5):
+        self.output = output
+        self.pages = 0
+        self.rows = 0
+        self.checkpoint = output + ".checkpoint"
+        self.url = url_
+        self.retries = retries
+
+    def __load_checkpoint(self) -> str:
+        """The unik to continue from, the first one unless an earlier run was interrupted"""
+        if os.path.exists(self.checkpoint):
+            with open(self.checkpoint, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            if state["unik"] is None:
+                # left by a complete run, fetch the list again to pick up new entries
+                return "0"
+            self.pages, self.rows = state["pages"], state["rows"]
+            print(f"Resuming after {self.pages} pages and {self.rows} rows at unik {state['unik']}")
+            return state["unik"]
+        return "0"
+
+    def __save_checkpoint(self, unik: Optional[str]):
+        with open(self.checkpoint + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"unik": unik, "pages": self.pages, "rows": self.rows}, f)
+        os.replace(self.checkpoint + ".tmp", self.checkpoint)
+
+    async def __post(self, client, unik: str) -> str:
+        from httpx import HTTPError
+        data = {"action": "myprefix_scrollist", "unik": unik, "dir": "ned", "dict": "so"}
+        for attempt in range(self.retries):
+            try:
+                response = await client.post(self.url, data=data)
+                response.raise_for_status()
+                return response.text
+            except HTTPError as e:
+                print(f"Attempt {attempt + 1} for unik {unik} failed: {e}")
+                await asyncio.sleep(2 ** attempt)
+        raise ConnectionError(f"Could not fetch unik {unik} after {self.retries} attempts")
+
+    async def enumerate(self, max_pages: int = 20000, client=None):
+        from modules import recorder
+        unik = self.__load_checkpoint()
+        mode = "a" if self.pages else "w"
+        own_client = client is None
+        if own_client:
+            client = recorder.async_client(headers={"User-Agent": config.user_agent}, timeout=30)
+        try:
+            with open(self.output, mode, encoding="UTF-8", newline="") as f:
+                writer = csv.writer(f, delimiter="\t", quoting=csv.QUOTE_NONE, escapechar="\\")
+                request = asyncio.create_task(self.__post(client, unik))
+                while self.pages < max_pages:
+                    rows, unik = parse_response(await request)
+                    if unik is not None:
+                        # send the next request while we write this page
+                        request = asyncio.create_task(self.__post(client, unik))
+                    writer.writerows(rows)
+                    f.flush()
+                    self.pages += 1
+                    self.rows += len(rows)
+                    if unik is None:
+                        # the list is complete, the next run starts from the first unik
+                        if os.path.exists(self.checkpoint):
+                            os.remove(self.checkpoint)
+                        break
+                    self.__save_checkpoint(unik)
+                    if self.pages % 10 == 0:
+                        print(f"{self.pages} pages, {self.rows} rows")
+                else:
+                    request.cancel()
+        finally:
+            if own_client:
+                await client.aclose()
+        print(f"Wrote {self.rows} rows from {self.pages} pages to {self.output}")
+
+
+def write_id_diff(old_csv: str, new_csv: str, output: str):
+    """Write the added and removed ids as JSON"""
+    added, removed = diff_ids(old_csv, new_csv)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({"added": added, "removed": removed}, f, indent=1)
+    print(f"{len(added)} ids added and {len(removed)} removed compared to {old_csv}, see {output}")
+
+
+def main(output: str = "data/P9837.new.csv", existing: str = "data/P9837.csv", max_pages: int = 20000):
+    asyncio.run(WordListEnumerator(output=output).enumerate(max_pages=max_pages))
+    if os.path.exists(existing):
+        write_id_diff(existing, output, output + ".diff.json")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,245 +1,872 @@
-# #!/usr/bin/env python3
-# # Licensed under GPLv3+ i.e. GPL version 3 or later.
-# import logging
-# from csv import reader
-# from time import sleep
-# from typing import List, Dict
-# from urllib.parse import urlparse, parse_qsl, quote
-#
-# from wikibaseintegrator import wbi_config
-# from wikibaseintegrator import wbi_login
-#
-# import config
-# from models import wikidata, so
-# # Constants
-# from models.wikidata import LexemeLanguage, ForeignID
-# from modules.console import console
-#
-# wd_prefix = "http://www.wikidata.org/entity/"
-# count_only = False
-#
-# logging.basicConfig(level=logging.WARNING)
-# logger = logging.getLogger(__name__)
-#
-# # Pseudo code
-# # first it gets all swedish lexemes
-# # opens the list of entries in dictionary
-# # tries to match each lexeme to an entry
-# # if match found
-# ## uploads
-# # else
-# # add no-value to the lexeme
-#
-#
-# def match_lexical_category(lexeme: wikidata.Lexeme = None,
-#                            entry: so.SOEntry = None) -> bool:
-#     logger = logging.getLogger(__name__)
-#     if lexeme is None or entry is None:
-#         raise ValueError("Did not get the arguments needed")
-#     # TODO find out what the number means and how it affects the matching
-#     logger.debug(f"dictionary number: {entry.number}")
-#     # if not count_only:
-#     #     logger.info(f"found match: category: {dictionary_entry.lexical_category} id: {dictionary_entry.id}")
-#     # check if categories match
-#     category = None
-#     if entry.lexical_category == "" or entry.lexical_category is None:
-#         if not count_only:
-#             raise ValueError("No category found")
-#     elif "verb" in entry.lexical_category:
-#         category = "Q24905"
-#     elif "subst" in entry.lexical_category:
-#         if "-" in entry.lemma:
-#             # handle affixes like -fil also being marked as subst in dictionary
-#             category = "Q62155"
-#         else:
-#             category = "Q1084"
-#     elif "adj" in entry.lexical_category:
-#         category = "Q34698"
-#     elif "adv" in entry.lexical_category:
-#         category = "Q380057"
-#     elif "konj" in entry.lexical_category or "subjunktion" in entry.lexical_category:
-#         # See https://www.wikidata.org/wiki/Q36484 where subjunktion is an alias
-#         category = "Q36484"
-#     elif "interj" in entry.lexical_category:
-#         category = "Q83034"
-#     elif "prep" in entry.lexical_category:
-#         category = "Q4833830"
-#     elif "räkn" in entry.lexical_category:
-#         category = "Q63116"
-#     elif "artikel" in entry.lexical_category:
-#         category = "Q103184"
-#     elif "pron" in entry.lexical_category:
-#         category = "Q36224"
-#     elif "infinitivmärke" in entry.lexical_category:
-#         # See e.g. https://svenska.se/so/?id=103144_1
-#         category = "Q184943"
-#     elif (
-#             entry.lexical_category == "prefix" or
-#             entry.lexical_category == "suffix" or
-#             entry.lexical_category == "affix" or
-#             "förled" in entry.lexical_category  # e.g. https://svenska.se/so/?id=157051
-#     ):
-#         category = "Q62155"
-#     elif (
-#         # this ignores all special cases where the entry is only linking to the root, e.g ingenjörskår -> kår
-#         "(" in entry.lexical_category or
-#         "ssgled" in entry.lexical_category
-#     ):
-#         # ignore silently for now
-#         # console.print(f"[orange] ignoring {entry.lemma}, {entry.lexical_category}")
-#         return False
-#     else:
-#         if not count_only:
-#             # Raise error, so that we don't accidentally add novalue to
-#             # these
-#             raise ValueError(f"Did not recognize category "
-#                           f"{entry.lexical_category} on "
-#                           f"{entry.url()}, skipping")
-#             # return False
-#     if category is not None:
-#         if category == lexeme.lexical_category:
-#             return True
-#         else:
-#             if not count_only:
-#                 logging.info    ("Categories did not match, skipping")
-#             return False
-#
-#
-# def load_dictionary_into_memory():
-#     # load all saab words into a list that can be searched
-#     # load all saab ids into a list we can lookup in using the index.
-#     # the two lists above have the same index.
-#     # load all dictionary lines into a dictionary with count as key and list in the value
-#     #list[0] = dictionary_category
-#     #list[1] = number
-#     #list[2] = id
-#     #list[3] = word
-#     with console.status("Loading dictionary into memory..."):
-#         dictionary_lemma_list = []
-#         dictionary_data = {}
-#         # open file in read mode
-#         with open('so_2021-09-01.csv', 'r', encoding="UTF-8") as read_obj:
-#             # pass the file object to reader() to get the reader object
-#             csv_reader = reader(read_obj)
-#             count = 0
-#             # Iterate over each row in the csv using reader object
-#             for row in csv_reader:
-#                 # row variable is a list that represents a row in csv
-#                 #row0 is null
-#                 word = row[1]
-#                 dictionary_category = row[2]
-#                 if row[3] == '':
-#                     dictionary_number = 0
-#                 else:
-#                     dictionary_number = int(row[3])
-#                 url = urlparse(row[4])
-#                 # print(url.query)
-#                 dictionary_id = dict(parse_qsl(url.query))["id"]
-#                 if "_" in dictionary_id:
-#                     logger.debug(f"Detected underscore id {dictionary_id}")
-#                     # We hardcode to always return 1 after the underscore
-#                     dictionary_id = dictionary_id[0:dictionary_id.find("_")] + "_1"
-#                     logger.debug(f"Hardcoded to {dictionary_id}")
-#                 # Create object
-#                 entry = so.SOEntry(
-#                     id=dictionary_id,
-#                     lexical_category=dictionary_category,
-#                     number=dictionary_number,
-#                     lemma=word
-#                 )
-#                 dictionary_data[count] = entry #[dictionary_category, dictionary_number, dictionary_id, word]
-#                 dictionary_lemma_list.append(word)
-#                 count += 1
-#     console.print(f"[green]Finished loading {count} dictionary lines")
-#     return dictionary_lemma_list, dictionary_data
-#
-#
-# def process_lexemes(lexeme_lemma_list: List = None,
-#                     lexemes_data: Dict = None,
-#                     dictionary_lemma_list: List = None,
-#                     dictionary_data: Dict = None):
-#     """Go though each lexeme and try to match with SO"""
-#     if (
-#         lexeme_lemma_list is None or
-#         lexemes_data is None or
-#         dictionary_lemma_list is None or
-#         dictionary_data is None
-#     ):
-#         logger.exception("Did not get what we need")
-#     lexemes_count = len(lexeme_lemma_list)
-#     # go through all lexemes missing dictionary identifier
-#     match_count = 0
-#     processed_count = 0
-#     skipped_multiple_matches = 0
-#     no_value_count = 0
-#     if count_only:
-#         print("Counting all matches that can be uploaded")
-#     for lemma in lexeme_lemma_list:
-#         if processed_count > 0 and processed_count % 1000 == 0:
-#             print(f"Processed {processed_count} lexemes out of "
-#                   f"{lexemes_count} ({round(processed_count * 100 / lexemes_count)}%)")
-#         lexeme: wikidata.Lexeme = lexemes_data[lemma]
-#         if not count_only:
-#             logging.info(f"Working on {lexeme.id}: {lexeme.lemma} {lexeme.lexical_category}")
-#         if lexeme.lemma in dictionary_lemma_list:
-#             for index, dictionary_lemma in enumerate(dictionary_lemma_list):
-#                 if lexeme.lemma == dictionary_lemma:
-#                     # We found a lemma-match!
-#                     entry = dictionary_data[index]
-#                     # Check if the lexical categories match also
-#                     result = match_lexical_category(lexeme=lexeme,
-#                                                     entry=entry)
-#                     if result:
-#                         match_count += 1
-#                         if not count_only:
-#                             lexeme.upload_foreign_id_to_wikidata(foreign_id=ForeignID(
-#                                 id=entry.id,
-#                                 property=config.foreign_id_property,
-#                                 source_item_id=config.source_item_id
-#                             ))
-#                         # debug
-#                         # raise Exception("debug exit")
-#                         # Pick only the first search result in the dictionary wordlist
-#                         break
-#         else:
-#             if not count_only:
-#                 console.print(f"[red]{lexeme.lemma} not found in dictionary wordlist, "
-#                                 f"see https://svenska.se/so/?sok={quote(lexeme.lemma)}")
-#                 if config.add_no_value:
-#                     # Add dictionary=no_value to lexeme
-#                     lexeme.upload_foreign_id_to_wikidata(foreign_id=ForeignID(
-#                         property=config.foreign_id_property,
-#                         no_value=True
-#                     ))
-#                 else:
-#                     # sleep to give the user time to read the warning above
-#                     sleep(3)
-#             no_value_count += 1
-#         processed_count += 1
-#     print(f"Processed {processed_count} lexemes. "
-#           f"Found {match_count} matches "
-#           f"out of which {skipped_multiple_matches} "
-#           f"was skipped because they had multiple entries "
-#           f"with the same lexical category. {no_value_count} "
-#           f"entries with no main entry in dictionary was found")
-#
-#
-# def main():
-#     if not count_only:
-#         with console.status("Logging in with WikibaseIntegrator..."):
-#             config.login_instance = wbi_login.Login(
-#                 user=config.username, pwd=config.password
-#             )
-#             # Set User-Agent
-#             wbi_config.config["USER_AGENT_DEFAULT"] = config.user_agent
-#     language = LexemeLanguage("sv")
-#     language.fetch_all_lexemes_without_so_id()
-#     lexemes_list = language.lemma_list()
-#     lexemes_data = language.data_dictionary_with_lemma_as_key()
-#     dictionary_list, dictionary_data = load_dictionary_into_memory()
-#     process_lexemes(lexeme_lemma_list=lexemes_list, lexemes_data=lexemes_data, dictionary_lemma_list=dictionary_list,
-#                     dictionary_data=dictionary_data)
-#
-#
-# if __name__ == "__main__":
-#     main()
+#!/usr/bin/env python3
+# Licensed under GPLv3+ i.e. GPL version 3 or later.
+"""Command line interface for LexSO
+
+Usage:
+    lexso [--http record|replay] COMMAND ...
+    lexso crawl|extract|match --profile [data/profile/COMMAND] [--profile-top N]
+    lexso crawl [--start N] [--stop N] [--extract [--workers N] [--queue-size N] [--archive]]
+    lexso crawl --lease data/leases.sqlite [--worker NAME] [--directory data/html]
+    lexso merge DIRECTORY ... [--into data/html]
+    lexso extract [--directory data/html] [--retry]
+    lexso match
+    lexso plan [-o data/plan.jsonl]
+    lexso apply PLAN [--actions value novalue] [--lexeme L1 L2]
+    lexso upload
+    lexso dump latest-lexemes.json.gz [-o data/lexemes_sv.jsonl] [--processes N]
+    lexso graph [--page ID [--hops K] [--reverse]] [--save graph.npz]
+    lexso index [--directory data/index]
+    lexso search QUERY [--phrase] [--prefix]
+    lexso trie [--build] [WORD ...] [--prefix | --suffix]
+    lexso diff OLD NEW [-o data/changes.jsonl]
+    lexso wordlist [-o data/P9837.new.csv]
+    lexso coverage [--snapshot data/lexemes_sv.jsonl] [-o report.json]
+    lexso export PLAN [--format quickstatements|json] [-o data/plan.qs] [--no-prefetch]
+    lexso senses [--top K] [-o data/senses.jsonl]
+    lexso reconcile [--field hyphenation] [--plan data/plan.jsonl] [-o data/hyphenation.jsonl]
+    lexso sort [--version V] [--directory data/jsonl/sorted_V]
+    lexso stats [--corpus [--version V] [--format markdown|json] [-o report.md]]
+
+Heavy dependencies (pandas, httpx, bs4, tqdm and wikibaseintegrator) are
+imported inside the subcommand that needs them so that short commands start
+fast and this module is safe to import from tests and other tools."""
+import argparse
+import csv
+import logging
+import os
+from typing import List, Dict, Optional
+from urllib.parse import quote
+
+import config
+from models import so
+
+logger = logging.getLogger(__name__)
+
+# Pseudo code
+# first it gets all swedish lexemes
+# opens the list of entries in dictionary
+# tries to match each lexeme to an entry
+# if match found
+## uploads
+# else
+# add no-value to the lexeme
+
+
+def lexical_category_qid(lexical_category: str = None, lemma: str = "") -> Optional[str]:
+    """Map the category in SO to a Wikidata QID.
+    Returns None for entries that only link to their root and
+    raises ValueError if we don't recognize the category"""
+    # TODO find out what the number means and how it affects the matching
+    if lexical_category == "" or lexical_category is None:
+        # Rows without a category in data/P9837.csv are compounds
+        # that are only mentioned in the article of their headword,
+        # e.g. alkoholförbud -> alkohol, ignore silently like ssgled below
+        return None
+    elif "verb" in lexical_category:
+        return "Q24905"
+    elif "subst" in lexical_category:
+        if "-" in lemma:
+            # handle affixes like -fil also being marked as subst in dictionary
+            return "Q62155"
+        else:
+            return "Q1084"
+    elif "adj" in lexical_category:
+        return "Q34698"
+    elif "adv" in lexical_category:
+        return "Q380057"
+    elif "konj" in lexical_category or "subjunktion" in lexical_category:
+        # See https://www.wikidata.org/wiki/Q36484 where subjunktion is an alias
+        return "Q36484"
+    elif "interj" in lexical_category:
+        return "Q83034"
+    elif "prep" in lexical_category:
+        return "Q4833830"
+    elif "räkn" in lexical_category:
+        return "Q63116"
+    elif "artikel" in lexical_category:
+        return "Q103184"
+    elif "pron" in lexical_category:
+        return "Q36224"
+    elif "infinitivmärke" in lexical_category:
+        # See e.g. https://svenska.se/so/?id=103144_1
+        return "Q184943"
+    elif (
+            lexical_category == "prefix" or
+            lexical_category == "suffix" or
+            lexical_category == "affix" or
+            "förled" in lexical_category  # e.g. https://svenska.se/so/?id=157051
+    ):
+        return "Q62155"
+    elif (
+        # this ignores all special cases where the entry is only linking to the root, e.g ingenjörskår -> kår
+        "(" in lexical_category or
+        "ssgled" in lexical_category or
+        "sms." in lexical_category
+    ):
+        return None
+    else:
+        # Raise error, so that we don't accidentally add novalue to
+        # these
+        raise ValueError(f"Did not recognize category {lexical_category}")
+
+
+def match_lexical_category(lexeme=None,
+                           entry: so.SOEntry = None) -> bool:
+    if lexeme is None or entry is None:
+        raise ValueError("Did not get the arguments needed")
+    try:
+        category = lexical_category_qid(entry.lexical_category, entry.lemma)
+    except ValueError as e:
+        raise ValueError(f"{e} on {entry.url()}, skipping")
+    if category is None:
+        # ignore silently for now
+        return False
+    if category == lexeme.lexical_category:
+        return True
+    else:
+        logger.debug("Categories did not match, skipping")
+        return False
+
+
+def compound_segments(entry: so.SOEntry = None, lemma_trie=None) -> Optional[List[str]]:
+    """The split of an entry that only links to its headword or None if it has a category"""
+    try:
+        if lexical_category_qid(entry.lexical_category, entry.lemma) is not None:
+            return None
+    except ValueError:
+        return None
+    return lemma_trie.segment(entry.lemma) or []
+
+
+def match_compound(lexeme=None, entry: so.SOEntry = None, lemma_trie=None) -> Optional[str]:
+    """Match entries that only link to their headword, e.g. ingenjörskår -> kår,
+    by splitting the compound and comparing the category of its last part.
+    The id of the row is the page of the headword, so the split has to end in
+    the headword, abortmetod is listed under abort and not matched.
+    Returns the last part if the categories match"""
+    segments = compound_segments(entry=entry, lemma_trie=lemma_trie)
+    if not segments or not entry.headword or segments[-1] != entry.headword.lower():
+        return None
+    for category in lemma_trie.lookup(segments[-1]):
+        try:
+            if lexical_category_qid(category, segments[-1]) == lexeme.lexical_category:
+                return segments[-1]
+        except ValueError:
+            continue
+    return None
+
+
+def compound_mismatch(entry: so.SOEntry = None, lemma_trie=None) -> Optional[str]:
+    """Why a compound entry can't be matched by its last part, None if it is not a compound
+    or the split ends in its headword"""
+    segments = compound_segments(entry=entry, lemma_trie=lemma_trie)
+    if segments is None:
+        return None
+    if not segments:
+        return f"compound could not be split, its headword is {entry.headword}"
+    if segments[-1] != (entry.headword or "").lower():
+        return f"compound split as {'|'.join(segments)} does not end in its headword {entry.headword}"
+    return None
+
+
+def load_dictionary_into_memory(csv_file: str = "data/P9837.csv") -> Dict[str, List[so.SOEntry]]:
+    """Load all SO entries into a dictionary with the lemma as key.
+    The list in the value keeps the order of the file so the first
+    entry is the first search result in the dictionary wordlist"""
+    from modules.console import console
+    with console.status("Loading dictionary into memory..."):
+        dictionary_data: Dict[str, List[so.SOEntry]] = {}
+        count = 0
+        with open(csv_file, "r", encoding="UTF-8") as read_obj:
+            # The columns are id, lemma, category and headword
+            csv_reader = csv.reader(read_obj, delimiter="\t", quoting=csv.QUOTE_NONE)
+            for row in csv_reader:
+                # Homographs keep their own id, e.g. 100095_1 absolut adj. and 100095_2 absolut adv.
+                entry = so.SOEntry(
+                    id=row[0],
+                    headword=row[3].strip() if len(row) > 3 else "",
+                    lexical_category=row[2].strip(),
+                    lemma=row[1]
+                )
+                dictionary_data.setdefault(entry.lemma, []).append(entry)
+                count += 1
+    console.print(f"[green]Finished loading {count} dictionary lines")
+    return dictionary_data
+
+
+def entry_score(entry: so.SOEntry, scores: Dict[str, float]) -> float:
+    """The score of the SO id of the entry, or of its page if the page has a single superlemma"""
+    return scores.get(entry.id, scores.get(entry.page_id(), 0.0))
+
+
+def best_by_scores(lexeme=None, entries: List[so.SOEntry] = None, scores: Dict[str, float] = None,
+                   using: str = "the forms") -> Optional[so.SOEntry]:
+    """The entry whose SO id scores strictly highest or None if we can't decide,
+    i.e. if we have no scores for the entries or the best ones tie"""
+    scores = scores or {}
+    ranked = sorted(entries, key=lambda entry: entry_score(entry, scores), reverse=True)
+    best = entry_score(ranked[0], scores)
+    if best == 0.0 or best == entry_score(ranked[1], scores):
+        logger.info(f"Could not disambiguate {lexeme.id}: {lexeme.lemma} using {using}")
+        return None
+    return ranked[0]
+
+
+def best_by_forms(lexeme=None, entries: List[so.SOEntry] = None, form_join=None) -> Optional[so.SOEntry]:
+    """The entry whose SO inflections overlap the forms of the lexeme the most,
+    None if we have no extracted data for the entries or the best ones tie"""
+    scores = form_join.entry_scores(lexeme.lemma, [form.representation for form in lexeme.forms])
+    return best_by_scores(lexeme=lexeme, entries=entries, scores=scores)
+
+
+def plan_edits(lexemes: List = None,
+               dictionary_data: Dict[str, List[so.SOEntry]] = None,
+               form_join=None,
+               lemma_trie=None,
+               sense_scores: Dict[str, Dict[str, float]] = None):
+    """Go though each lexeme and try to match with SO.
+    Nothing is uploaded, every proposed edit is returned in an EditPlan.
+    If a FormJoin is given it is used to choose between homographs,
+    then the sense scores from SenseAlignment.entry_scores if given, and
+    if a LemmaTrie is given compounds that only link to their root are
+    matched by the category of their last part"""
+    from models.plan import EditPlan, PlannedEdit
+    if lexemes is None or dictionary_data is None:
+        raise ValueError("Did not get what we need")
+    plan = EditPlan()
+    lexemes_count = len(lexemes)
+    # go through all lexemes missing dictionary identifier
+    processed_count = 0
+    skipped_multiple_matches = 0
+    for lexeme in lexemes:
+        if processed_count > 0 and processed_count % 10000 == 0:
+            print(f"Processed {processed_count} lexemes out of "
+                  f"{lexemes_count} ({round(processed_count * 100 / lexemes_count)}%)")
+        processed_count += 1
+        edit = PlannedEdit(lexeme_id=lexeme.id, lemma=lexeme.lemma,
+                           lexical_category=lexeme.lexical_category, action="skip")
+        plan.edits.append(edit)
+        if lexeme.lemma not in dictionary_data:
+            edit.action = "novalue"
+            edit.reason = "lemma not found in dictionary wordlist"
+            continue
+        entries = dictionary_data[lexeme.lemma]
+        edit.candidates = [entry.id for entry in entries]
+        matches = []
+        unrecognized = []
+        for entry in entries:
+            try:
+                if match_lexical_category(lexeme=lexeme, entry=entry):
+                    matches.append(entry)
+            except ValueError:
+                # We don't want to accidentally add novalue to these
+                unrecognized.append(entry.lexical_category)
+        compound_reasons = []
+        if not matches and lemma_trie is not None:
+            for entry in entries:
+                head = match_compound(lexeme=lexeme, entry=entry, lemma_trie=lemma_trie)
+                if head is not None:
+                    matches.append(entry)
+                    edit.reason = f"compound with the last part {head}"
+                    break
+                reason = compound_mismatch(entry=entry, lemma_trie=lemma_trie)
+                if reason is not None:
+                    compound_reasons.append(reason)
+        if len(matches) > 1 and (form_join is not None or sense_scores is not None):
+            # Homographs with the same lexical category, pick the one whose inflections
+            # overlap the most with the forms or else whose definitions are closest to the glosses
+            best = None
+            if form_join is not None:
+                best = best_by_forms(lexeme=lexeme, entries=matches, form_join=form_join)
+                edit.reason = "chosen by overlap of forms"
+            if best is None and sense_scores is not None and lexeme.id in sense_scores:
+                best = best_by_scores(lexeme=lexeme, entries=matches, scores=sense_scores[lexeme.id],
+                                      using="the glosses")
+                edit.reason = "chosen by similarity of glosses and definitions"
+            if best is None:
+                skipped_multiple_matches += 1
+                edit.reason = "multiple entries with the same lexical category"
+                continue
+            matches = [best]
+        if matches:
+            # Pick only the first search result in the dictionary wordlist
+            edit.action = "value"
+            edit.so_id = matches[0].id
+            edit.reason = edit.reason or "lemma and lexical category match"
+        elif unrecognized:
+            edit.reason = f"did not recognize category {', '.join(unrecognized)}"
+        elif compound_reasons:
+            edit.reason = "; ".join(compound_reasons)
+        else:
+            edit.reason = "lexical category did not match"
+    print(f"Processed {processed_count} lexemes. "
+          f"Found {plan.count('value')} matches. "
+          f"{skipped_multiple_matches} "
+          f"was skipped because they had multiple entries "
+          f"with the same lexical category. {plan.count('novalue')} "
+          f"entries with no main entry in dictionary was found")
+    return plan
+
+
+def apply_plan(plan=None, prefetch: bool = True):
+    """Upload the edits in the plan to Wikidata.
+    With prefetch the lexemes are fetched in batches ahead of the writes and
+    lexemes that got a P9837 statement since the plan was made are skipped"""
+    from models.wikidata import ForeignID, Lexeme
+    from modules.console import console
+    from modules.prefetch import EntityPrefetcher, has_claim
+    prefetcher = EntityPrefetcher(edit.lexeme_id for edit in plan.edits) if prefetch else None
+    for edit in plan.edits:
+        lexeme = Lexeme(id=edit.lexeme_id, lemma=edit.lemma, lexical_category=edit.lexical_category)
+        entity = None
+        if prefetcher is not None:
+            entity = prefetcher.get(edit.lexeme_id)
+            if entity is None:
+                console.print(f"[red]{lexeme.url()} does not exist anymore, skipping")
+                continue
+            if has_claim(entity, config.foreign_id_property):
+                console.print(f"{lexeme.url()} already has {config.foreign_id_property}, skipping")
+                continue
+        if edit.action == "value":
+            lexeme.upload_foreign_id_to_wikidata(foreign_id=ForeignID(
+                id=edit.so_id,
+                property=config.foreign_id_property,
+                source_item_id=config.source_item_id
+            ), entity=entity)
+        elif edit.action == "novalue":
+            console.print(f"[red]{lexeme.lemma} not found in dictionary wordlist, "
+                          f"see https://svenska.se/so/?sok={quote(lexeme.lemma)}")
+            # Add dictionary=no_value to lexeme
+            lexeme.upload_foreign_id_to_wikidata(foreign_id=ForeignID(
+                property=config.foreign_id_property,
+                no_value=True
+            ), entity=entity)
+
+
+def login():
+    from wikibaseintegrator import wbi_config, wbi_login
+    from modules.console import console
+    with console.status("Logging in with WikibaseIntegrator..."):
+        config.login_instance = wbi_login.Login(
+            user=config.username, pwd=config.password
+        )
+        # Set User-Agent
+        wbi_config.config["USER_AGENT_DEFAULT"] = config.user_agent
+
+
+def compute_plan(superlemmas_jsonl: str = None, snapshot: str = None, lemma_trie: str = None,
+                 senses: bool = False, max_lexeme_id: int = None):
+    from models.wikidata import LexemeLanguage
+    language = LexemeLanguage("sv")
+    # without a bound the WDQS queries read the highest L-id and leave the last range open
+    options = {"stop": max_lexeme_id + 1} if max_lexeme_id is not None else {}
+    if snapshot is not None:
+        language.load_lexemes_without_so_id_from_snapshot(snapshot)
+    else:
+        language.fetch_all_lexemes_without_so_id(**options)
+    form_join = None
+    if superlemmas_jsonl is not None:
+        from models.join import FormJoin
+        if snapshot is None:
+            # The snapshot already has the forms
+            language.fetch_forms(**options)
+        form_join = FormJoin.from_superlemmas_jsonl(superlemmas_jsonl)
+    trie = None
+    if lemma_trie is not None:
+        from models.trie import LemmaTrie
+        trie = LemmaTrie.load(lemma_trie)
+    sense_scores = None
+    if senses:
+        if superlemmas_jsonl is None or snapshot is None:
+            raise ValueError("Aligning the senses needs both --superlemmas and --snapshot")
+        from models.senses import SenseAlignment
+        sense_scores = SenseAlignment.from_jsonl(superlemmas_jsonl, snapshot).entry_scores()
+    dictionary_data = load_dictionary_into_memory()
+    return plan_edits(lexemes=language.lexemes, dictionary_data=dictionary_data, form_join=form_join,
+                      lemma_trie=trie, sense_scores=sense_scores)
+
+
+def default_actions() -> List[str]:
+    return ["value", "novalue"] if config.add_no_value else ["value"]
+
+
+def jsonl_path(name: str, version=None) -> str:
+    """Path of the articles, superlemmas or idioms JSONL written by the extractor"""
+    if version is None:
+        version = getattr(config, "version", None)
+    return f"data/jsonl/{name}_{version}.jsonl"
+
+
+def count_lines(path: str) -> int:
+    if not os.path.exists(path):
+        return 0
+    with open(path, "rb") as f:
+        return sum(1 for _ in f)
+
+
+def print_stats(csv_file: str = "data/P9837.csv", html_directory: str = "data/html"):
+    """Print a summary of the local data without touching the network"""
+    rows = 0
+    ids = set()
+    if os.path.exists(csv_file):
+        with open(csv_file, "r", encoding="UTF-8") as f:
+            for line in f:
+                rows += 1
+                ids.add(line.split("\t", 1)[0])
+    from modules.pages import alias_table
+    print(f"{csv_file}: {rows} rows with {len(ids)} distinct ids on {len(alias_table(ids))} pages")
+    pages = 0
+    if os.path.isdir(html_directory):
+        pages = sum(1 for file in os.listdir(html_directory) if file.endswith(".gz"))
+    print(f"{html_directory}: {pages} gzipped html pages")
+    for name in ("articles", "superlemmas", "idioms"):
+        path = jsonl_path(name)
+        print(f"{path}: {count_lines(path)} lines")
+
+
+def crawl(args):
+    if args.lease:
+        from scrape_data import crawl_leased
+        crawl_leased(lease_table=args.lease, worker=args.worker, start=args.start, stop=args.stop,
+                     csv_file=args.csv, html_directory=args.directory, range_size=args.range_size,
+                     lease_seconds=args.lease_seconds, retry_seconds=args.retry_seconds)
+    elif args.extract:
+        from scrape_data import crawl_and_extract
+        crawl_and_extract(start=args.start, stop=args.stop, csv_file=args.csv,
+                          workers=args.workers, queue_size=args.queue_size, archive=args.archive)
+    else:
+        from scrape_data import crawl as crawl_
+        crawl_(start=args.start, stop=args.stop, csv_file=args.csv)
+
+
+def merge(args):
+    from modules.pages import PageStore
+    store = PageStore(args.into)
+    for directory in args.directories:
+        print(f"Added {store.merge(PageStore(directory))} pages from {directory} to {args.into}")
+
+
+def extract(args):
+    from models.extractor import Extractor
+    if args.retry:
+        Extractor().retry_quarantined(directory_path=args.directory)
+    else:
+        Extractor().process_and_dump_individual_files(directory_path=args.directory)
+
+
+def match(args):
+    plan = compute_plan(superlemmas_jsonl=args.superlemmas, snapshot=args.snapshot,
+                        lemma_trie=args.trie, senses=args.senses, max_lexeme_id=args.max_lexeme_id)
+    print(plan)
+
+
+def plan(args):
+    plan_ = compute_plan(superlemmas_jsonl=args.superlemmas, snapshot=args.snapshot,
+                        lemma_trie=args.trie, senses=args.senses, max_lexeme_id=args.max_lexeme_id)
+    plan_.write(args.output)
+    print(f"{plan_}, written to {args.output}")
+
+
+def apply(args):
+    from models.plan import EditPlan
+    plan_ = EditPlan.read(args.plan).filter(actions=args.actions or default_actions(),
+                                              lexeme_ids=args.lexeme)
+    print(f"Applying {len(plan_)} edits from {args.plan}")
+    login()
+    apply_plan(plan_, prefetch=not args.no_prefetch)
+
+
+def upload(args):
+    plan_ = compute_plan(superlemmas_jsonl=args.superlemmas, snapshot=args.snapshot,
+                        lemma_trie=args.trie, senses=args.senses, max_lexeme_id=args.max_lexeme_id)
+    login()
+    apply_plan(plan_.filter(actions=default_actions()), prefetch=not args.no_prefetch)
+
+
+def dump(args):
+    from models.wikidata import LexemeLanguage
+    LexemeLanguage("sv").write_snapshot_from_dump(args.dump, args.output, processes=args.processes)
+
+
+def graph(args):
+    import json
+    from models.graph import SeeAlsoGraph
+    if args.superlemmas.endswith(".npz"):
+        graph_ = SeeAlsoGraph.load(args.superlemmas)
+    else:
+        graph_ = SeeAlsoGraph.from_superlemmas_jsonl(args.superlemmas)
+    if args.save:
+        graph_.save(args.save)
+    if args.page:
+        print(json.dumps(graph_.k_hop(args.page, args.hops, reverse=args.reverse), ensure_ascii=False))
+    else:
+        print(json.dumps(graph_.components_report()))
+
+
+def index(args):
+    from models.search import IdiomIndex
+    documents = IdiomIndex.documents_from_jsonl(idioms_jsonl=args.idioms, superlemmas_jsonl=args.superlemmas)
+    index_ = IdiomIndex.build(documents, directory=args.directory)
+    print(f"Indexed {len(index_.document_offsets) - 1} documents with "
+          f"{len(index_.terms)} terms in {args.directory}")
+
+
+def search(args):
+    import json
+    from models.search import IdiomIndex
+    for document in IdiomIndex(args.directory).search(args.query, phrase=args.phrase,
+                                                      prefix=args.prefix, limit=args.limit):
+        print(json.dumps(document, ensure_ascii=False))
+
+
+def trie(args):
+    from models.trie import LemmaTrie
+    if args.build:
+        LemmaTrie.from_csv(args.csv).save(args.directory)
+        print(f"Saved the lemma trie to {args.directory}")
+    lemma_trie = LemmaTrie.load(args.directory)
+    for word in args.words:
+        if args.prefix:
+            print(word, lemma_trie.with_prefix(word))
+        elif args.suffix:
+            print(word, lemma_trie.with_suffix(word))
+        else:
+            print(word, lemma_trie.lookup(word), lemma_trie.segment(word))
+
+
+def diff(args):
+    import json
+    from jsonlines import jsonlines
+    from modules.diff import diff_versions, elements, summarize
+
+    def changes():
+        old = elements(superlemmas_jsonl=jsonl_path("superlemmas", args.old),
+                       idioms_jsonl=jsonl_path("idioms", args.old))
+        new = elements(superlemmas_jsonl=jsonl_path("superlemmas", args.new),
+                       idioms_jsonl=jsonl_path("idioms", args.new))
+        with jsonlines.open(args.output, mode="w", compact=True) as writer:
+            for change in diff_versions(old, new):
+                writer.write(change)
+                yield change
+    print(json.dumps(summarize(changes())))
+    print(f"Changes written to {args.output}")
+
+
+def wordlist(args):
+    from get_so_list import main as enumerate_word_list
+    enumerate_word_list(output=args.output, existing=args.csv, max_pages=args.max_pages)
+
+
+def coverage(args):
+    import json
+    from models.wikidata import LexemeLanguage
+    language = LexemeLanguage("sv")
+    report = language.calculate_statistics_from_snapshot(args.snapshot)
+    print(language)
+    print(f"{report['with_so_id']} lexemes have an SO identifier and {report['with_so_novalue']} have novalue, "
+          f"{report['forms_without_an_example']} of {report['forms']} forms have no usage example")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=1)
+        print(f"Report written to {args.output}")
+
+
+def export(args):
+    import json
+    from models.plan import read_edits
+    from modules.export import quickstatements, wbeditentity
+    actions = set(args.actions or default_actions())
+    edits = [edit for edit in read_edits(args.plan) if edit.action in actions]
+    entities = None
+    if not args.no_prefetch:
+        from modules.prefetch import EntityPrefetcher
+        entities = EntityPrefetcher(edit.lexeme_id for edit in edits).get
+    count = 0
+    with open(args.output, "w", encoding="utf-8") as f:
+        if args.format == "quickstatements":
+            for count, line in enumerate(quickstatements(edits, entities=entities), start=1):
+                f.write(line + "\n")
+        else:
+            for count, request in enumerate(wbeditentity(edits, entities=entities), start=1):
+                f.write(json.dumps(request, ensure_ascii=False, separators=(",", ":")) + "\n")
+    print(f"Wrote {count} {args.format} lines to {args.output}")
+
+
+def senses(args):
+    import json
+    from models.senses import SenseAlignment
+    alignment = SenseAlignment.from_jsonl(args.superlemmas, args.snapshot)
+    print(f"Aligning {len(alignment.glosses)} glosses with {len(alignment.kernels)} definitions")
+    top = alignment.top(k=args.top)
+    with open(args.output, "w", encoding="utf-8") as f:
+        for line in top:
+            f.write(json.dumps(line, ensure_ascii=False) + "\n")
+    print(f"Wrote {len(top)} alignments to {args.output}")
+
+
+def reconcile(args):
+    from jsonlines import jsonlines
+    from models.plan import write_statements
+    from modules.reconcile import FieldIndex, fields, planned_so_ids, reconcile as reconcile_
+    field = fields[args.field]
+    index_ = FieldIndex.from_jsonl(field, args.superlemmas)
+    print(f"Loaded the {field.name} of {len(index_)} SO entries")
+    with jsonlines.open(args.snapshot) as reader:
+        statements = list(reconcile_(reader, index_, planned=planned_so_ids(args.plan)))
+    output = args.output or f"data/{field.name}.jsonl"
+    write_statements(statements, output)
+    added = sum(1 for statement in statements if statement.action == "add")
+    print(f"{added} missing and {len(statements) - added} conflicting {field.property} statements "
+          f"written to {output}")
+
+
+def sort(args):
+    from modules.sort import sort_jsonl
+    version = args.version if args.version is not None else getattr(config, "version", None)
+    directory = args.directory or f"data/jsonl/sorted_{version}"
+    for name in ("articles", "superlemmas", "idioms"):
+        path = jsonl_path(name, version)
+        if not os.path.exists(path):
+            print(f"{path} does not exist, skipping")
+            continue
+        manifest = sort_jsonl(path, directory, name, run_size=args.run_size,
+                              shard_bytes=args.shard_size * 1024 * 1024)
+        records = sum(shard["records"] for shard in manifest["shards"])
+        print(f"Sorted {records} {name} into {len(manifest['shards'])} shards in {directory}")
+
+
+def stats(args):
+    if not args.corpus:
+        print_stats(csv_file=args.csv)
+        return
+    import json
+    from jsonlines import jsonlines
+    from modules.corpus_stats import corpus_report, markdown
+    articles_jsonl = jsonl_path("articles", args.version)
+    with jsonlines.open(jsonl_path("superlemmas", args.version)) as superlemmas:
+        if os.path.exists(articles_jsonl):
+            with jsonlines.open(articles_jsonl) as articles:
+                report = corpus_report(superlemmas, articles)
+        else:
+            report = corpus_report(superlemmas)
+    text = markdown(report) if args.format == "markdown" else json.dumps(report, indent=1, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+        print(f"Report written to {args.output}")
+    else:
+        print(text)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="lexso", description="Add SO identifiers to Wikidata lexemes")
+    parser.add_argument("--http", choices=["live", "record", "replay"], default=None,
+                        help="record the responses of SO, WDQS and the Wikidata API or replay them offline")
+    parser.add_argument("--http-store", default="data/http.sqlite", help="where the responses are recorded")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    crawl_parser = subparsers.add_parser("crawl", help="Fetch and store the html of SO articles")
+    crawl_parser.add_argument("--csv", default="data/P9837.csv", help="tab separated list of SO identifiers")
+    crawl_parser.add_argument("--start", type=int, default=100)
+    crawl_parser.add_argument("--stop", type=int, default=getattr(config, "max_ids_to_scrape", 70000))
+    crawl_parser.add_argument("--extract", action="store_true",
+                              help="extract the pages while crawling instead of storing them for lexso extract")
+    crawl_parser.add_argument("--workers", type=int, default=2, help="number of extraction processes")
+    crawl_parser.add_argument("--queue-size", type=int, default=50,
+                              help="maximum number of fetched pages waiting for extraction")
+    crawl_parser.add_argument("--archive", action="store_true",
+                              help="also store the html in data/html when extracting")
+    crawl_parser.add_argument("--lease", default=None,
+                              help="lease ranges of identifiers from this SQLite table shared with other workers")
+    crawl_parser.add_argument("--worker", default=None, help="name of this worker, defaults to host-pid")
+    crawl_parser.add_argument("--range-size", type=int, default=500, help="number of identifiers per lease")
+    crawl_parser.add_argument("--lease-seconds", type=float, default=600,
+                              help="the lease returns to the pool if not renewed within this time")
+    crawl_parser.add_argument("--retry-seconds", type=float, default=60,
+                              help="a range with timeouts is leased again after this time, a worker with "
+                                   "no free range polls at this interval until all are done")
+    crawl_parser.add_argument("--directory", default="data/html", help="where to store the html with --lease")
+    crawl_parser.set_defaults(func=crawl)
+
+    merge_parser = subparsers.add_parser("merge", help="Merge the html stored by several crawl workers")
+    merge_parser.add_argument("directories", nargs="+")
+    merge_parser.add_argument("--into", default="data/html")
+    merge_parser.set_defaults(func=merge)
+
+    extract_parser = subparsers.add_parser("extract", help="Extract articles, superlemmas and idioms to JSONL")
+    extract_parser.add_argument("--directory", default="data/html")
+    extract_parser.add_argument("--retry", action="store_true",
+                                help="only process the pages and articles in the quarantine again")
+    extract_parser.set_defaults(func=extract)
+
+    match_parser = subparsers.add_parser("match", help="Count matches between lexemes and SO without editing")
+    plan_parser = subparsers.add_parser("plan", help="Write all proposed edits to a plan file without editing")
+    plan_parser.add_argument("-o", "--output", default="data/plan.jsonl")
+    upload_parser = subparsers.add_parser("upload", help="Match lexemes with SO and upload to Wikidata")
+    for subparser in (match_parser, plan_parser, upload_parser):
+        subparser.add_argument("--superlemmas", default=None,
+                               help="superlemmas JSONL used to choose between homographs by their forms")
+        subparser.add_argument("--snapshot", default=None,
+                               help="lexeme snapshot written by lexso dump to use instead of WDQS")
+        subparser.add_argument("--trie", default=None,
+                               help="lemma trie written by lexso trie used to match compounds")
+        subparser.add_argument("--senses", action="store_true",
+                               help="choose between homographs by the similarity of the glosses and the SO "
+                                    "definitions, needs --superlemmas and --snapshot")
+        subparser.add_argument("--max-lexeme-id", type=int, default=None,
+                               help="only query the lexemes up to this L-id on WDQS, defaults to all of them")
+    match_parser.set_defaults(func=match)
+    for subparser in (crawl_parser, extract_parser, match_parser):
+        subparser.add_argument("--profile", nargs="?", const="", default=None, metavar="PREFIX",
+                               help="sample the run and write the time of every stage as collapsed stacks "
+                                    "for flamegraphs to PREFIX.folded, defaults to data/profile/COMMAND")
+        subparser.add_argument("--profile-top", type=int, default=20,
+                               help="number of functions in the printed summary of the profile")
+    plan_parser.set_defaults(func=plan)
+    upload_parser.set_defaults(func=upload)
+
+    apply_parser = subparsers.add_parser("apply", help="Upload the edits in a plan file to Wikidata")
+    apply_parser.add_argument("plan")
+    apply_parser.add_argument("--actions", nargs="+", choices=["value", "novalue"], default=None,
+                              help="which edits to apply, novalue is only applied by default "
+                                   "if add_no_value is set in config")
+    apply_parser.add_argument("--lexeme", nargs="+", default=None, help="only apply edits to these lexemes")
+    apply_parser.set_defaults(func=apply)
+    for subparser in (apply_parser, upload_parser):
+        subparser.add_argument("--no-prefetch", action="store_true",
+                               help="let WBI fetch every lexeme before writing instead of fetching "
+                                    "them in batches of 50")
+
+    dump_parser = subparsers.add_parser("dump", help="Write the Swedish lexemes in a lexeme dump to a local snapshot")
+    dump_parser.add_argument("dump", help="latest-lexemes.json.gz or .bz2")
+    dump_parser.add_argument("-o", "--output", default="data/lexemes_sv.jsonl")
+    dump_parser.add_argument("--processes", type=int, default=1,
+                             help="decompress and parse in parallel using this many processes")
+    dump_parser.set_defaults(func=dump)
+
+    graph_parser = subparsers.add_parser("graph", help="Query the see also graph of the extracted superlemmas")
+    graph_parser.add_argument("--superlemmas", default=jsonl_path("superlemmas"),
+                              help="superlemmas JSONL or a graph saved with --save")
+    graph_parser.add_argument("--save", default=None, help="save the graph as .npz")
+    graph_parser.add_argument("--page", default=None,
+                              help="print the pages reachable from this SO id, "
+                                   "otherwise print a report of the connected components")
+    graph_parser.add_argument("--hops", type=int, default=1)
+    graph_parser.add_argument("--reverse", action="store_true", help="follow the links backwards")
+    graph_parser.set_defaults(func=graph)
+
+    index_parser = subparsers.add_parser("index", help="Build the full-text index over idioms and definitions")
+    index_parser.add_argument("--idioms", default=jsonl_path("idioms"))
+    index_parser.add_argument("--superlemmas", default=jsonl_path("superlemmas"))
+    index_parser.add_argument("--directory", default="data/index")
+    index_parser.set_defaults(func=index)
+
+    search_parser = subparsers.add_parser("search", help="Search the idioms and definitions")
+    search_parser.add_argument("query")
+    search_parser.add_argument("--phrase", action="store_true", help="the words must follow each other")
+    search_parser.add_argument("--prefix", action="store_true", help="the last word is a prefix")
+    search_parser.add_argument("--limit", type=int, default=20)
+    search_parser.add_argument("--directory", default="data/index")
+    search_parser.set_defaults(func=search)
+
+    trie_parser = subparsers.add_parser("trie", help="Build the lemma trie and split compounds")
+    trie_parser.add_argument("words", nargs="*", help="look up or split these words")
+    trie_parser.add_argument("--build", action="store_true", help="build the trie from the list of SO identifiers")
+    trie_parser.add_argument("--csv", default="data/P9837.csv")
+    trie_parser.add_argument("--directory", default="data/trie")
+    trie_parser.add_argument("--prefix", action="store_true", help="list the lemmas starting with the words")
+    trie_parser.add_argument("--suffix", action="store_true", help="list the lemmas ending with the words")
+    trie_parser.set_defaults(func=trie)
+
+    diff_parser = subparsers.add_parser("diff", help="Compare the superlemmas, inflections and idioms "
+                                                     "of two extraction versions")
+    diff_parser.add_argument("old", help="version of the older extraction")
+    diff_parser.add_argument("new", help="version of the newer extraction")
+    diff_parser.add_argument("-o", "--output", default="data/changes.jsonl")
+    diff_parser.set_defaults(func=diff)
+
+    wordlist_parser = subparsers.add_parser("wordlist", help="Enumerate the word list of SO to update "
+                                                             "the list of identifiers")
+    wordlist_parser.add_argument("-o", "--output", default="data/P9837.new.csv",
+                                 help="resumes from the checkpoint next to this file if it exists")
+    wordlist_parser.add_argument("--csv", default="data/P9837.csv", help="list of identifiers to diff against")
+    wordlist_parser.add_argument("--max-pages", type=int, default=20000)
+    wordlist_parser.set_defaults(func=wordlist)
+
+    coverage_parser = subparsers.add_parser("coverage", help="Compute coverage statistics from a lexeme snapshot")
+    coverage_parser.add_argument("--snapshot", default="data/lexemes_sv.jsonl",
+                                 help="lexeme snapshot written by lexso dump")
+    coverage_parser.add_argument("-o", "--output", default=None, help="write the JSON report here")
+    coverage_parser.set_defaults(func=coverage)
+
+    export_parser = subparsers.add_parser("export", help="Export the edits in a plan file for QuickStatements "
+                                                         "or as wbeditentity JSON")
+    export_parser.add_argument("plan")
+    export_parser.add_argument("--format", choices=["quickstatements", "json"], default="quickstatements")
+    export_parser.add_argument("-o", "--output", default="data/plan.qs")
+    export_parser.add_argument("--actions", nargs="+", choices=["value", "novalue"], default=None,
+                               help="which edits to export, novalue is only exported by default "
+                                    "if add_no_value is set in config")
+    export_parser.add_argument("--no-prefetch", action="store_true",
+                               help="export without fetching the lexemes, lexemes that already have P9837 "
+                                    "are not skipped and every wbeditentity request adds P1343")
+    export_parser.set_defaults(func=export)
+
+    senses_parser = subparsers.add_parser("senses", help="Align the glosses of the lexemes with the SO definitions")
+    senses_parser.add_argument("--superlemmas", default=jsonl_path("superlemmas"))
+    senses_parser.add_argument("--snapshot", default="data/lexemes_sv.jsonl",
+                               help="lexeme snapshot written by lexso dump")
+    senses_parser.add_argument("--top", type=int, default=3, help="number of definitions per sense")
+    senses_parser.add_argument("-o", "--output", default="data/senses.jsonl")
+    senses_parser.set_defaults(func=senses)
+
+    reconcile_parser = subparsers.add_parser("reconcile", help="Plan the statements on the forms of matched lexemes "
+                                                               "that are missing or differ from SO")
+    reconcile_parser.add_argument("--field", choices=["hyphenation"], default="hyphenation")
+    reconcile_parser.add_argument("--superlemmas", default=jsonl_path("superlemmas"))
+    reconcile_parser.add_argument("--snapshot", default="data/lexemes_sv.jsonl",
+                                  help="lexeme snapshot written by lexso dump")
+    reconcile_parser.add_argument("--plan", default=None,
+                                  help="also reconcile the lexemes matched in this plan that are not uploaded yet")
+    reconcile_parser.add_argument("-o", "--output", default=None, help="defaults to data/FIELD.jsonl")
+    reconcile_parser.set_defaults(func=reconcile)
+
+    sort_parser = subparsers.add_parser("sort", help="Sort the extracted JSONL by SO id into indexed shards")
+    sort_parser.add_argument("--version", default=None, help="extraction version, defaults to the one in config")
+    sort_parser.add_argument("--directory", default=None, help="defaults to data/jsonl/sorted_VERSION")
+    sort_parser.add_argument("--run-size", type=int, default=100000,
+                             help="number of records sorted in memory at a time")
+    sort_parser.add_argument("--shard-size", type=int, default=64, help="maximum size of a shard in MB")
+    sort_parser.set_defaults(func=sort)
+
+    stats_parser = subparsers.add_parser("stats", help="Print a summary of the local data")
+    stats_parser.add_argument("--csv", default="data/P9837.csv")
+    stats_parser.add_argument("--corpus", action="store_true",
+                              help="report the lexical categories, years of publication, pronunciation "
+                                   "coverage, idioms and inflections of the extracted superlemmas and articles")
+    stats_parser.add_argument("--version", default=None, help="extraction version, defaults to the one in config")
+    stats_parser.add_argument("--format", choices=["markdown", "json"], default="markdown")
+    stats_parser.add_argument("-o", "--output", default=None, help="write the report here")
+    stats_parser.set_defaults(func=stats)
+    return parser
+
+
+def main(argv: List[str] = None):
+    logging.basicConfig(level=logging.WARNING)
+    args = build_parser().parse_args(argv)
+    if args.http is not None:
+        from modules import recorder
+        recorder.configure(args.http, args.http_store)
+    if getattr(args, "profile", None) is not None:
+        from modules.profiling import SamplingProfiler
+        with SamplingProfiler() as profiler:
+            args.func(args)
+        paths = profiler.write(args.profile or f"data/profile/{args.command}")
+        print(profiler.summary(top=args.profile_top))
+        print(f"Collapsed stacks written to {', '.join(paths)}")
+    else:
+        args.func(args)
+
+
+if __name__ == "__main__":
+    main()
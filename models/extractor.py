@@ -1,8 +1,10 @@
 import gzip
 import os
 import re
+import traceback
 import uuid
-from typing import List
+from typing import Dict, List, Optional, Set
+from urllib.parse import parse_qs, urlparse
 
 from bs4 import BeautifulSoup
 from jsonlines import jsonlines
@@ -10,6 +12,7 @@ from pydantic import BaseModel
 from tqdm import tqdm
 
 import config
+from modules.pages import ProcessedHashes, canonical_id, content_hash
 
 
 class DictionaryElement(BaseModel):
@@ -25,6 +28,7 @@ class DictionaryElement(BaseModel):
 
 class Inflection(DictionaryElement):
     prefix: str = "boj"
+    values: List[str] = []  # all inflected forms, value only holds the first
 
     @classmethod
     def from_soup(cls, soup):
@@ -32,7 +36,8 @@ class Inflection(DictionaryElement):
             return None
         id_ = soup.get("id", "")
         value = soup.find("span", class_="bojning").text.strip() if soup.find("span", class_="bojning") else ""
-        return cls(id_=id_, value=value)
+        values = [span.text.strip() for span in soup.find_all("span", class_="bojning")]
+        return cls(id_=id_, value=value, values=values)
 
 
 class Lemvar(DictionaryElement):
@@ -97,6 +102,7 @@ class Etymology(DictionaryElement):
 
 class SeeAlso(DictionaryElement):
     prefix: str = "xnr"
+    target_id: str = ""  # the SO id of the page that is linked to
 
     @classmethod
     def from_soup(cls, soup):
@@ -104,7 +110,10 @@ class SeeAlso(DictionaryElement):
             return None
         id_ = soup.get("id", "")
         value = soup.text.strip() if soup else ""
-        return cls(id_=id_, value=value)
+        target_ids = parse_qs(urlparse(soup.get("href", "")).query).get("id", [""])
+        # links to a homograph like ?id=167464_1 point to the page node of the graph
+        target_id = canonical_id(target_ids[0]) if target_ids[0] else ""
+        return cls(id_=id_, value=value, target_id=target_id)
 
 class Idiom(DictionaryElement):
     """Idioms that have a link are duplicate references to other pages where the data is found"""
@@ -177,6 +186,9 @@ class Lexem(DictionaryElement):
 
 class Superlemma(DictionaryElement):
     prefix: str = "snr"
+    page_id: str = ""  # the SO id of the page this was extracted from
+    homograph: int = 0  # the N in the SO id page_id_N, 0 if the superlemma is alone on its page
+    so_id: str = ""  # the SO id of this superlemma, e.g. 100095_2 for the second superlemma on page 100095
     lemvar: Lemvar
     hyphenation: str  # called 'avstav' # P5279
     lexical_category: str  # called 'ordklass'
@@ -227,6 +239,7 @@ class Superlemma(DictionaryElement):
 
 class Article(BaseModel):
     """Entry with year of publication and list of lemmas"""
+    page_id: str = ""  # the SO id of the page this was extracted from
     year_of_publication: str  # called 'tryck'
     lemmalist: List[Superlemma]  # lemmalista
 
@@ -252,25 +265,59 @@ class Article(BaseModel):
         return cls(year_of_publication=year_of_publication, lemmalist=lemmalist)
 
 
+def quarantine_entry(error: Exception, page_id: str = "", article: Optional[int] = None, path: str = "") -> dict:
+    """Where and why a page or an article on it could not be extracted"""
+    frames = traceback.extract_tb(error.__traceback__)
+    location = f"{os.path.basename(frames[-1].filename)}:{frames[-1].lineno} in {frames[-1].name}" if frames else ""
+    return {"page_id": page_id, "article": article, "path": path,
+            "error": f"{type(error).__name__}: {error}", "location": location}
+
+
 class Extractor(BaseModel):
     html: str = ""
     articles: List[Article] = []
     superlemmas: List[Superlemma] = []
     idioms: List[Idiom] = []
+    quarantined: List[dict] = []  # pages and articles that failed, see quarantine_entry
+    quarantined_count: int = 0
     articles_jsonl: str = "data/jsonl/articles_{}.jsonl"
     superlemmas_jsonl: str = "data/jsonl/superlemmas_{}.jsonl"
     idioms_jsonl: str = "data/jsonl/idioms_{}.jsonl"
+    hashes_txt: str = "data/jsonl/hashes_{}.txt"  # content hashes of the pages already extracted
+    quarantine_jsonl: str = "data/jsonl/quarantine_{}.jsonl"
 
-    def __extract_articles__(self):
-        """Parse the HTML content and extract articles."""
+    def __extract_articles__(self, page_id: str = "", only: Set[int] = None):
+        """Parse the HTML content and extract articles.
+        An article that fails is quarantined and the rest of the page is extracted,
+        only limits the extraction to the articles with these numbers"""
         soup = BeautifulSoup(self.html, 'lxml')
         article_divs = soup.find_all('div', class_='artikel so')
-
-        for article_div in article_divs:
-            article = Article.from_soup(article_div)
+        # The superlemmas on a page are numbered in order, also those in skipped articles
+        counts = [len(article_div.find_all("div", class_="superlemma")) for article_div in article_divs]
+        several = sum(counts) > 1
+
+        for number, article_div in enumerate(article_divs):
+            if only is not None and number not in only:
+                continue
+            try:
+                article = Article.from_soup(article_div)
+            except Exception as e:
+                self.quarantined.append(quarantine_entry(e, page_id=page_id, article=number))
+                continue
             if article and len(article.lemmalist) > 0:
+                if several:
+                    for homograph, lemma in enumerate(article.lemmalist, start=sum(counts[:number]) + 1):
+                        lemma.homograph = homograph
                 self.articles.append(article)
 
+    def __set_page_id(self, page_id: str):
+        """Record which page the articles and their superlemmas came from"""
+        for article in self.articles:
+            article.page_id = page_id
+            for lemma in article.lemmalist:
+                lemma.page_id = page_id
+                lemma.so_id = f"{page_id}_{lemma.homograph}" if lemma.homograph else page_id
+
     def __extract_superlemmas(self):
         """Extract superlemmas from articles."""
         for article in self.articles:
@@ -280,16 +327,68 @@ class Extractor(BaseModel):
     def __extract_idioms(self):
         """Extract idioms from superlemmas."""
         for lemma in self.superlemmas:
-            self.idioms.extend(lemma.lexem.idioms)
+            if lemma.lexem is not None:
+                self.idioms.extend(lemma.lexem.idioms)
         self.idioms = list(set(self.idioms))  # Deduplicate idioms
 
-    def __process_gzip_file(self, file_path):
-        """Process a single gzip file and extract articles."""
+    def __extract(self, page_id: str = "", only: Set[int] = None):
+        """Extract articles, superlemmas and idioms from self.html"""
+        self.__extract_articles__(page_id, only)
+        self.__set_page_id(page_id)
+        self.__extract_superlemmas()
+        self.__extract_idioms()
+
+    def __process_gzip_file(self, file_path, processed: ProcessedHashes = None,
+                            only: Set[int] = None) -> Optional[str]:
+        """Process a single gzip file and extract articles.
+        Pages with the same content as a page already processed are skipped.
+        Returns the content hash of the page or None if it was skipped"""
         with gzip.open(file_path, 'rt') as f:
             self.html = f.read()
-            self.__extract_articles__()
-            self.__extract_superlemmas()
-            self.__extract_idioms()
+        hash_ = content_hash(self.html)
+        if processed is not None and hash_ in processed:
+            return None
+        self.__extract(os.path.basename(file_path).split(".")[0], only)
+        return hash_
+
+    def __process_and_dump(self, file_path, processed: ProcessedHashes = None, only: Set[int] = None,
+                           record: ProcessedHashes = None):
+        """Process a gzip file and dump the results, a page that fails is quarantined.
+        The hash of the page is added to record, by default processed, only after
+        it was dumped so that a page that failed is extracted again on retry"""
+        record = record or processed
+        try:
+            hash_ = self.__process_gzip_file(file_path, processed, only)
+            if hash_ is not None:
+                self.__dump_articles_to_jsonl()
+                self.__dump_superlemmas_to_jsonl()
+                self.__dump_idioms_to_jsonl()
+                if record is not None:
+                    record.add(hash_)
+        except Exception as e:
+            self.quarantined.append(quarantine_entry(e, page_id=os.path.basename(file_path).split(".")[0],
+                                                     path=file_path))
+        self.__dump_quarantine_to_jsonl()
+        self.__reset_extracted_data()  # Clear data to free up memory
+
+    def extract_page(self, html: str, page_id: str = "") -> Dict[str, List[dict]]:
+        """Extract from the html of a single page and return the cleaned
+        dicts that would be dumped keyed by articles, superlemmas and idioms.
+        This is what the workers of the streaming crawl run"""
+        self.html = html
+        try:
+            self.__extract(page_id)
+            extracted = {
+                "articles": self.__cleaned_articles(),
+                "superlemmas": self.__cleaned_superlemmas(),
+                "idioms": self.__cleaned_idioms(),
+                "quarantine": self.quarantined,
+            }
+        except Exception as e:
+            extracted = {"articles": [], "superlemmas": [], "idioms": [],
+                         "quarantine": [quarantine_entry(e, page_id=page_id)]}
+        self.__reset_extracted_data()
+        return extracted
 
     # def process_gzip_files(self, directory_path="data/html"):
     #     """Process all gzip files in the directory one by one."""
@@ -306,23 +405,53 @@ class Extractor(BaseModel):
     def process_and_dump_individual_files(self, directory_path="data/html"):
         """Process gzip files one by one and dump results to JSONL to avoid memory issues."""
         self.__remove_existing_jsonl_files()
+        os.makedirs(os.path.dirname(self.hashes_txt), exist_ok=True)
+        processed = ProcessedHashes(self.hashes_txt.format(config.version))
         file_list = [file for file in os.listdir(directory_path) if file.endswith(".gz")]
         with tqdm(total=len(file_list), desc="Processing and dumping files") as pbar:
             for file_name in file_list:
                 file_path = os.path.join(directory_path, file_name)
-                self.__process_gzip_file(file_path)
-                self.__dump_articles_to_jsonl()
-                self.__dump_superlemmas_to_jsonl()
-                self.__dump_idioms_to_jsonl()
-                self.__reset_extracted_data()  # Clear data to free up memory
+                self.__process_and_dump(file_path, processed)
                 pbar.update(1)
                 # raise Exception("debug exit")
+        self.__print_quarantined()
+
+    def retry_quarantined(self, directory_path="data/html"):
+        """Process only the pages and articles in the quarantine again.
+        The ones that still fail end up in a new quarantine"""
+        from modules.pages import PageStore
+        path = self.quarantine_jsonl.format(config.version)
+        if not os.path.exists(path):
+            print(f"{path} does not exist, nothing to retry")
+            return
+        pages: Dict[str, Optional[Set[int]]] = {}  # None means the whole page
+        with jsonlines.open(path) as reader:
+            for entry in reader:
+                if entry.get("article") is None:
+                    pages[entry["page_id"]] = None
+                elif pages.get(entry["page_id"], set()) is not None:
+                    pages.setdefault(entry["page_id"], set()).add(entry["article"])
+        os.replace(path, path + ".retried")
+        store = PageStore(directory_path)
+        processed = ProcessedHashes(self.hashes_txt.format(config.version))
+        for page_id, only in tqdm(pages.items(), desc="Retrying quarantined pages"):
+            file_path = store.path(store.alias_of(page_id) or page_id)
+            # The quarantined pages are never skipped by their hash, a whole page is recorded
+            # as processed once it succeeds and the rest of a page with failed articles already is
+            self.__process_and_dump(file_path, only=only, record=processed if only is None else None)
+        self.__print_quarantined()
+
+    def __print_quarantined(self):
+        if self.quarantined_count:
+            print(f"{self.quarantined_count} pages or articles failed and were quarantined in "
+                  f"{self.quarantine_jsonl.format(config.version)}, retry them with lexso extract --retry")
 
     def __reset_extracted_data(self):
         """Reset extracted data to free up memory."""
         self.articles = []
         self.superlemmas = []
         self.idioms = []
+        self.quarantined = []
 
     @staticmethod
     def remove_special_characters(obj):
@@ -335,28 +464,65 @@ class Extractor(BaseModel):
             return [Extractor.remove_special_characters(item) for item in obj]
         return obj
 
+    def __cleaned_articles(self) -> List[dict]:
+        return [Extractor.remove_special_characters(article.model_dump()) for article in self.articles]
+
+    def __cleaned_superlemmas(self) -> List[dict]:
+        return [Extractor.remove_special_characters(superlemma.model_dump()) for superlemma in self.superlemmas]
+
+    def __cleaned_idioms(self) -> List[dict]:
+        """We only keep idioms that does not have a link"""
+        return [Extractor.remove_special_characters(idiom.model_dump()) for idiom in self.idioms
+                if not idiom.has_link]
+
     def __dump_articles_to_jsonl(self):
         """Dump articles to a JSONL file."""
         with jsonlines.open(self.articles_jsonl.format(config.version), mode='a') as writer:
-            for article in self.articles:
-                article_dict = article.model_dump()
-                cleaned_article = Extractor.remove_special_characters(article_dict)
-                writer.write(cleaned_article)
+            writer.write_all(self.__cleaned_articles())
 
     def __dump_superlemmas_to_jsonl(self):
         """Dump superlemmas to a JSONL file."""
         with jsonlines.open(self.superlemmas_jsonl.format(config.version), mode='a') as writer:
-            for superlemma in self.superlemmas:
-                dict_ = superlemma.model_dump()
-                cleaned_dict = Extractor.remove_special_characters(dict_)
-                writer.write(cleaned_dict)
+            writer.write_all(self.__cleaned_superlemmas())
+
+    def __dump_quarantine_to_jsonl(self):
+        if self.quarantined:
+            with jsonlines.open(self.quarantine_jsonl.format(config.version), mode='a') as writer:
+                writer.write_all(self.quarantined)
+            self.quarantined_count += len(self.quarantined)
 
     def __dump_idioms_to_jsonl(self):
         """Dump idioms to a JSONL file.
         We only dump idioms that does not have a link"""
         with jsonlines.open(self.idioms_jsonl.format(config.version), mode='a') as writer:
-            for idiom in self.idioms:
-                if not idiom.has_link:
-                    dict_ = idiom.model_dump()
-                    cleaned_dict = Extractor.remove_special_characters(dict_)
-                    writer.write(cleaned_dict)
+            writer.write_all(self.__cleaned_idioms())
+
+
+class JsonlSink:
+    """Keeps the JSONL files of an extractor open while a stream
+    of extracted pages is written to them"""
+    def __init__(self, extractor: Extractor = None):
+        extractor = extractor or Extractor()
+        self.paths = {
+            "articles": extractor.articles_jsonl.format(config.version),
+            "superlemmas": extractor.superlemmas_jsonl.format(config.version),
+            "idioms": extractor.idioms_jsonl.format(config.version),
+            "quarantine": extractor.quarantine_jsonl.format(config.version),
+        }
+        self.writers = {}
+
+    def __enter__(self):
+        for name, path in self.paths.items():
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # flushed on every write, the page is recorded as processed right after it
+            self.writers[name] = jsonlines.open(path, mode='a', flush=True)
+        return self
+
+    def __exit__(self, *args):
+        for writer in self.writers.values():
+            writer.close()
+
+    def write(self, extracted: Dict[str, List[dict]]):
+        """Write the output of Extractor.extract_page"""
+        for name, records in extracted.items():
+            self.writers[name].write_all(records)
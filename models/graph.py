@@ -0,0 +1,150 @@
+"""Cross-reference graph over the see also links of the extracted superlemmas
+
+The nodes are SO page ids mapped to integers and the edges are stored in
+compressed sparse row (CSR) layout: the targets of node i are
+targets[offsets[i]:offsets[i + 1]]. The reverse edges are stored the same way
+so that both directions can be walked without scanning all edges."""
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+from jsonlines import jsonlines
+
+
+def expand(offsets: np.ndarray, targets: np.ndarray, frontier: np.ndarray) -> np.ndarray:
+    """All targets of the nodes in the frontier in one vectorized gather"""
+    starts = offsets[frontier]
+    lengths = offsets[frontier + 1] - starts
+    if lengths.sum() == 0:
+        return np.empty(0, dtype=targets.dtype)
+    # position of every gathered edge = start of its node + its rank within the node
+    ends = np.cumsum(lengths)
+    positions = np.repeat(starts - ends + lengths, lengths) + np.arange(ends[-1])
+    return targets[positions]
+
+
+def csr(sources: np.ndarray, destinations: np.ndarray, node_count: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Build offsets and targets from edge arrays"""
+    order = np.lexsort((destinations, sources))
+    offsets = np.zeros(node_count + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sources, minlength=node_count), out=offsets[1:])
+    return offsets, destinations[order].astype(np.int32)
+
+
+class SeeAlsoGraph:
+    page_ids: List[str]  # node id -> SO page id
+    index: Dict[str, int]  # SO page id -> node id
+    offsets: np.ndarray
+    targets: np.ndarray
+    reverse_offsets: np.ndarray
+    reverse_targets: np.ndarray
+
+    def __init__(self, page_ids: List[str], offsets: np.ndarray, targets: np.ndarray,
+                 reverse_offsets: np.ndarray, reverse_targets: np.ndarray):
+        self.page_ids = page_ids
+        self.index = {page_id: number for number, page_id in enumerate(page_ids)}
+        self.offsets = offsets
+        self.targets = targets
+        self.reverse_offsets = reverse_offsets
+        self.reverse_targets = reverse_targets
+
+    def __len__(self):
+        return len(self.page_ids)
+
+    @property
+    def edge_count(self) -> int:
+        return len(self.targets)
+
+    @classmethod
+    def from_edges(cls, edges: Iterable[Tuple[str, str]]) -> "SeeAlsoGraph":
+        """Build the graph from (page id, linked page id) pairs, duplicates and self links are dropped"""
+        index: Dict[str, int] = {}
+        sources = []
+        destinations = []
+        for source, destination in edges:
+            if source == destination:
+                continue
+            sources.append(index.setdefault(source, len(index)))
+            destinations.append(index.setdefault(destination, len(index)))
+        node_count = len(index)
+        pairs = np.unique(np.array([sources, destinations], dtype=np.int64).reshape(2, -1), axis=1)
+        offsets, targets = csr(pairs[0], pairs[1], node_count)
+        reverse_offsets, reverse_targets = csr(pairs[1], pairs[0], node_count)
+        return cls(list(index), offsets, targets, reverse_offsets, reverse_targets)
+
+    @classmethod
+    def from_superlemmas_jsonl(cls, path: str) -> "SeeAlsoGraph":
+        def edges():
+            with jsonlines.open(path) as reader:
+                for superlemma in reader:
+                    lexem = superlemma.get("lexem") or {}
+                    for see_also in lexem.get("see_alsos", []):
+                        if see_also.get("target_id"):
+                            yield superlemma["page_id"], see_also["target_id"]
+        return cls.from_edges(edges())
+
+    def save(self, path: str):
+        np.savez(path, page_ids=np.array(self.page_ids), offsets=self.offsets, targets=self.targets,
+                 reverse_offsets=self.reverse_offsets, reverse_targets=self.reverse_targets)
+
+    @classmethod
+    def load(cls, path: str) -> "SeeAlsoGraph":
+        with np.load(path) as data:
+            return cls(data["page_ids"].tolist(), data["offsets"], data["targets"],
+                       data["reverse_offsets"], data["reverse_targets"])
+
+    def __nodes(self, page_ids: Iterable[str]) -> np.ndarray:
+        return np.array([self.index[page_id] for page_id in page_ids if page_id in self.index], dtype=np.int64)
+
+    def __page_ids(self, nodes: np.ndarray) -> List[str]:
+        return [self.page_ids[node] for node in nodes]
+
+    def neighbors(self, page_id: str) -> List[str]:
+        """The pages this page links to"""
+        return self.__page_ids(expand(self.offsets, self.targets, self.__nodes([page_id])))
+
+    def reverse_neighbors(self, page_id: str) -> List[str]:
+        """The pages that link to this page"""
+        return self.__page_ids(expand(self.reverse_offsets, self.reverse_targets, self.__nodes([page_id])))
+
+    def k_hop(self, page_id: str, k: int, reverse: bool = False) -> Dict[str, int]:
+        """All pages reachable in at most k hops with their distance"""
+        offsets, targets = (self.reverse_offsets, self.reverse_targets) if reverse else (self.offsets, self.targets)
+        frontier = self.__nodes([page_id])
+        distance = np.full(len(self), -1, dtype=np.int32)
+        distance[frontier] = 0
+        for hop in range(1, k + 1):
+            reached = np.unique(expand(offsets, targets, frontier))
+            frontier = reached[distance[reached] == -1]
+            if len(frontier) == 0:
+                break
+            distance[frontier] = hop
+        nodes = np.flatnonzero(distance > 0)
+        return dict(zip(self.__page_ids(nodes), distance[nodes].tolist()))
+
+    def connected_components(self) -> np.ndarray:
+        """Label of the weakly connected component of every node.
+        Labels are propagated along the edges with pointer jumping until they are stable"""
+        labels = np.arange(len(self), dtype=np.int64)
+        sources = np.repeat(np.arange(len(self)), np.diff(self.offsets))
+        destinations = self.targets.astype(np.int64)
+        while True:
+            minimum = np.minimum(labels[sources], labels[destinations])
+            new_labels = labels.copy()
+            np.minimum.at(new_labels, sources, minimum)
+            np.minimum.at(new_labels, destinations, minimum)
+            while not np.array_equal(new_labels, new_labels[new_labels]):
+                new_labels = new_labels[new_labels]
+            if np.array_equal(new_labels, labels):
+                return labels
+            labels = new_labels
+
+    def components_report(self, top: int = 10) -> Dict:
+        labels = self.connected_components()
+        _, sizes = np.unique(labels, return_counts=True)
+        sizes = np.sort(sizes)[::-1]
+        return {
+            "nodes": len(self),
+            "edges": self.edge_count,
+            "components": len(sizes),
+            "largest": sizes[:top].tolist(),
+        }
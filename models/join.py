@@ -0,0 +1,112 @@
+"""Join the forms of Wikidata lexemes with the inflections extracted from SO
+
+Both sides are reduced to sets of written forms. The SO side is loaded once
+into a hashed index from form to entry number and every lexeme is then
+scored against its candidate entries in a single pass over its forms."""
+import re
+from collections import Counter
+from typing import Dict, Iterable, List, Set
+
+from jsonlines import jsonlines
+
+from modules.pages import entry_id
+
+
+def split_forms(text: str) -> Set[str]:
+    """Split the text of a bojning span into forms.
+    Abbreviated endings like -en and markers like el. are dropped"""
+    forms = set()
+    for token in re.split(r"[\s,;/]+", text.replace("\u00ad", "")):
+        if token and not token.startswith("-") and not token.endswith(".") and any(c.isalpha() for c in token):
+            forms.add(token.lower())
+    return forms
+
+
+class FormJoin:
+    """Hashed index over the forms of all extracted superlemmas"""
+    page_ids: List[str]
+    so_ids: List[str]
+    superlemma_ids: List[str]
+    lemmas: List[str]
+    lexical_categories: List[str]
+    forms: List[Set[str]]
+    form_index: Dict[str, List[int]]
+    lemma_index: Dict[str, List[int]]
+
+    def __init__(self):
+        self.page_ids = []
+        self.so_ids = []
+        self.superlemma_ids = []
+        self.lemmas = []
+        self.lexical_categories = []
+        self.forms = []
+        self.form_index = {}
+        self.lemma_index = {}
+
+    def __len__(self):
+        return len(self.superlemma_ids)
+
+    def add_superlemma(self, superlemma: Dict):
+        """Add a dumped superlemma, i.e. the output of model_dump()"""
+        number = len(self.superlemma_ids)
+        lemvar = superlemma["lemvar"]
+        lemma = lemvar["value"]
+        forms = split_forms(lemma)
+        for inflection in lemvar.get("inflections", []):
+            for value in inflection.get("values") or [inflection["value"]]:
+                forms |= split_forms(value)
+        self.page_ids.append(superlemma.get("page_id", ""))
+        # superlemmas extracted before the so_id was recorded only have the page
+        self.so_ids.append(entry_id(superlemma))
+        self.superlemma_ids.append(superlemma["id_"])
+        self.lemmas.append(lemma)
+        self.lexical_categories.append(superlemma.get("lexical_category", ""))
+        self.forms.append(forms)
+        self.lemma_index.setdefault(lemma, []).append(number)
+        for form in forms:
+            self.form_index.setdefault(form, []).append(number)
+
+    @classmethod
+    def from_superlemmas_jsonl(cls, path: str) -> "FormJoin":
+        join = cls()
+        with jsonlines.open(path) as reader:
+            for superlemma in reader:
+                join.add_superlemma(superlemma)
+        return join
+
+    def candidates(self, lemma: str) -> List[int]:
+        """Entry numbers of all superlemmas with this lemma"""
+        return self.lemma_index.get(lemma, [])
+
+    def score(self, lemma: str, forms: Iterable[str]) -> Dict[int, float]:
+        """Score the lexeme against every superlemma with the same lemma.
+        The score is the overlap of the form sets divided by their union"""
+        candidates = self.candidates(lemma)
+        if not candidates:
+            return {}
+        lexeme_forms = {form.lower() for form in forms} | {lemma.lower()}
+        candidate_set = set(candidates)
+        overlap = Counter()
+        for form in lexeme_forms:
+            for number in self.form_index.get(form, []):
+                if number in candidate_set:
+                    overlap[number] += 1
+        return {
+            number: overlap[number] / len(lexeme_forms | self.forms[number])
+            for number in candidates
+        }
+
+    def score_lexemes(self, lexemes: Iterable) -> Dict[str, Dict[int, float]]:
+        """Score all lexemes in one pass, the key is the lexeme id"""
+        return {
+            lexeme.id: self.score(lexeme.lemma, [form.representation for form in lexeme.forms])
+            for lexeme in lexemes
+        }
+
+    def entry_scores(self, lemma: str, forms: Iterable[str]) -> Dict[str, float]:
+        """Best score per SO id, homographs on the same page have their own id like 100095_1 and 100095_2"""
+        scores = {}
+        for number, score in self.score(lemma, forms).items():
+            so_id = self.so_ids[number]
+            scores[so_id] = max(score, scores.get(so_id, 0.0))
+        return scores
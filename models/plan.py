@@ -0,0 +1,89 @@
+"""Plans of P9837 edits
+
+The plan is computed offline by the matcher and written as JSONL sorted by
+lexeme id so that plans can be reviewed and diffed before they are applied."""
+from typing import Iterable, Iterator, List, Literal, Optional
+
+from jsonlines import jsonlines
+from pydantic import BaseModel
+
+Action = Literal["value", "novalue", "skip"]
+
+
+class PlannedEdit(BaseModel):
+    """A proposed edit to a single lexeme"""
+    lexeme_id: str
+    lemma: str
+    lexical_category: str
+    action: Action
+    so_id: Optional[str] = None  # the value for action=value
+    reason: str = ""
+    candidates: List[str] = []  # SO ids that had the same lemma
+
+    @property
+    def number(self) -> int:
+        return int(self.lexeme_id[1:])
+
+
+def read_edits(path: str) -> Iterator[PlannedEdit]:
+    """Stream the edits of a plan file without loading the whole plan"""
+    with jsonlines.open(path) as reader:
+        for line in reader:
+            yield PlannedEdit(**line)
+
+
+class EditPlan(BaseModel):
+    edits: List[PlannedEdit] = []
+
+    def __len__(self):
+        return len(self.edits)
+
+    def count(self, action: Action) -> int:
+        return sum(1 for edit in self.edits if edit.action == action)
+
+    def filter(self, actions: Iterable[Action] = ("value", "novalue"),
+               lexeme_ids: Iterable[str] = None) -> "EditPlan":
+        """Return a new plan with a subset of the edits"""
+        actions = set(actions)
+        lexeme_ids = set(lexeme_ids) if lexeme_ids else None
+        return EditPlan(edits=[
+            edit for edit in self.edits
+            if edit.action in actions and (lexeme_ids is None or edit.lexeme_id in lexeme_ids)
+        ])
+
+    def write(self, path: str):
+        """Write the plan as JSONL sorted by lexeme id"""
+        with jsonlines.open(path, mode='w', compact=True) as writer:
+            for edit in sorted(self.edits, key=lambda edit: edit.number):
+                writer.write(edit.model_dump(exclude_defaults=True))
+
+    @classmethod
+    def read(cls, path: str) -> "EditPlan":
+        return cls(edits=list(read_edits(path)))
+
+    def __str__(self):
+        return (f"{len(self)} lexemes planned: "
+                f"{self.count('value')} values, "
+                f"{self.count('novalue')} novalues and "
+                f"{self.count('skip')} skipped")
+
+
+class PlannedStatement(BaseModel):
+    """A statement on a form that SO has a value for, see modules/reconcile.py"""
+    entity_id: str  # the form, e.g. L1-F1
+    lexeme_id: str
+    property: str
+    value: str  # the value from SO
+    action: Literal["add", "conflict"]
+    current: List[str] = []  # the values on Wikidata for action=conflict
+    so_id: str = ""
+    reason: str = ""
+
+
+def write_statements(statements: Iterable[PlannedStatement], path: str) -> int:
+    """Write the statements as JSONL sorted by lexeme id and form, returns the number written"""
+    statements = sorted(statements, key=lambda statement: (int(statement.lexeme_id[1:]), statement.entity_id))
+    with jsonlines.open(path, mode='w', compact=True) as writer:
+        for statement in statements:
+            writer.write(statement.model_dump(exclude_defaults=True))
+    return len(statements)
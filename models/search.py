@@ -0,0 +1,162 @@
+"""Full-text inverted index over idioms and kernel definitions
+
+The index is written to a directory:
+    documents.jsonl    one document per line, the document id is the line number
+    documents.npy      byte offset of every document in documents.jsonl
+    terms.bin          all terms sorted and utf-8 encoded back to back
+    terms.npy          byte offset of every term in terms.bin
+    postings.npy       offset of the postings of every term in docs.npy/positions.npy
+    docs.npy           document id of every posting
+    positions.npy      position of the token in the document of every posting
+
+The arrays are memory mapped on load so only the pages a query touches are read."""
+import json
+import os
+import re
+from bisect import bisect_left
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+import numpy as np
+from jsonlines import jsonlines
+
+# Gap between the positions of the fields of a document so that phrases don't match across fields,
+# longer phrases are rejected
+field_gap = 16
+position_bits = 20
+position_mask = (1 << position_bits) - 1
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase words with soft hyphens removed, \\w covers å, ä and ö"""
+    return re.findall(r"\w+", text.replace("\u00ad", "").lower())
+
+
+class Terms:
+    """Sequence view of the sorted terms in terms.bin for bisect"""
+    def __init__(self, blob: np.ndarray, offsets: np.ndarray):
+        self.blob = blob
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, number: int) -> str:
+        return bytes(self.blob[self.offsets[number]:self.offsets[number + 1]]).decode("utf-8")
+
+
+class IdiomIndex:
+    directory: str
+
+    def __init__(self, directory: str = "data/index"):
+        self.directory = directory
+        self.terms = Terms(self.__load("terms.bin"), self.__load("terms.npy"))
+        self.postings = self.__load("postings.npy")
+        self.docs = self.__load("docs.npy")
+        self.positions = self.__load("positions.npy")
+        self.document_offsets = self.__load("documents.npy")
+
+    def __load(self, name: str) -> np.ndarray:
+        path = os.path.join(self.directory, name)
+        if name.endswith(".bin"):
+            return np.memmap(path, dtype=np.uint8, mode="r") if os.path.getsize(path) else np.empty(0, np.uint8)
+        return np.load(path, mmap_mode="r")
+
+    @staticmethod
+    def documents_from_jsonl(idioms_jsonl: str = None, superlemmas_jsonl: str = None) -> Iterator[Dict]:
+        """The idioms with their phrase, definition and example and
+        the kernel definitions of the superlemmas as documents"""
+        if idioms_jsonl is not None:
+            with jsonlines.open(idioms_jsonl) as reader:
+                for idiom in reader:
+                    yield {"id": idiom["id_"], "type": "idiom", "value": idiom["value"],
+                           "definition": idiom["definition"], "example": idiom["example"]}
+        if superlemmas_jsonl is not None:
+            with jsonlines.open(superlemmas_jsonl) as reader:
+                for superlemma in reader:
+                    for kernel in (superlemma.get("lexem") or {}).get("kernels", []):
+                        yield {"id": kernel["id_"], "type": "kernel", "value": kernel["value"],
+                               "lemma": superlemma["value"], "page_id": superlemma.get("page_id", "")}
+
+    @classmethod
+    def build(cls, documents: Iterable[Dict], directory: str = "data/index",
+              fields: Tuple[str, ...] = ("value", "definition", "example")) -> "IdiomIndex":
+        os.makedirs(directory, exist_ok=True)
+        postings: Dict[str, List[int]] = {}
+        document_offsets = [0]
+        with open(os.path.join(directory, "documents.jsonl"), "wb") as f:
+            for number, document in enumerate(documents):
+                position = 0
+                for field in fields:
+                    for token in tokenize(document.get(field, "")):
+                        postings.setdefault(token, []).append((number << position_bits) | position)
+                        position += 1
+                    position += field_gap
+                line = json.dumps(document, ensure_ascii=False).encode("utf-8") + b"\n"
+                f.write(line)
+                document_offsets.append(document_offsets[-1] + len(line))
+        terms = sorted(postings)
+        encoded = [term.encode("utf-8") for term in terms]
+        term_offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        np.cumsum([len(term) for term in encoded], out=term_offsets[1:])
+        posting_offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        np.cumsum([len(postings[term]) for term in terms], out=posting_offsets[1:])
+        keys = np.fromiter((key for term in terms for key in postings[term]), dtype=np.int64,
+                           count=int(posting_offsets[-1]))
+        with open(os.path.join(directory, "terms.bin"), "wb") as f:
+            f.write(b"".join(encoded))
+        np.save(os.path.join(directory, "terms.npy"), term_offsets)
+        np.save(os.path.join(directory, "postings.npy"), posting_offsets)
+        np.save(os.path.join(directory, "docs.npy"), (keys >> position_bits).astype(np.int32))
+        np.save(os.path.join(directory, "positions.npy"), (keys & position_mask).astype(np.int32))
+        np.save(os.path.join(directory, "documents.npy"), np.array(document_offsets, dtype=np.int64))
+        return cls(directory)
+
+    def __term_range(self, term: str, prefix: bool = False) -> Tuple[int, int]:
+        """Range of term numbers equal to or starting with the term"""
+        start = bisect_left(self.terms, term)
+        if not prefix:
+            found = start < len(self.terms) and self.terms[start] == term
+            return start, start + 1 if found else start
+        # U+10FFFF sorts after every character that can follow the prefix
+        return start, bisect_left(self.terms, term + "\U0010ffff", lo=start)
+
+    def __keys(self, term: str, prefix: bool = False) -> np.ndarray:
+        """Postings of the term(s) as (document << position_bits) | position"""
+        start, stop = self.__term_range(term, prefix)
+        begin, end = self.postings[start], self.postings[stop]
+        docs = np.asarray(self.docs[begin:end], dtype=np.int64)
+        return (docs << position_bits) | np.asarray(self.positions[begin:end], dtype=np.int64)
+
+    def document(self, number: int) -> Dict:
+        with open(os.path.join(self.directory, "documents.jsonl"), "rb") as f:
+            f.seek(int(self.document_offsets[number]))
+            return json.loads(f.readline())
+
+    def prefix_terms(self, prefix: str, limit: int = 20) -> List[str]:
+        start, stop = self.__term_range(prefix.lower(), prefix=True)
+        return [self.terms[number] for number in range(start, min(stop, start + limit))]
+
+    def search(self, query: str, phrase: bool = False, prefix: bool = False, limit: int = 20) -> List[Dict]:
+        """Documents containing all words of the query.
+        With phrase the words must follow each other and with prefix
+        the last word matches every term starting with it"""
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        if phrase and len(tokens) > field_gap:
+            raise ValueError(f"A phrase can have at most {field_gap} words, the gap between the fields")
+        result = None
+        for number, token in enumerate(tokens):
+            keys = self.__keys(token, prefix=prefix and number == len(tokens) - 1)
+            if phrase:
+                # shift the positions back so that a phrase lines up with its first word,
+                # a word too early in its document to be the number'th would borrow from the document id
+                keys = keys[(keys & position_mask) >= number]
+                candidates = np.unique(keys - number)
+            else:
+                candidates = np.unique(keys >> position_bits)
+            result = candidates if result is None else np.intersect1d(result, candidates, assume_unique=True)
+            if len(result) == 0:
+                return []
+        documents = np.unique(result >> position_bits) if phrase else result
+        return [self.document(int(number)) for number in documents[:limit]]
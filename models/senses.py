@@ -0,0 +1,166 @@
+"""Align the senses of Wikidata lexemes with the kernel definitions of SO
+
+Both the Swedish glosses and the kernel definitions (kbetydelse) are embedded
+as sparse TF-IDF vectors in one CSR matrix: the terms of document i are
+terms[offsets[i]:offsets[i + 1]] with their weights in weights. The candidate
+pairs are every sense and kernel whose lemmas are equal, and the cosine of all
+pairs is computed at once by joining the gathered rows on (pair, term)."""
+from collections import Counter
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+from jsonlines import jsonlines
+
+from models.search import tokenize
+from modules.pages import entry_id
+
+
+def tfidf(documents: Iterable[List[str]]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Offsets, term numbers and L2 normalized weights of the tokenized documents"""
+    vocabulary: Dict[str, int] = {}
+    offsets = [0]
+    terms: List[int] = []
+    counts: List[int] = []
+    for tokens in documents:
+        counter = Counter(vocabulary.setdefault(token, len(vocabulary)) for token in tokens)
+        for term in sorted(counter):
+            terms.append(term)
+            counts.append(counter[term])
+        offsets.append(len(terms))
+    offsets = np.array(offsets, dtype=np.int64)
+    terms = np.array(terms, dtype=np.int64)
+    document_count = len(offsets) - 1
+    owners = np.repeat(np.arange(document_count), np.diff(offsets))
+    idf = np.log((1 + document_count) / (1 + np.bincount(terms, minlength=len(vocabulary)))) + 1
+    weights = (1 + np.log(np.array(counts, dtype=np.float64))) * idf[terms]
+    norms = np.sqrt(np.bincount(owners, weights=weights ** 2, minlength=document_count))
+    weights /= np.where(norms > 0, norms, 1)[owners]
+    return offsets, terms, weights
+
+
+def gather(offsets: np.ndarray, documents: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Positions of the entries of all the documents and the number of the document each belongs to"""
+    starts = offsets[documents]
+    lengths = offsets[documents + 1] - starts
+    ends = np.cumsum(lengths)
+    positions = np.repeat(starts - ends + lengths, lengths) + np.arange(ends[-1] if len(ends) else 0)
+    return positions, np.repeat(np.arange(len(documents)), lengths)
+
+
+def pair_cosines(offsets: np.ndarray, terms: np.ndarray, weights: np.ndarray,
+                 left: np.ndarray, right: np.ndarray) -> np.ndarray:
+    """Cosine of document left[i] and right[i] for every i"""
+    if len(left) == 0:
+        return np.zeros(0)
+    vocabulary_size = int(terms.max()) + 1 if len(terms) else 1
+    left_positions, left_pairs = gather(offsets, left)
+    right_positions, right_pairs = gather(offsets, right)
+    # a term occurs once per document so the keys are unique on each side
+    _, left_matches, right_matches = np.intersect1d(left_pairs * vocabulary_size + terms[left_positions],
+                                                    right_pairs * vocabulary_size + terms[right_positions],
+                                                    assume_unique=True, return_indices=True)
+    products = weights[left_positions[left_matches]] * weights[right_positions[right_matches]]
+    return np.bincount(left_pairs[left_matches], weights=products, minlength=len(left))
+
+
+def rank_in_groups(keys: np.ndarray) -> np.ndarray:
+    """Rank of every element within its group of equal sorted keys"""
+    starts = np.r_[True, keys[1:] != keys[:-1]] if len(keys) else np.zeros(0, dtype=bool)
+    group_start = np.maximum.accumulate(np.where(starts, np.arange(len(keys)), 0))
+    return np.arange(len(keys)) - group_start
+
+
+class SenseAlignment:
+    """Glosses of the lexemes and kernels of the superlemmas with the same lemmas"""
+    def __init__(self):
+        self.sense_ids: List[str] = []
+        self.glosses: List[str] = []
+        self.sense_lexemes: List[str] = []
+        self.sense_lemmas: List[str] = []
+        self.kernel_ids: List[str] = []
+        self.kernels: List[str] = []
+        self.kernel_entries: List[str] = []  # the SO id of the superlemma of every kernel
+        self.kernel_index: Dict[str, List[int]] = {}  # lemma -> kernel numbers
+
+    def add_superlemma(self, superlemma: Dict):
+        """Add the kernels of a dumped superlemma"""
+        for kernel in (superlemma.get("lexem") or {}).get("kernels", []):
+            self.kernel_index.setdefault(superlemma["value"], []).append(len(self.kernel_ids))
+            self.kernel_ids.append(kernel["id_"])
+            self.kernels.append(kernel["value"])
+            self.kernel_entries.append(entry_id(superlemma))
+
+    def add_lexeme(self, record: Dict):
+        """Add the glosses of a record of a lexeme snapshot, see modules/dump.py"""
+        for sense in record.get("glosses", []):
+            self.sense_ids.append(sense["id"])
+            self.glosses.append(sense["gloss"])
+            self.sense_lexemes.append(record["id"])
+            self.sense_lemmas.append(record["lemma"])
+
+    @classmethod
+    def from_jsonl(cls, superlemmas_jsonl: str, snapshot: str) -> "SenseAlignment":
+        alignment = cls()
+        with jsonlines.open(superlemmas_jsonl) as reader:
+            for superlemma in reader:
+                alignment.add_superlemma(superlemma)
+        with jsonlines.open(snapshot) as reader:
+            for record in reader:
+                if record["lemma"] in alignment.kernel_index:
+                    alignment.add_lexeme(record)
+        return alignment
+
+    def candidate_pairs(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Sense and kernel numbers of every sense and kernel with the same lemma"""
+        kernels = [self.kernel_index.get(lemma, []) for lemma in self.sense_lemmas]
+        senses = np.repeat(np.arange(len(kernels)), [len(numbers) for numbers in kernels])
+        return senses, np.fromiter((number for numbers in kernels for number in numbers), dtype=np.int64,
+                                   count=len(senses))
+
+    def scores(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Sense number, kernel number and cosine of all candidate pairs"""
+        senses, kernels = self.candidate_pairs()
+        offsets, terms, weights = tfidf(tokenize(text) for text in self.glosses + self.kernels)
+        return senses, kernels, pair_cosines(offsets, terms, weights, senses, kernels + len(self.glosses))
+
+    def top(self, k: int = 3) -> List[Dict]:
+        """The k most similar kernels of every sense"""
+        senses, kernels, cosines = self.scores()
+        order = np.lexsort((-cosines, senses))
+        senses, kernels, cosines = senses[order], kernels[order], cosines[order]
+        keep = (rank_in_groups(senses) < k) & (cosines > 0)
+        return [{
+            "lexeme_id": self.sense_lexemes[sense],
+            "sense_id": self.sense_ids[sense],
+            "gloss": self.glosses[sense],
+            "kernel_id": self.kernel_ids[kernel],
+            "kernel": self.kernels[kernel],
+            "so_id": self.kernel_entries[kernel],
+            "score": round(float(cosine), 4),
+        } for sense, kernel, cosine in zip(senses[keep].tolist(), kernels[keep].tolist(), cosines[keep].tolist())]
+
+    def entry_scores(self) -> Dict[str, Dict[str, float]]:
+        """Lexeme id -> SO id -> mean over the senses of the lexeme of the best
+        cosine with a kernel of the superlemma, homographs on the same page
+        have their own id like 100095_1 and 100095_2"""
+        senses, kernels, cosines = self.scores()
+        if len(senses) == 0:
+            return {}
+        entries = {entry: number for number, entry in enumerate(dict.fromkeys(self.kernel_entries))}
+        entry_numbers = np.array([entries[entry] for entry in self.kernel_entries], dtype=np.int64)[kernels]
+        # best kernel per sense and superlemma
+        keys = senses * len(entries) + entry_numbers
+        order = np.lexsort((-cosines, keys))
+        best = order[rank_in_groups(keys[order]) == 0]
+        lexemes = {lexeme: number for number, lexeme in enumerate(dict.fromkeys(self.sense_lexemes))}
+        sense_lexemes = np.array([lexemes[lexeme] for lexeme in self.sense_lexemes], dtype=np.int64)
+        sense_counts = np.bincount(sense_lexemes, minlength=len(lexemes))
+        pair_keys = sense_lexemes[senses[best]] * len(entries) + entry_numbers[best]
+        unique_keys, inverse = np.unique(pair_keys, return_inverse=True)
+        means = np.bincount(inverse, weights=cosines[best]) / sense_counts[unique_keys // len(entries)]
+        lexeme_ids = list(lexemes)
+        so_ids = list(entries)
+        result: Dict[str, Dict[str, float]] = {}
+        for key, mean in zip(unique_keys.tolist(), means.tolist()):
+            result.setdefault(lexeme_ids[key // len(entries)], {})[so_ids[key % len(entries)]] = mean
+        return result
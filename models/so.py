@@ -6,18 +6,25 @@ class SOEntry:
     id: str = None
     lemma: str = None
     lexical_category: str = None
+    headword: str = None  # the lemma of the article the entry is found in, e.g. kår for ingenjörskår
     number: int = None
 
     def __init__(self,
                  id: str = None,
                  lemma: str = None,
                  lexical_category: str = None,
+                 headword: str = None,
                  number: int = None):
         self.id = id
         self.lemma = lemma
         self.lexical_category = lexical_category
+        self.headword = headword
         self.number = number
 
+    def page_id(self):
+        """The id of the page, homographs on the same page get _1, _2 etc."""
+        return self.id.split("_")[0]
+
     def scrape_details(self):
         """Scrape details from SO"""
         pass
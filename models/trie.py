@@ -0,0 +1,249 @@
+"""Trie over all SO lemmas and affixes with compound splitting
+
+The trie is stored as flat arrays in compressed sparse row layout so that it
+can be saved with numpy and memory mapped on load:
+    child_offsets[node]..child_offsets[node + 1] is the range of the children of node
+    child_chars[range]  the code points of the children, sorted
+    child_nodes[range]  the node numbers of the children
+    terminal[node]      bitmask of the categories of the lemma ending here, 0 if none
+    counts[node]        number of lemmas below the node
+The root is node 0. A second trie over the reversed lemmas answers suffix queries."""
+import csv
+import json
+import os
+from bisect import bisect_left
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+# Swedish linking morphemes (fogemorfem) allowed between the parts of a compound
+linking_morphemes = ("s", "e", "a", "u", "o")
+
+
+class ArrayTrie:
+    names = ("child_offsets", "child_chars", "child_nodes", "terminal", "counts")
+
+    def __init__(self, child_offsets: np.ndarray, child_chars: np.ndarray,
+                 child_nodes: np.ndarray, terminal: np.ndarray, counts: np.ndarray):
+        self.child_offsets = child_offsets
+        self.child_chars = child_chars
+        self.child_nodes = child_nodes
+        self.terminal = terminal
+        self.counts = counts
+
+    @classmethod
+    def build(cls, words: Dict[str, int]) -> "ArrayTrie":
+        """Build from words with their category bitmask"""
+        root: Dict = {}
+        for word, mask in words.items():
+            node = root
+            for char in word:
+                node = node.setdefault(char, {})
+            node[None] = node.get(None, 0) | mask
+        # number the nodes breadth first so the children of a node are contiguous
+        nodes = [root]
+        child_offsets = [0]
+        child_chars = []
+        child_nodes = []
+        terminal = []
+        for node in nodes:
+            terminal.append(node.get(None, 0))
+            for char in sorted(key for key in node if key is not None):
+                child_chars.append(ord(char))
+                child_nodes.append(len(nodes))
+                nodes.append(node[char])
+            child_offsets.append(len(child_chars))
+        # children always have higher numbers than their parent
+        counts = [1 if mask else 0 for mask in terminal]
+        for node in range(len(nodes) - 1, -1, -1):
+            for position in range(child_offsets[node], child_offsets[node + 1]):
+                counts[node] += counts[child_nodes[position]]
+        return cls(np.array(child_offsets, dtype=np.int32), np.array(child_chars, dtype=np.int32),
+                   np.array(child_nodes, dtype=np.int32), np.array(terminal, dtype=np.uint32),
+                   np.array(counts, dtype=np.int32))
+
+    def save(self, path: str):
+        os.makedirs(path, exist_ok=True)
+        for name in self.names:
+            np.save(os.path.join(path, f"{name}.npy"), getattr(self, name))
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "ArrayTrie":
+        mode = "r" if mmap else None
+        return cls(*(np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mode) for name in cls.names))
+
+    def child(self, node: int, char: str) -> Optional[int]:
+        start, stop = int(self.child_offsets[node]), int(self.child_offsets[node + 1])
+        code = ord(char)
+        # the children are few so a bisect over the memory mapped slice is cheap
+        position = bisect_left(self.child_chars, code, start, stop)
+        if position < stop and self.child_chars[position] == code:
+            return int(self.child_nodes[position])
+        return None
+
+    def find(self, word: str) -> Optional[int]:
+        """Node of the word or None"""
+        node = 0
+        for char in word:
+            node = self.child(node, char)
+            if node is None:
+                return None
+        return node
+
+    def prefixes(self, word: str, start: int = 0) -> Iterator[Tuple[int, int]]:
+        """(end, mask) of every word in the trie that word[start:end] equals"""
+        node = 0
+        for end in range(start, len(word)):
+            node = self.child(node, word[end])
+            if node is None:
+                return
+            if self.terminal[node]:
+                yield end + 1, int(self.terminal[node])
+
+    def words(self, node: int, prefix: str = "") -> Iterator[Tuple[str, int]]:
+        """All words below the node"""
+        stack = [(node, prefix)]
+        while stack:
+            node, prefix = stack.pop()
+            if self.terminal[node]:
+                yield prefix, int(self.terminal[node])
+            for position in range(int(self.child_offsets[node + 1]) - 1, int(self.child_offsets[node]) - 1, -1):
+                stack.append((int(self.child_nodes[position]), prefix + chr(self.child_chars[position])))
+
+
+class LemmaTrie:
+    """Lemmas of SO with their lexical categories"""
+    categories: List[str]
+
+    def __init__(self, forward: ArrayTrie, backward: ArrayTrie, categories: List[str]):
+        self.forward = forward
+        self.backward = backward
+        self.categories = categories
+
+    @classmethod
+    def build(cls, lemmas: Iterable[Tuple[str, str]]) -> "LemmaTrie":
+        """Build from (lemma, category) pairs. Affixes like lätt- and -fil
+        are stored without the hyphen"""
+        categories: List[str] = []
+        words: Dict[str, int] = {}
+        for lemma, category in lemmas:
+            lemma = lemma.strip("-").lower()
+            if not lemma or not category:
+                continue
+            if category not in categories:
+                if len(categories) == 32:
+                    raise ValueError("Only 32 categories fit in the bitmask")
+                categories.append(category)
+            words[lemma] = words.get(lemma, 0) | 1 << categories.index(category)
+        backward = {word[::-1]: mask for word, mask in words.items()}
+        return cls(ArrayTrie.build(words), ArrayTrie.build(backward), categories)
+
+    @classmethod
+    def from_csv(cls, csv_file: str = "data/P9837.csv") -> "LemmaTrie":
+        """Build from the lemmas with a category in the list of SO identifiers"""
+        with open(csv_file, "r", encoding="UTF-8") as f:
+            rows = csv.reader(f, delimiter="\t", quoting=csv.QUOTE_NONE)
+            return cls.build((row[1], row[2].strip()) for row in rows)
+
+    def save(self, path: str = "data/trie"):
+        self.forward.save(os.path.join(path, "forward"))
+        self.backward.save(os.path.join(path, "backward"))
+        with open(os.path.join(path, "categories.json"), "w", encoding="utf-8") as f:
+            json.dump(self.categories, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path: str = "data/trie", mmap: bool = True) -> "LemmaTrie":
+        with open(os.path.join(path, "categories.json"), "r", encoding="utf-8") as f:
+            categories = json.load(f)
+        return cls(ArrayTrie.load(os.path.join(path, "forward"), mmap=mmap),
+                   ArrayTrie.load(os.path.join(path, "backward"), mmap=mmap), categories)
+
+    def __categories(self, mask: int) -> List[str]:
+        return [category for number, category in enumerate(self.categories) if mask & 1 << number]
+
+    def lookup(self, lemma: str) -> List[str]:
+        """Categories of the lemma, empty if it is unknown"""
+        node = self.forward.find(lemma.lower())
+        return self.__categories(int(self.forward.terminal[node])) if node is not None else []
+
+    def __contains__(self, lemma: str) -> bool:
+        return bool(self.lookup(lemma))
+
+    def with_prefix(self, prefix: str, limit: int = 100) -> List[str]:
+        node = self.forward.find(prefix.lower())
+        if node is None:
+            return []
+        return [word for word, _ in zip((word for word, _ in self.forward.words(node, prefix.lower())),
+                                        range(limit))]
+
+    def with_suffix(self, suffix: str, limit: int = 100) -> List[str]:
+        reversed_suffix = suffix.lower()[::-1]
+        node = self.backward.find(reversed_suffix)
+        if node is None:
+            return []
+        words = (word[::-1] for word, _ in self.backward.words(node, reversed_suffix))
+        return [word for word, _ in zip(words, range(limit))]
+
+    def suffix_count(self, suffix: str) -> int:
+        """Number of lemmas ending with the suffix"""
+        node = self.backward.find(suffix.lower()[::-1])
+        return int(self.backward.counts[node]) if node is not None else 0
+
+    def segment(self, word: str, min_part: int = 2) -> Optional[List[str]]:
+        """Split a compound into known lemmas, e.g. ingenjörskår -> ingenjör, s, kår.
+        The linking morphemes are returned as parts of their own.
+        Dynamic programming over the positions finds the cheapest split of every
+        prefix of the word. The split with the fewest parts wins, ties are broken
+        by how many lemmas end with the last part, so that kår beats skår, and
+        then by the fewest linking morphemes. Returns None if no split exists"""
+        word = word.lower()
+        # best[i] = (parts, linking morphemes, previous position, linking morpheme) for word[:i]
+        best: List[Optional[Tuple[int, int, int, str]]] = [None] * (len(word) + 1)
+        best[0] = (0, 0, -1, "")
+        for start in range(len(word)):
+            if best[start] is None:
+                continue
+            parts, links, _, _ = best[start]
+            for end, _ in self.forward.prefixes(word, start):
+                if end - start < min_part or end == len(word):
+                    continue
+                candidates = [(end, (parts + 1, links, start, ""))]
+                if end < len(word) - min_part and word[end] in linking_morphemes:
+                    candidates.append((end + 1, (parts + 1, links + 1, start, word[end])))
+                for position, candidate in candidates:
+                    if best[position] is None or candidate[:2] < best[position][:2]:
+                        best[position] = candidate
+        # the last part is a lemma that ends the word, possibly after a linking morpheme
+        head = None
+        for start in range(min_part, len(word) - min_part + 1):
+            node = self.forward.find(word[start:])
+            if node is None or not self.forward.terminal[node]:
+                continue
+            for end, link in ((start, ""), (start - 1, word[start - 1])):
+                if best[end] is None or (link and (link not in linking_morphemes or best[end][3])):
+                    # two linking morphemes in a row are not allowed
+                    continue
+                parts, links, _, _ = best[end]
+                cost = (parts + 1, -self.suffix_count(word[start:]), links + bool(link))
+                if head is None or cost < head[0]:
+                    head = (cost, end, start, link)
+        if head is None:
+            return None
+        _, position, start, link = head
+        segments = [word[start:]] + ([link] if link else [])
+        while position > 0:
+            _, _, previous, link = best[position]
+            if link:
+                segments.append(link)
+                segments.append(word[previous:position - 1])
+            else:
+                segments.append(word[previous:position])
+            position = previous
+        return segments[::-1]
+
+    def head(self, word: str) -> Optional[Tuple[str, List[str]]]:
+        """The last part of the compound and its categories"""
+        segments = self.segment(word)
+        if segments is None:
+            return None
+        return segments[-1], self.lookup(segments[-1])
@@ -3,9 +3,6 @@ from datetime import datetime
 from enum import Enum
 from typing import List
 
-from wikibaseintegrator import wbi_core, wbi_datatype
-from wikibaseintegrator.wbi_functions import execute_sparql_query
-
 import config
 from modules.console import console
 
@@ -103,25 +100,52 @@ class ForeignID:
         self.no_value = no_value
 
 
+class Form:
+    id: str
+    representation: str
+
+    def __init__(self,
+                 id: str = None,
+                 representation: str = None):
+        self.id = id
+        self.representation = representation
+
+
 class Lexeme:
     id: str
     lemma: str
     lexical_category: str
+    forms: List[Form]
 
     def __init__(self,
                  id: str = None,
                  lemma: str = None,
-                 lexical_category: str = None):
+                 lexical_category: str = None,
+                 forms: List[Form] = None):
         self.id = EntityID(id).to_string()
         self.lemma = lemma
         self.lexical_category = lexical_category
+        self.forms = forms if forms is not None else []
+
+    @classmethod
+    def from_record(cls, record: dict) -> "Lexeme":
+        """Create from a record of a local lexeme snapshot, see modules/dump.py"""
+        return cls(
+            id=record["id"],
+            lemma=record["lemma"],
+            lexical_category=record["lexical_category"],
+            forms=[Form(id=form["id"], representation=form["representation"]) for form in record["forms"]]
+        )
 
     def url(self):
         return f"{config.wd_prefix}{self.id}"
 
     def upload_foreign_id_to_wikidata(self,
-                                      foreign_id: ForeignID = None):
-        """Upload to enrich the wonderfull Wikidata <3"""
+                                      foreign_id: ForeignID = None,
+                                      entity: dict = None):
+        """Upload to enrich the wonderfull Wikidata <3
+        If the entity JSON is given WBI does not fetch it again before writing"""
+        from wikibaseintegrator import wbi_core, wbi_datatype
         logger = logging.getLogger(__name__)
         if foreign_id is None:
             raise Exception("Foreign id was None")
@@ -141,7 +165,8 @@ class Lexeme:
                 )
                 item = wbi_core.ItemEngine(
                     data=[statement],
-                    item_id=self.id
+                    item_id=self.id,
+                    item_data=entity
                 )
                 # debug WBI error
                 # print(item.get_json_representation())
@@ -170,7 +195,8 @@ class Lexeme:
                     # Turn off described_by_source until
                     # https://github.com/LeMyst/WikibaseIntegrator/issues/208 is fixed
                     data=[statement, described_by_source],
-                    item_id=self.id
+                    item_id=self.id,
+                    item_data=entity
                 )
                 # debug WBI error
                 # print(item.get_json_representation())
@@ -183,10 +209,6 @@ class Lexeme:
                 # exit(0)
 
 
-class Form:
-    pass
-
-
 class Sense:
     pass
 
@@ -401,57 +423,118 @@ class LexemeLanguage:
     #                 ))
     #     print(f"{len(self.lexemes)} fetched")
 
-    def fetch_all_lexemes_without_so_id(self):
-        """download all swedish lexemes via sparql (~23000 as of 2021-04-05)"""
-        # dictionary with word as key and list in the value
-        # list[0] = lid
-        # list[1] = category Qid
+    def fetch_all_lexemes_without_so_id(self, **options):
+        """download all swedish lexemes via sparql (~23000 as of 2021-04-05)
+        The query is run in ranges of lexeme ids in parallel, the options
+        are passed to ShardedQuery, see modules/sharded_query.py"""
+        from modules.sharded_query import ShardedQuery
         with console.status("Fetching all Swedish lexemes without "
                             "Svenska Ord ID via a WDQS SPARQL query..."):
-            lexemes_data = {}
-            lexeme_lemma_list = []
-            for i in range(0, 80000, 40000):
-                # print(i)
-                results = execute_sparql_query(f"""
-                        select ?lexemeId ?lemma ?category
-                    WHERE {{
-                      #hint:Query hint:optimizer "None".
-                      ?lexemeId dct:language wd:Q9027;
-                                wikibase:lemma ?lemma;
-                                wikibase:lexicalCategory ?category.
-                      MINUS{{
-                        ?lexemeId wdt:P9837 [].
-                      }}
-                      MINUS {{
-                        # Exclude truthy no value statements
-                        ?lexemeId a wdno:P9837.                  
-                      }}
-                    }}
-            limit 40000
-            offset {i}
-                """)
-                if len(results) == 0:
-                    console.print("No lexeme found")
-                else:
-                    # print("adding lexemes to list")
-                    # pprint(results.keys())
-                    # pprint(results["results"].keys())
-                    # pprint(len(results["results"]["bindings"]))
-                    for result in results["results"]["bindings"]:
-                        # print(result)
-                        # *************************
-                        # Handle result and upload
-                        # *************************
-                        lemma = result["lemma"]["value"]
-                        lid = result["lexemeId"]["value"].replace(config.wd_prefix, "")
-                        lexical_category = result["category"]["value"].replace(config.wd_prefix, "")
-                        self.lexemes.append(Lexeme(
-                            id=lid,
-                            lemma=lemma,
-                            lexical_category=lexical_category
-                        ))
+            results = ShardedQuery(f"""
+                    select ?lexemeId ?lemma ?category
+                WHERE {{
+                  #hint:Query hint:optimizer "None".
+                  ?lexemeId dct:language wd:{self.language_qid.value};
+                            wikibase:lemma ?lemma;
+                            wikibase:lexicalCategory ?category.
+                  {{shard}}
+                  MINUS{{
+                    ?lexemeId wdt:P9837 [].
+                  }}
+                  MINUS {{
+                    # Exclude truthy no value statements
+                    ?lexemeId a wdno:P9837.
+                  }}
+                }}
+            """, **options).rows()
+            if len(results) == 0:
+                console.print("No lexeme found")
+            for result in results:
+                lemma = result["lemma"]["value"]
+                lid = result["lexemeId"]["value"].replace(config.wd_prefix, "")
+                lexical_category = result["category"]["value"].replace(config.wd_prefix, "")
+                self.lexemes.append(Lexeme(
+                    id=lid,
+                    lemma=lemma,
+                    lexical_category=lexical_category
+                ))
         console.print(f"[green]{len(self.lexemes)} lexemes fetched")
 
+    def fetch_forms(self, **options):
+        """Download the forms of all the lexemes we have via sparql
+        and attach them to the lexemes"""
+        from modules.sharded_query import ShardedQuery
+        lexemes = {lexeme.id: lexeme for lexeme in self.lexemes}
+        count = 0
+        with console.status("Fetching the forms of all Swedish lexemes without "
+                            "Svenska Ord ID via a WDQS SPARQL query..."):
+            results = ShardedQuery(f"""
+                    select ?lexemeId ?form ?representation
+                WHERE {{
+                  ?lexemeId dct:language wd:{self.language_qid.value};
+                            ontolex:lexicalForm ?form.
+                  {{shard}}
+                  ?form ontolex:representation ?representation.
+                  MINUS{{
+                    ?lexemeId wdt:P9837 [].
+                  }}
+                  MINUS {{
+                    # Exclude truthy no value statements
+                    ?lexemeId a wdno:P9837.
+                  }}
+                }}
+            """, **options).rows()
+            for result in results:
+                lid = result["lexemeId"]["value"].replace(config.wd_prefix, "")
+                if lid in lexemes:
+                    lexemes[lid].forms.append(Form(
+                        id=result["form"]["value"].replace(config.wd_prefix, ""),
+                        representation=result["representation"]["value"]
+                    ))
+                    count += 1
+        console.print(f"[green]{count} forms fetched")
+
+    def write_snapshot_from_dump(self, dump_path: str, snapshot_path: str, processes: int = 1) -> int:
+        """Write all lexemes in the language from the lexeme dump to a local JSONL snapshot"""
+        from jsonlines import jsonlines
+        from modules.dump import read_dump
+        count = 0
+        with console.status(f"Reading {self.language_code.name} lexemes from {dump_path}..."):
+            with jsonlines.open(snapshot_path, mode="w", compact=True) as writer:
+                for record in read_dump(dump_path,
+                                        language_qid=self.language_qid.value,
+                                        language_code=self.language_code.value,
+                                        processes=processes):
+                    writer.write(record)
+                    count += 1
+        console.print(f"[green]{count} lexemes written to {snapshot_path}")
+        return count
+
+    def load_lexemes_without_so_id_from_snapshot(self, snapshot_path: str):
+        """Load the lexemes without a Svenska Ord ID or novalue statement
+        from a local snapshot instead of querying WDQS"""
+        from jsonlines import jsonlines
+        self.lexemes = []
+        with jsonlines.open(snapshot_path) as reader:
+            for record in reader:
+                if not record["so_ids"] and not record["so_no_value"]:
+                    self.lexemes.append(Lexeme.from_record(record))
+        console.print(f"[green]{len(self.lexemes)} lexemes loaded from {snapshot_path}")
+
+    def calculate_statistics_from_snapshot(self, snapshot_path: str) -> dict:
+        """Compute the coverage statistics from a local snapshot
+        instead of counting with one WDQS query per metric"""
+        from jsonlines import jsonlines
+        from modules.coverage import coverage_report
+        with jsonlines.open(snapshot_path) as reader:
+            report = coverage_report(reader)
+        self.lexemes_count = report["lexemes"]
+        self.senses_with_P5137 = report["senses_with_p5137"]
+        self.senses_with_P5137_per_lexeme = report["senses_with_p5137_per_lexeme"]
+        self.forms = report["forms"]
+        self.forms_with_an_example = report["forms_with_an_example"]
+        return report
+
     def lemma_list(self):
         lemmas = []
         for lexeme in self.lexemes:
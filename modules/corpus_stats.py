@@ -0,0 +1,135 @@
+"""Statistics over the superlemmas and articles extracted from SO
+
+The JSONL is streamed in chunks and every chunk is turned into NumPy columns
+that are aggregated with bincount, like the coverage report of the lexeme
+snapshot in modules/coverage.py. Only the counters are kept between chunks,
+so the memory does not grow with the corpus."""
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List
+
+import numpy as np
+
+
+def inflection_count(superlemma: Dict) -> int:
+    """Number of inflected forms, value only holds the first of them"""
+    return sum(len(inflection.get("values") or ([inflection["value"]] if inflection.get("value") else []))
+               for inflection in (superlemma.get("lemvar") or {}).get("inflections", []))
+
+
+def superlemma_columns(superlemmas: Iterable[Dict], categories: Dict[str, int],
+                       chunk_size: int = 10000) -> Iterator[Dict[str, np.ndarray]]:
+    """Turn chunks of superlemmas into arrays per column, the lexical category
+    is coded as its position in categories which grows as new ones are seen"""
+    iterator = iter(superlemmas)
+    while chunk := list(islice(iterator, chunk_size)):
+        lexems = [superlemma.get("lexem") or {} for superlemma in chunk]
+        yield {
+            "category": np.fromiter((categories.setdefault(superlemma.get("lexical_category", ""), len(categories))
+                                     for superlemma in chunk), dtype=np.int64, count=len(chunk)),
+            "pronunciation": np.fromiter((superlemma.get("pronunciation") is not None for superlemma in chunk),
+                                         dtype=np.int64, count=len(chunk)),
+            "hyphenation": np.fromiter((bool(superlemma.get("hyphenation")) for superlemma in chunk),
+                                       dtype=np.int64, count=len(chunk)),
+            "idioms": np.fromiter((len(lexem.get("idioms", [])) for lexem in lexems), dtype=np.int64,
+                                  count=len(chunk)),
+            "inflections": np.fromiter((inflection_count(superlemma) for superlemma in chunk), dtype=np.int64,
+                                       count=len(chunk)),
+            "kernels": np.fromiter((len(lexem.get("kernels", [])) for lexem in lexems), dtype=np.int64,
+                                   count=len(chunk)),
+        }
+
+
+def year(text: str) -> int:
+    """The year of publication or 0 if it is missing"""
+    text = (text or "").strip()[:4]
+    return int(text) if text.isdigit() else 0
+
+
+def year_columns(articles: Iterable[Dict], chunk_size: int = 10000) -> Iterator[np.ndarray]:
+    iterator = iter(articles)
+    while chunk := list(islice(iterator, chunk_size)):
+        yield np.fromiter((year(article.get("year_of_publication")) for article in chunk), dtype=np.int64,
+                          count=len(chunk))
+
+
+def add_counts(counts: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """Add the bincount of values to counts, growing it if needed"""
+    chunk = np.bincount(values, minlength=len(counts))
+    return np.pad(counts, (0, len(chunk) - len(counts))) + chunk
+
+
+def histogram(counts: np.ndarray) -> Dict[str, int]:
+    return {str(value): int(count) for value, count in enumerate(counts) if count}
+
+
+def mean(counts: np.ndarray) -> float:
+    total = counts.sum()
+    return round(float((counts * np.arange(len(counts))).sum() / total), 3) if total else 0.0
+
+
+def corpus_report(superlemmas: Iterable[Dict], articles: Iterable[Dict] = None, chunk_size: int = 10000) -> Dict:
+    """Distribution of the lexical categories, coverage of pronunciation and hyphenation,
+    histograms of idioms and inflections per entry and of the year of publication"""
+    categories: Dict[str, int] = {}
+    entries = np.zeros(0, dtype=np.int64)
+    sums = {column: 0 for column in ("pronunciation", "hyphenation", "kernels")}
+    idioms = np.zeros(0, dtype=np.int64)
+    inflections = np.zeros(0, dtype=np.int64)
+    for arrays in superlemma_columns(superlemmas, categories, chunk_size):
+        entries = add_counts(entries, arrays["category"])
+        for column in sums:
+            sums[column] += int(arrays[column].sum())
+        idioms = add_counts(idioms, arrays["idioms"])
+        inflections = add_counts(inflections, arrays["inflections"])
+    years = np.zeros(0, dtype=np.int64)
+    for array in year_columns(articles or [], chunk_size):
+        years = add_counts(years, array)
+    total = int(entries.sum())
+    names = {number: category for category, number in categories.items()}
+    by_category: List[Dict] = [{
+        "lexical_category": names[number],
+        "entries": int(entries[number]),
+        "share": round(float(entries[number]) / total, 3),
+    } for number in np.argsort(-entries, kind="stable").tolist()]
+    year_histogram = {str(value): int(count) for value, count in enumerate(years) if count and value}
+    if len(years) and years[0]:
+        year_histogram["unknown"] = int(years[0])
+    return {
+        "entries": total,
+        "by_lexical_category": by_category,
+        "with_pronunciation": sums["pronunciation"],
+        "pronunciation_coverage": round(sums["pronunciation"] / total, 3) if total else 0.0,
+        "with_hyphenation": sums["hyphenation"],
+        "hyphenation_coverage": round(sums["hyphenation"] / total, 3) if total else 0.0,
+        "kernels": sums["kernels"],
+        "idioms": int((idioms * np.arange(len(idioms))).sum()),
+        "idioms_per_entry": mean(idioms),
+        "idioms_histogram": histogram(idioms),
+        "inflections": int((inflections * np.arange(len(inflections))).sum()),
+        "inflections_per_entry": mean(inflections),
+        "inflections_histogram": histogram(inflections),
+        "articles": int(years.sum()),
+        "year_of_publication": year_histogram,
+    }
+
+
+def markdown(report: Dict) -> str:
+    """The report as markdown tables"""
+    lines = [
+        "# SO corpus statistics", "",
+        f"{report['entries']} entries in {report['articles']} articles with {report['kernels']} definitions, "
+        f"{report['idioms']} idioms and {report['inflections']} inflected forms.", "",
+        "| | entries | share |", "|---|---:|---:|",
+        f"| with pronunciation | {report['with_pronunciation']} | {report['pronunciation_coverage']:.1%} |",
+        f"| with hyphenation | {report['with_hyphenation']} | {report['hyphenation_coverage']:.1%} |",
+        "", "## Lexical categories", "", "| lexical category | entries | share |", "|---|---:|---:|",
+    ]
+    lines += [f"| {category['lexical_category'] or '(none)'} | {category['entries']} | {category['share']:.1%} |"
+              for category in report["by_lexical_category"]]
+    for title, key, mean_key in (("Idioms per entry", "idioms_histogram", "idioms_per_entry"),
+                                 ("Inflections per entry", "inflections_histogram", "inflections_per_entry")):
+        lines += ["", f"## {title}", "", f"Mean {report[mean_key]}", "", "| count | entries |", "|---:|---:|"]
+        lines += [f"| {value} | {count} |" for value, count in report[key].items()]
+    lines += ["", "## Year of publication", "", "| year | articles |", "|---|---:|"]
+    lines += [f"| {value} | {count} |" for value, count in report["year_of_publication"].items()]
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,66 @@
+"""Coverage statistics over a local lexeme snapshot
+
+Replaces the COUNT queries against WDQS in LexemeLanguage. The snapshot written
+by lexso dump is read in chunks of columns and every chunk is aggregated with
+NumPy, so all metrics come out of one pass without any load on WDQS."""
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List
+
+import numpy as np
+
+columns = ("forms", "senses", "senses_with_p5137", "forms_with_an_example", "so_id", "so_no_value")
+
+
+def chunked_columns(records: Iterable[Dict], categories: Dict[str, int],
+                    chunk_size: int = 10000) -> Iterator[Dict[str, np.ndarray]]:
+    """Turn chunks of records into arrays per column, the lexical category is
+    coded as its position in categories which grows as new ones are seen"""
+    iterator = iter(records)
+    while chunk := list(islice(iterator, chunk_size)):
+        arrays = {"category": np.fromiter((categories.setdefault(record["lexical_category"], len(categories))
+                                           for record in chunk), dtype=np.int64, count=len(chunk))}
+        arrays["forms"] = np.fromiter((len(record["forms"]) for record in chunk), dtype=np.int64, count=len(chunk))
+        arrays["so_id"] = np.fromiter((bool(record["so_ids"]) for record in chunk), dtype=np.int64, count=len(chunk))
+        for column in ("senses", "senses_with_p5137", "forms_with_an_example", "so_no_value"):
+            # snapshots written before these were added lack them
+            arrays[column] = np.fromiter((int(record.get(column, 0)) for record in chunk), dtype=np.int64,
+                                         count=len(chunk))
+        yield arrays
+
+
+def coverage_report(records: Iterable[Dict], chunk_size: int = 10000) -> Dict:
+    """Totals and P9837 coverage per lexical category"""
+    categories: Dict[str, int] = {}
+    lexemes = np.zeros(0, dtype=np.int64)
+    sums = {column: np.zeros(0, dtype=np.int64) for column in columns}
+    for arrays in chunked_columns(records, categories, chunk_size):
+        size = len(categories)
+        lexemes = np.pad(lexemes, (0, size - len(lexemes))) + np.bincount(arrays["category"], minlength=size)
+        for column in columns:
+            sums[column] = (np.pad(sums[column], (0, size - len(sums[column])))
+                            + np.bincount(arrays["category"], weights=arrays[column], minlength=size).astype(np.int64))
+    total = int(lexemes.sum())
+    totals = {column: int(sums[column].sum()) for column in columns}
+    by_category: List[Dict] = []
+    for category, number in sorted(categories.items(), key=lambda item: -lexemes[item[1]]):
+        count = int(lexemes[number])
+        by_category.append({
+            "lexical_category": category,
+            "lexemes": count,
+            "with_so_id": int(sums["so_id"][number]),
+            "with_so_novalue": int(sums["so_no_value"][number]),
+            "so_coverage": round(float(sums["so_id"][number] + sums["so_no_value"][number]) / count, 3),
+        })
+    return {
+        "lexemes": total,
+        "forms": totals["forms"],
+        "forms_with_an_example": totals["forms_with_an_example"],
+        "forms_without_an_example": totals["forms"] - totals["forms_with_an_example"],
+        "senses": totals["senses"],
+        "senses_with_p5137": totals["senses_with_p5137"],
+        "senses_with_p5137_per_lexeme": round(totals["senses_with_p5137"] / total, 3) if total else 0.0,
+        "with_so_id": totals["so_id"],
+        "with_so_novalue": totals["so_no_value"],
+        "so_coverage": round((totals["so_id"] + totals["so_no_value"]) / total, 3) if total else 0.0,
+        "by_lexical_category": by_category,
+    }
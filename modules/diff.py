@@ -0,0 +1,72 @@
+"""Compare two extraction versions by SO element id
+
+Each version is streamed once and only a short digest of every field of every
+element is kept in memory, never the records themselves, so two full versions
+can be compared in seconds. The inflections are taken from the lemvar of the
+superlemmas since they are not written to a file of their own."""
+import hashlib
+import json
+from typing import Dict, Iterable, Iterator, Tuple
+
+from jsonlines import jsonlines
+
+# Fields that are not part of the content of an element
+ignored_fields = ("id_", "prefix")
+
+
+def digest(value) -> bytes:
+    return hashlib.blake2b(json.dumps(value, sort_keys=True, ensure_ascii=False).encode("utf-8"),
+                           digest_size=8).digest()
+
+
+def field_digests(record: Dict) -> Dict[str, bytes]:
+    return {field: digest(value) for field, value in record.items() if field not in ignored_fields}
+
+
+def elements(superlemmas_jsonl: str = None, idioms_jsonl: str = None) -> Iterator[Tuple[str, Dict]]:
+    """(kind, record) of every superlemma, inflection and idiom"""
+    if superlemmas_jsonl is not None:
+        with jsonlines.open(superlemmas_jsonl) as reader:
+            for superlemma in reader:
+                yield "superlemma", superlemma
+                for inflection in (superlemma.get("lemvar") or {}).get("inflections", []):
+                    yield "inflection", inflection
+    if idioms_jsonl is not None:
+        with jsonlines.open(idioms_jsonl) as reader:
+            for idiom in reader:
+                yield "idiom", idiom
+
+
+def diff_versions(old: Iterator[Tuple[str, Dict]], new: Iterator[Tuple[str, Dict]]) -> Iterator[Dict]:
+    """Yield one change per element that was added, removed or changed between the versions"""
+    previous: Dict[Tuple[str, str], Dict[str, bytes]] = {}
+    for kind, record in old:
+        if record.get("id_"):
+            previous[(kind, record["id_"])] = field_digests(record)
+    seen = set()
+    for kind, record in new:
+        key = (kind, record.get("id_"))
+        if not key[1] or key in seen:
+            continue
+        seen.add(key)
+        digests = field_digests(record)
+        if key not in previous:
+            yield {"type": kind, "id": key[1], "change": "added", "value": record.get("value", "")}
+            continue
+        old_digests = previous.pop(key)
+        fields = sorted(field for field in digests.keys() | old_digests.keys()
+                        if digests.get(field) != old_digests.get(field))
+        if fields:
+            yield {"type": kind, "id": key[1], "change": "changed", "value": record.get("value", ""),
+                   "fields": fields}
+    for (kind, id_), _ in previous.items():
+        yield {"type": kind, "id": id_, "change": "removed"}
+
+
+def summarize(changes: Iterable[Dict]) -> Dict[str, Dict[str, int]]:
+    """Number of changes per type of element and kind of change"""
+    summary: Dict[str, Dict[str, int]] = {}
+    for change in changes:
+        counts = summary.setdefault(change["type"], {"added": 0, "removed": 0, "changed": 0})
+        counts[change["change"]] += 1
+    return summary
@@ -0,0 +1,159 @@
+"""Read lexemes from the Wikidata lexeme dump
+
+The dump (latest-lexemes.json.gz or .bz2 from https://dumps.wikimedia.org/wikidatawiki/entities/)
+is one big JSON array with one entity per line, so we can stream it line by
+line and only parse the lines that mention the language we are interested in."""
+import bz2
+import gzip
+import io
+import json
+import shutil
+import subprocess
+from contextlib import contextmanager
+from itertools import islice
+from multiprocessing import Pool
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import config
+
+# Statements on the forms that are kept in the snapshot, P5279 is hyphenation
+form_properties = ("P5279",)
+
+# Parallel decompressors that are used if available and more than one process is asked for
+decompressors = {
+    ".gz": ["pigz", "-dc", "-p"],
+    ".bz2": ["lbzip2", "-dc", "-n"],
+}
+
+
+@contextmanager
+def open_dump(path: str, processes: int = 1):
+    """Open the dump as a text stream"""
+    for suffix, command in decompressors.items():
+        if path.endswith(suffix) and processes > 1 and shutil.which(command[0]):
+            process = subprocess.Popen(command + [str(processes), path], stdout=subprocess.PIPE)
+            try:
+                yield io.TextIOWrapper(process.stdout, encoding="utf-8")
+            finally:
+                process.stdout.close()
+                process.kill()
+                process.wait()
+            return
+    if path.endswith(".gz"):
+        f = gzip.open(path, "rt", encoding="utf-8")
+    elif path.endswith(".bz2"):
+        f = bz2.open(path, "rt", encoding="utf-8")
+    else:
+        f = open(path, "r", encoding="utf-8")
+    try:
+        yield f
+    finally:
+        f.close()
+
+
+def claim_values(claims: Dict, property_: str) -> List[str]:
+    """The string values of all value snaks of the property"""
+    values = []
+    for claim in claims.get(property_, []):
+        snak = claim["mainsnak"]
+        if snak["snaktype"] == "value":
+            value = snak["datavalue"]["value"]
+            values.append(value["id"] if isinstance(value, dict) else value)
+    return values
+
+
+def has_no_value(claims: Dict, property_: str) -> bool:
+    return any(claim["mainsnak"]["snaktype"] == "novalue" for claim in claims.get(property_, []))
+
+
+def representation(representations: Dict, language_code: str) -> str:
+    """The representation in our language or else the first one"""
+    if language_code in representations:
+        return representations[language_code]["value"]
+    return next(iter(representations.values()))["value"] if representations else ""
+
+
+def forms_with_an_example(claims: Dict) -> int:
+    """Number of distinct forms demonstrated by a usage example (P5831 with P5830)"""
+    forms = set()
+    for claim in claims.get("P5831", []):
+        for qualifier in claim.get("qualifiers", {}).get("P5830", []):
+            if qualifier["snaktype"] == "value":
+                forms.add(qualifier["datavalue"]["value"]["id"])
+    return len(forms)
+
+
+def form_record(form: Dict, language_code: str = "sv") -> Dict:
+    record = {"id": form["id"], "representation": representation(form.get("representations", {}), language_code)}
+    statements = {property_: values for property_ in form_properties
+                  if (values := claim_values(form.get("claims", {}), property_))}
+    if statements:
+        record["statements"] = statements
+    return record
+
+
+def lexeme_record(entity: Dict, language_code: str = "sv") -> Dict:
+    """Reduce a lexeme entity to what we need for matching and the coverage statistics"""
+    claims = entity.get("claims", {})
+    senses = entity.get("senses", [])
+    return {
+        "id": entity["id"],
+        "lemma": representation(entity.get("lemmas", {}), language_code),
+        "lexical_category": entity["lexicalCategory"],
+        "forms": [form_record(form, language_code) for form in entity.get("forms", [])],
+        "so_ids": claim_values(claims, config.foreign_id_property),
+        "so_no_value": has_no_value(claims, config.foreign_id_property),
+        "senses": len(senses),
+        "senses_with_p5137": sum(1 for sense in senses if claim_values(sense.get("claims", {}), "P5137")),
+        "forms_with_an_example": forms_with_an_example(claims),
+        "glosses": [{"id": sense["id"], "gloss": sense["glosses"][language_code]["value"]}
+                    for sense in senses if language_code in sense.get("glosses", {})],
+    }
+
+
+def parse_line(line: str, language_qid: str = "Q9027", language_code: str = "sv") -> Optional[Dict]:
+    """Parse one line of the dump if it is a lexeme in the language"""
+    # This check is cheap compared to parsing the JSON
+    if f'"{language_qid}"' not in line:
+        return None
+    line = line.strip().rstrip(",")
+    if not line.startswith("{"):
+        return None
+    entity = json.loads(line)
+    if entity.get("type") != "lexeme" or entity.get("language") != language_qid:
+        return None
+    return lexeme_record(entity, language_code)
+
+
+def parse_lines(args) -> List[Dict]:
+    lines, language_qid, language_code = args
+    records = []
+    for line in lines:
+        record = parse_line(line, language_qid, language_code)
+        if record is not None:
+            records.append(record)
+    return records
+
+
+def chunks(lines: Iterable[str], size: int) -> Iterator[List[str]]:
+    iterator = iter(lines)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def read_dump(path: str, language_qid: str = "Q9027", language_code: str = "sv",
+              processes: int = 1, chunk_size: int = 2000) -> Iterator[Dict]:
+    """Yield a record for every lexeme in the language.
+    With more than one process the decompression and the parsing
+    of the lines are done in parallel"""
+    with open_dump(path, processes=processes) as f:
+        if processes > 1:
+            with Pool(processes) as pool:
+                tasks = ((chunk, language_qid, language_code) for chunk in chunks(f, chunk_size))
+                for records in pool.imap(parse_lines, tasks):
+                    yield from records
+        else:
+            for line in f:
+                record = parse_line(line, language_qid, language_code)
+                if record is not None:
+                    yield record
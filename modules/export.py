@@ -0,0 +1,87 @@
+"""Export planned P9837 edits for batch tools
+
+The statements are the same as the ones Lexeme.upload_foreign_id_to_wikidata
+writes: the SO identifier together with P1343 (described by source) pointing
+to SO, or a novalue statement with a P585 (point in time) qualifier.
+
+WBI only appends P1343 if the lexeme does not already have it, while the
+claims of a wbeditentity request are always added as new statements. With
+the current entities, e.g. from an EntityPrefetcher, the export does the same
+as WBI and skips lexemes that already have P9837 like apply does. Without
+them every lexeme gets P1343, a duplicate if it already had the statement.
+QuickStatements itself does not add a statement that already exists."""
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Iterator, Optional
+
+import config
+from models.plan import PlannedEdit
+from models.wikidata import WikidataTimeFormat
+
+# Returns the entity JSON of a lexeme or None if it does not exist
+Entities = Callable[[str], Optional[Dict]]
+
+
+def edit_summary() -> str:
+    return f"Added foreign identifier with [[{config.tool_url}]]"
+
+
+def has_source(entity: Dict) -> bool:
+    """True if the entity already has P1343 pointing to SO"""
+    return any(claim.get("mainsnak", {}).get("datavalue", {}).get("value", {}).get("id") == config.source_item_id
+               for claim in entity.get("claims", {}).get("P1343", []))
+
+
+def current_edits(edits: Iterable[PlannedEdit], entities: Entities = None) -> Iterator[PlannedEdit]:
+    """The edits of lexemes that still exist and don't have P9837 yet"""
+    from modules.prefetch import has_claim
+    for edit in edits:
+        if entities is not None:
+            entity = entities(edit.lexeme_id)
+            if entity is None or has_claim(entity, config.foreign_id_property):
+                continue
+        yield edit
+
+
+def quickstatements(edits: Iterable[PlannedEdit], date: datetime = None,
+                    entities: Entities = None) -> Iterator[str]:
+    """QuickStatements v1 commands, one line per statement"""
+    day = WikidataTimeFormat(date or datetime.today()).day() + "/11"
+    comment = f"/* {edit_summary()} */"
+    for edit in current_edits(edits, entities):
+        if edit.action == "value":
+            yield f'{edit.lexeme_id}\t{config.foreign_id_property}\t"{edit.so_id}"\t{comment}'
+            yield f"{edit.lexeme_id}\tP1343\t{config.source_item_id}\t{comment}"
+        elif edit.action == "novalue":
+            yield f"{edit.lexeme_id}\t{config.foreign_id_property}\tnovalue\tP585\t{day}\t{comment}"
+
+
+def snak(property_: str, datatype: str, value=None) -> Dict:
+    if value is None:
+        return {"snaktype": "novalue", "property": property_}
+    return {"snaktype": "value", "property": property_, "datavalue": {"value": value, "type": datatype}}
+
+
+def wbeditentity(edits: Iterable[PlannedEdit], date: datetime = None,
+                 entities: Entities = None) -> Iterator[Dict]:
+    """One wbeditentity request per lexeme with the id, the claims and the summary.
+    P1343 is left out for lexemes that already have it if entities is given"""
+    day = WikidataTimeFormat(date or datetime.today()).day()
+    for edit in current_edits(edits, entities):
+        if edit.action == "value":
+            claims = [
+                {"mainsnak": snak(config.foreign_id_property, "string", edit.so_id),
+                 "type": "statement", "rank": "normal"},
+            ]
+            if entities is None or not has_source(entities(edit.lexeme_id)):
+                claims.append({"mainsnak": snak("P1343", "wikibase-entityid",
+                                                {"entity-type": "item", "id": config.source_item_id}),
+                               "type": "statement", "rank": "normal"})
+        elif edit.action == "novalue":
+            point_in_time = snak("P585", "time", {
+                "time": day, "timezone": 0, "before": 0, "after": 0, "precision": 11,
+                "calendarmodel": "http://www.wikidata.org/entity/Q1985727"})
+            claims = [{"mainsnak": snak(config.foreign_id_property, "string"), "type": "statement",
+                       "rank": "normal", "qualifiers": {"P585": [point_in_time]}}]
+        else:
+            continue
+        yield {"id": edit.lexeme_id, "data": {"claims": claims}, "summary": edit_summary()}
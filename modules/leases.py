@@ -0,0 +1,90 @@
+"""Leases on ranges of identifiers so that several crawlers can share one list
+
+The ranges are kept in a SQLite table. A worker leases the first range that is
+neither done nor leased by a live worker, renews the lease while it works and
+marks the range done at the end. A range where some identifiers timed out is
+released undone and leased again after a delay. The lease of a worker that
+crashed expires and the range returns to the pool. Workers on several hosts
+can share the table on a network file system or each host can run its own and
+split the list with --start and --stop."""
+import os
+import socket
+import sqlite3
+import time
+from typing import Dict, Optional, Tuple
+
+
+def default_worker() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class LeaseTable:
+    path: str
+
+    def __init__(self, path: str = "data/leases.sqlite"):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        # autocommit so that BEGIN IMMEDIATE takes the write lock before we read
+        self.connection = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self.connection.execute("CREATE TABLE IF NOT EXISTS ranges (start INTEGER PRIMARY KEY, stop INTEGER, "
+                                "worker TEXT, expires REAL, done INTEGER DEFAULT 0)")
+
+    def create_ranges(self, start: int, stop: int, size: int = 500) -> int:
+        """Split start..stop into ranges unless the table already has them"""
+        self.connection.execute("BEGIN IMMEDIATE")
+        try:
+            if self.connection.execute("SELECT COUNT(*) FROM ranges").fetchone()[0] == 0:
+                self.connection.executemany("INSERT INTO ranges (start, stop) VALUES (?, ?)",
+                                            [(begin, min(begin + size, stop)) for begin in range(start, stop, size)])
+            count = self.connection.execute("SELECT COUNT(*) FROM ranges").fetchone()[0]
+            self.connection.execute("COMMIT")
+        except Exception:
+            self.connection.execute("ROLLBACK")
+            raise
+        return count
+
+    def acquire(self, worker: str, seconds: float = 600) -> Optional[Tuple[int, int]]:
+        """Lease the first free range, returns None when all ranges are done or leased"""
+        now = time.time()
+        self.connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = self.connection.execute(
+                "SELECT start, stop FROM ranges WHERE done = 0 AND (worker IS NULL OR expires < ?) "
+                "ORDER BY start LIMIT 1", (now,)).fetchone()
+            if row is not None:
+                self.connection.execute("UPDATE ranges SET worker = ?, expires = ? WHERE start = ?",
+                                        (worker, now + seconds, row[0]))
+            self.connection.execute("COMMIT")
+        except Exception:
+            self.connection.execute("ROLLBACK")
+            raise
+        return tuple(row) if row is not None else None
+
+    def renew(self, start: int, worker: str, seconds: float = 600) -> bool:
+        """Extend the lease, returns False if it expired and was taken by another worker"""
+        cursor = self.connection.execute("UPDATE ranges SET expires = ? WHERE start = ? AND worker = ? AND done = 0",
+                                         (time.time() + seconds, start, worker))
+        return cursor.rowcount == 1
+
+    def complete(self, start: int, worker: str) -> bool:
+        cursor = self.connection.execute("UPDATE ranges SET done = 1 WHERE start = ? AND worker = ?",
+                                         (start, worker))
+        return cursor.rowcount == 1
+
+    def release(self, start: int, worker: str, delay: float = 0) -> bool:
+        """Return the range to the pool undone, it can be leased again after delay seconds"""
+        cursor = self.connection.execute("UPDATE ranges SET expires = ? WHERE start = ? AND worker = ? AND done = 0",
+                                         (time.time() + delay, start, worker))
+        return cursor.rowcount == 1
+
+    def progress(self) -> Dict[str, int]:
+        now = time.time()
+        total, done, leased = self.connection.execute(
+            "SELECT COUNT(*), COALESCE(SUM(done), 0), "
+            "COALESCE(SUM(CASE WHEN done = 0 AND worker IS NOT NULL AND expires >= ? THEN 1 ELSE 0 END), 0) "
+            "FROM ranges", (now,)).fetchone()
+        return {"ranges": total, "done": done, "leased": leased, "free": total - done - leased}
+
+    def close(self):
+        self.connection.close()
@@ -0,0 +1,78 @@
+"""Minify the articleBody html of SO before it is stored
+
+The stored pages still contain the tab navigation, the widget markup, the
+indentation and attributes like onclick="tracklink(...)". Only the elements
+and attributes that the from_soup methods in models/extractor.py read are
+kept: the elements in read_elements with their id and class, href on the see
+also links and onclick on the pronunciation links. The text is kept inside
+the elements whose text is read and every other element is unwrapped, or
+dropped if nothing read is left in it, so the extraction is unchanged.
+
+Keep read_elements in sync with the extractor when it starts reading more."""
+from typing import Set, Tuple
+
+from bs4 import BeautifulSoup, NavigableString, Tag
+
+# (tag, class) of every element the extractor finds
+read_elements: Set[Tuple[str, str]] = {
+    ("span", "tryck"), ("div", "superlemma"), ("div", "lemvar"), ("span", "lemvarhuvud"), ("span", "orto"),
+    ("span", "bojning_inline"), ("span", "bojning"), ("span", "avstav"), ("div", "ordklass"), ("a", "ljudfil"),
+    ("div", "lexemdiv"), ("span", "kbetydelse"), ("a", "hvtag"), ("div", "idiom"), ("span", "fras"),
+    ("span", "idiomdef"), ("span", "idiomex"), ("span", "sentence-class"), ("span", "fb"),
+}
+# (tag, class) of the elements whose text is read
+text_elements: Set[Tuple[str, str]] = {
+    ("span", "tryck"), ("span", "orto"), ("span", "bojning"), ("span", "avstav"), ("div", "ordklass"),
+    ("span", "kbetydelse"), ("a", "hvtag"), ("span", "fras"), ("span", "idiomdef"), ("span", "idiomex"),
+    ("span", "sentence-class"), ("span", "fb"),
+}
+# Attributes read besides id and class
+read_attributes = {("a", "hvtag"): "href", ("a", "ljudfil"): "onclick"}
+
+
+def classes(tag: Tag) -> Set[Tuple[str, str]]:
+    return {(tag.name, class_) for class_ in tag.get("class") or []}
+
+
+def is_article(tag: Tag) -> bool:
+    """Article.from_soup is found by the exact class attribute"""
+    return tag.name == "div" and " ".join(tag.get("class") or []) == "artikel so"
+
+
+def _minify(tag: Tag, in_text: bool = False, in_idiom: bool = False):
+    for child in list(tag.children):
+        if isinstance(child, Tag):
+            found = classes(child)
+            read = bool(found & read_elements)
+            _minify(child, in_text=in_text or bool(found & text_elements),
+                    in_idiom=in_idiom or ("div", "idiom") in found)
+            if read:
+                kept = {"id", "class"} | {read_attributes[element] for element in found if element in read_attributes}
+                child.attrs = {name: value for name, value in child.attrs.items() if name in kept}
+            elif child.name == "a" and in_idiom:
+                # Idiom.from_soup checks if there is a link
+                child.attrs = {}
+            elif in_text or child.contents:
+                child.unwrap()
+            else:
+                child.decompose()
+        elif type(child) is NavigableString:
+            if not in_text:
+                # no text outside the text elements is read
+                child.extract()
+        else:
+            # comments, doctypes and other special strings
+            child.extract()
+
+
+def minify_soup(soup) -> str:
+    """The minified html of the articles in the soup"""
+    articles = [article for article in soup.find_all(is_article) if article.find_parent(is_article) is None]
+    for article in articles:
+        article.attrs = {"class": article["class"]}
+        _minify(article)
+    return "".join(str(article) for article in articles)
+
+
+def minify(html: str) -> str:
+    return minify_soup(BeautifulSoup(html, "lxml"))
@@ -0,0 +1,137 @@
+"""Canonical SO pages and the store of their html
+
+data/P9837.csv has about 100k rows but only 64k distinct ids and homographs
+on the same page get ids like 167464_1, so many ids resolve to the same page.
+Every id is mapped to its canonical page id before fetching, and every stored
+page gets a content hash so that pages with the same content are stored and
+parsed only once."""
+import gzip
+import hashlib
+import os
+from typing import Dict, Iterable, Iterator, List, Optional, Set
+
+
+def canonical_id(id_) -> str:
+    """The id of the page, 167464_1 -> 167464"""
+    return str(id_).strip().split("_")[0]
+
+
+# The field superlemmas are joined and sorted by, homographs on a page have their own SO id
+entry_id_field = "so_id"
+
+
+def entry_id(superlemma: Dict) -> str:
+    """The SO id of a dumped superlemma, the page id in dumps from before it had one"""
+    return superlemma.get(entry_id_field) or superlemma.get("page_id", "")
+
+
+def content_hash(html: str) -> str:
+    return hashlib.blake2b(html.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def alias_table(ids: Iterable[str]) -> Dict[str, List[str]]:
+    """Canonical page id -> all id variants that resolve to it"""
+    table: Dict[str, List[str]] = {}
+    for id_ in ids:
+        aliases = table.setdefault(canonical_id(id_), [])
+        if id_ not in aliases:
+            aliases.append(id_)
+    return table
+
+
+class PageStore:
+    """Gzipped articleBody html in data/html with an index of content hashes.
+    A page whose content is already stored under another id is only
+    recorded in the index as an alias of that page"""
+    directory: str
+    hashes: Dict[str, str]  # page id -> content hash
+    pages: Dict[str, str]  # content hash -> page id of the stored file
+
+    def __init__(self, directory: str = "data/html"):
+        self.directory = directory
+        self.index_path = os.path.join(directory, "hashes.tsv")
+        self.hashes = {}
+        self.pages = {}
+        if os.path.exists(self.index_path):
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    page_id, hash_ = line.rstrip("\n").split("\t")
+                    self.hashes[page_id] = hash_
+                    self.pages.setdefault(hash_, page_id)
+
+    def path(self, page_id: str) -> str:
+        return os.path.join(self.directory, f"{page_id}.html.gz")
+
+    def __contains__(self, page_id: str) -> bool:
+        return page_id in self.hashes or os.path.exists(self.path(page_id))
+
+    def alias_of(self, page_id: str) -> Optional[str]:
+        """The page whose file holds the content of this page if it is a duplicate"""
+        stored = self.pages.get(self.hashes.get(page_id))
+        return stored if stored != page_id else None
+
+    def read(self, page_id: str) -> str:
+        with gzip.open(self.path(self.alias_of(page_id) or page_id), "rt", encoding="utf-8") as f:
+            return f.read()
+
+    def write(self, page_id: str, html: str) -> bool:
+        """Store the page, returns False if the content was already stored under another id"""
+        os.makedirs(self.directory, exist_ok=True)
+        hash_ = content_hash(html)
+        duplicate = hash_ in self.pages and self.pages[hash_] != page_id
+        if not duplicate:
+            with gzip.open(self.path(page_id), "wt", encoding="utf-8") as f:
+                f.write(html)
+            self.pages[hash_] = page_id
+        if self.hashes.get(page_id) != hash_:
+            self.hashes[page_id] = hash_
+            with open(self.index_path, "a", encoding="utf-8") as f:
+                f.write(f"{page_id}\t{hash_}\n")
+        return not duplicate
+
+    def page_ids(self) -> List[str]:
+        """All pages in the store including the aliases"""
+        if not os.path.isdir(self.directory):
+            return []
+        files = [file.split(".")[0] for file in os.listdir(self.directory) if file.endswith(".html.gz")]
+        return list(dict.fromkeys([*self.hashes, *files]))
+
+    def merge(self, other: "PageStore") -> int:
+        """Copy the pages we don't have from another store, returns the number of pages added"""
+        added = 0
+        for page_id in other.page_ids():
+            if page_id not in self:
+                self.write(page_id, other.read(page_id))
+                added += 1
+        return added
+
+
+class ProcessedHashes:
+    """Content hashes of the pages already extracted into a JSONL version"""
+    path: str
+    hashes: Set[str]
+
+    def __init__(self, path: str):
+        self.path = path
+        self.hashes = set()
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.hashes = {line.strip() for line in f if line.strip()}
+
+    def __contains__(self, hash_: str) -> bool:
+        return hash_ in self.hashes
+
+    def add(self, hash_: str):
+        self.hashes.add(hash_)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(hash_ + "\n")
+
+
+def unique_pages(ids: Iterable[str]) -> Iterator[str]:
+    """Canonical page ids in the order they first appear"""
+    seen = set()
+    for id_ in ids:
+        page_id = canonical_id(id_)
+        if page_id not in seen:
+            seen.add(page_id)
+            yield page_id
@@ -0,0 +1,88 @@
+"""Fetch the lexemes we are about to edit in batches
+
+WikibaseIntegrator fetches the full entity before every write. Instead we load
+the upcoming lexemes with wbgetentities, up to 50 ids per request, into a
+bounded LRU cache and hand the JSON to the writer."""
+import logging
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional
+
+import config
+
+logger = logging.getLogger(__name__)
+
+default_api_url = "https://www.wikidata.org/w/api.php"
+
+
+def has_claim(entity: Dict, property_: str) -> bool:
+    """True if the entity has a value or novalue statement with the property"""
+    return bool(entity.get("claims", {}).get(property_))
+
+
+class EntityPrefetcher:
+    """Look up entities in the order they will be edited, fetching ahead in batches"""
+    batch_size: int
+    cache_size: int
+
+    def __init__(self, ids: Iterable[str], batch_size: int = 50, cache_size: int = 500,
+                 api_url: str = None, client=None, retries: int = 3, retry_delay: float = 1.0):
+        if batch_size > 50:
+            raise ValueError("wbgetentities accepts at most 50 ids")
+        self.ids: List[str] = list(ids)
+        self.positions = {id_: position for position, id_ in enumerate(self.ids)}
+        self.batch_size = batch_size
+        self.cache_size = max(cache_size, batch_size)
+        self.api_url = api_url or getattr(config, "mediawiki_api_url", default_api_url)
+        self.cache: OrderedDict = OrderedDict()
+        self.requests = 0
+        self.retries = retries
+        self.retry_delay = retry_delay
+        if client is None:
+            from modules import recorder
+            client = recorder.client(headers={"User-Agent": config.user_agent}, timeout=30)
+        self.client = client
+
+    def __get(self, ids: List[str]):
+        """GET wbgetentities and retry if the server fails"""
+        import httpx
+        for attempt in range(self.retries + 1):
+            try:
+                response = self.client.get(self.api_url, params={
+                    "action": "wbgetentities",
+                    "ids": "|".join(ids),
+                    "format": "json",
+                })
+                self.requests += 1
+                response.raise_for_status()
+                return response
+            except httpx.HTTPError as e:
+                if attempt == self.retries:
+                    raise
+                logger.warning(f"wbgetentities failed with {e}, retrying")
+                time.sleep(self.retry_delay * 2 ** attempt)
+
+    def __fetch(self, ids: List[str]):
+        response = self.__get(ids)
+        entities = response.json().get("entities", {})
+        for id_ in ids:
+            entity = entities.get(id_)
+            # deleted lexemes are returned with a missing key
+            self.cache[id_] = None if entity is None or "missing" in entity else entity
+            self.cache.move_to_end(id_)
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+    def get(self, id_: str) -> Optional[Dict]:
+        """The entity JSON or None if it does not exist"""
+        if id_ not in self.cache:
+            start = self.positions.get(id_)
+            if start is None:
+                batch = [id_]
+            else:
+                batch = [upcoming for upcoming in self.ids[start:start + self.batch_size]
+                         if upcoming not in self.cache]
+            logger.debug(f"Fetching {len(batch)} entities starting with {id_}")
+            self.__fetch(batch)
+        self.cache.move_to_end(id_)
+        return self.cache[id_]
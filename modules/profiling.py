@@ -0,0 +1,127 @@
+"""Sampling profiler that splits the time of a run into the stages of the pipeline
+
+A thread samples the stack of the main thread every interval seconds. Every
+sample is put in a stage by the innermost frame that matches one of the rules
+in stages, e.g. a sample in bs4/element.py called from Kernel.from_soup is in
+from_soup and one in bs4/builder called from BeautifulSoup() is in parse, so
+no code has to be changed to profile it. Samples without a match are other.
+
+The samples are written in the collapsed stack format of flamegraph.pl,
+inferno and speedscope with the stage as the root frame, once for the whole
+run and once per stage. Code run in other processes, like the extraction
+workers of lexso crawl --extract, is not sampled."""
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Callable, Dict, List, Optional, Tuple
+
+Frame = Tuple[str, str]  # file name and function
+
+# Checked in order for every frame from the innermost outwards
+stages: List[Tuple[str, Callable[[str, str], bool]]] = [
+    ("wait", lambda file, function: file.endswith("selectors.py")),
+    ("fetch", lambda file, function: any(part in file for part in ("httpx", "httpcore", "h11", "anyio"))
+     or file.endswith(("ssl.py", "socket.py")) or function in ("fetch_url", "fetch_html")),
+    ("gzip", lambda file, function: file.endswith(("gzip.py", "_compression.py"))),
+    ("parse", lambda file, function: "bs4/builder" in file
+     or (file.endswith("bs4/__init__.py") and function in ("__init__", "_feed"))),
+    ("remove_special_characters", lambda file, function: function == "remove_special_characters"),
+    ("from_soup", lambda file, function: function == "from_soup"),
+    ("model_dump", lambda file, function: function.startswith("_Extractor__cleaned")),
+    ("write", lambda file, function: "jsonlines" in file or function.startswith("_Extractor__dump")
+     or (file.endswith("extractor.py") and function == "write")),
+    ("load", lambda file, function: function == "load_dictionary_into_memory"),
+    ("snapshot", lambda file, function: function == "load_lexemes_without_so_id_from_snapshot"),
+    ("match", lambda file, function: function == "plan_edits"),
+]
+
+
+def stage_of(stack: Tuple[Frame, ...]) -> str:
+    """The stage of a stack ordered from the outermost frame"""
+    for file, function in reversed(stack):
+        for stage, rule in stages:
+            if rule(file, function):
+                return stage
+    return "other"
+
+
+def frame_name(frame: Frame) -> str:
+    file, function = frame
+    return f"{function} ({os.path.basename(file)})".replace(";", ":")
+
+
+class SamplingProfiler:
+    """Use as a context manager around the code to profile"""
+    interval: float
+    samples: Counter  # stack from the outermost frame -> number of samples
+
+    def __init__(self, interval: float = 0.005, thread_id: Optional[int] = None):
+        self.interval = interval
+        self.thread_id = thread_id or threading.get_ident()
+        self.samples = Counter()
+        self.seconds = 0.0
+        self.__stop = threading.Event()
+        self.__thread = None
+
+    def __sample(self):
+        own = os.path.abspath(__file__).replace(os.sep, "/")
+        while not self.__stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                if code.co_filename != own:
+                    stack.append((code.co_filename.replace(os.sep, "/"), code.co_name))
+                frame = frame.f_back
+            if stack:
+                self.samples[tuple(reversed(stack))] += 1
+
+    def __enter__(self):
+        self.__start = time.perf_counter()
+        self.__thread = threading.Thread(target=self.__sample, daemon=True)
+        self.__thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.__stop.set()
+        self.__thread.join()
+        self.seconds = time.perf_counter() - self.__start
+
+    def by_stage(self) -> Dict[str, Counter]:
+        stacks: Dict[str, Counter] = {}
+        for stack, count in self.samples.items():
+            stacks.setdefault(stage_of(stack), Counter())[stack] += count
+        return stacks
+
+    def write(self, prefix: str) -> List[str]:
+        """Write prefix.folded and prefix.STAGE.folded, returns the paths"""
+        if os.path.dirname(prefix):
+            os.makedirs(os.path.dirname(prefix), exist_ok=True)
+        paths = [f"{prefix}.folded"]
+        by_stage = self.by_stage()
+        with open(paths[0], "w", encoding="utf-8") as combined:
+            for stage, stacks in sorted(by_stage.items()):
+                paths.append(f"{prefix}.{stage}.folded")
+                with open(paths[-1], "w", encoding="utf-8") as f:
+                    for stack, count in stacks.most_common():
+                        line = ";".join([stage, *map(frame_name, stack)]) + f" {count}\n"
+                        combined.write(line)
+                        f.write(line)
+        return paths
+
+    def summary(self, top: int = 20) -> str:
+        """Share of the samples per stage and the functions with the most samples at the top of the stack"""
+        total = sum(self.samples.values()) or 1
+        lines = [f"{total} samples in {self.seconds:.1f} seconds", "", "stage                      share  seconds"]
+        stage_counts = Counter({stage: sum(stacks.values()) for stage, stacks in self.by_stage().items()})
+        for stage, count in stage_counts.most_common():
+            lines.append(f"{stage:<25} {count / total:6.1%} {count / total * self.seconds:8.2f}")
+        leaves = Counter()
+        for stack, count in self.samples.items():
+            leaves[(stage_of(stack), frame_name(stack[-1]))] += count
+        lines += ["", f"top {top} functions         share  stage"]
+        for (stage, name), count in leaves.most_common(top):
+            lines.append(f"{name:<25} {count / total:6.1%}  {stage}")
+        return "\n".join(lines)
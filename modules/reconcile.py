@@ -0,0 +1,122 @@
+"""Reconcile per-entry fields of SO with the statements on matched lexemes
+
+The values of a field of all superlemmas are loaded into an index by SO id
+and lemma, and the lexeme snapshot is then joined against it in one pass.
+Every lexeme with an SO identifier, on Wikidata or in a plan, gets the values
+of the superlemma with that id and its lemma, homographs on the same page have
+their own id like 100095_1 and 100095_2. A value belongs to the form
+whose representation it spells out and is planned as an addition if the form
+has no statement with the property, or as a conflict if it has another value.
+
+A field is described by an EntryField, so other fields than the hyphenation
+can be reconciled the same way by adding them to fields."""
+import re
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from jsonlines import jsonlines
+
+from models.plan import PlannedStatement, read_edits
+from modules.pages import canonical_id, entry_id
+
+# SO marks the hyphenation with a middle dot and Wikidata with the hyphenation point
+hyphenation_point = "\u2027"
+hyphenation_marks = re.compile("[\u00b7\u2027\u2022|]")
+
+
+def hyphenation_values(text: str) -> List[str]:
+    """SO honung·en -> honung‧en"""
+    return [hyphenation_marks.sub(hyphenation_point, value.strip()) for value in text.split(",") if value.strip()]
+
+
+def hyphenated_form(value: str) -> str:
+    """honung‧en -> honungen"""
+    return hyphenation_marks.sub("", value).replace("\u00ad", "")
+
+
+class EntryField:
+    """How a field of the superlemmas maps to a statement on the forms"""
+    def __init__(self, name: str, property_: str, values: Callable[[str], List[str]],
+                 form: Callable[[str], str], normalize: Callable[[str], str] = None):
+        self.name = name
+        self.property = property_
+        self.values = values  # the values in the field of a superlemma
+        self.form = form  # the representation of the form a value belongs to
+        self.normalize = normalize or (lambda value: value)  # used to compare with the values on Wikidata
+
+
+fields = {
+    "hyphenation": EntryField("hyphenation", "P5279", values=hyphenation_values, form=hyphenated_form,
+                              normalize=lambda value: hyphenation_marks.sub(hyphenation_point, value)),
+}
+
+
+class FieldIndex:
+    """Values of a field keyed by the SO id of the superlemma and lemma"""
+    def __init__(self, field: EntryField):
+        self.field = field
+        self.values: Dict[Tuple[str, str], List[str]] = {}
+
+    def __len__(self):
+        return len(self.values)
+
+    def add_superlemma(self, superlemma: Dict):
+        values = self.field.values(superlemma.get(self.field.name) or "")
+        if values:
+            existing = self.values.setdefault((entry_id(superlemma), superlemma["value"]), [])
+            existing.extend(value for value in values if value not in existing)
+
+    @classmethod
+    def from_jsonl(cls, field: EntryField, superlemmas_jsonl: str) -> "FieldIndex":
+        index = cls(field)
+        with jsonlines.open(superlemmas_jsonl) as reader:
+            for superlemma in reader:
+                index.add_superlemma(superlemma)
+        return index
+
+    def lookup(self, so_id: str, lemma: str) -> List[str]:
+        if (so_id, lemma) in self.values:
+            return self.values[(so_id, lemma)]
+        # superlemmas dumped before they had an so_id are keyed by their page
+        return self.values.get((canonical_id(so_id), lemma), [])
+
+
+def planned_so_ids(plan: Optional[str]) -> Dict[str, str]:
+    """Lexeme id -> SO id of the values in a plan that are not uploaded yet"""
+    if plan is None:
+        return {}
+    return {edit.lexeme_id: edit.so_id for edit in read_edits(plan) if edit.action == "value"}
+
+
+def reconcile(records: Iterable[Dict], index: FieldIndex,
+              planned: Dict[str, str] = None) -> Iterator[PlannedStatement]:
+    """Join the records of a lexeme snapshot with the index"""
+    field = index.field
+    planned = planned or {}
+    for record in records:
+        so_ids = record["so_ids"] or ([planned[record["id"]]] if record["id"] in planned else [])
+        if not so_ids:
+            continue
+        forms = {}
+        for form in record["forms"]:
+            forms.setdefault(form["representation"], []).append(form)
+        by_form: Dict[str, Set[str]] = {}
+        sources: Dict[str, str] = {}
+        for so_id in so_ids:
+            for value in index.lookup(so_id, record["lemma"]):
+                by_form.setdefault(field.form(value), set()).add(value)
+                sources.setdefault(value, so_id)
+        for representation, values in by_form.items():
+            if len(values) > 1:
+                # SO has several values for the same form, e.g. when the lexeme has several SO ids
+                continue
+            value = values.pop()
+            for form in forms.get(representation, []):
+                current = form.get("statements", {}).get(field.property, [])
+                if not current:
+                    yield PlannedStatement(entity_id=form["id"], lexeme_id=record["id"], property=field.property,
+                                           value=value, action="add", so_id=sources[value],
+                                           reason=f"the {field.name} in SO")
+                elif field.normalize(value) not in {field.normalize(existing) for existing in current}:
+                    yield PlannedStatement(entity_id=form["id"], lexeme_id=record["id"], property=field.property,
+                                           value=value, action="conflict", current=current, so_id=sources[value],
+                                           reason=f"the {field.name} in SO differs from Wikidata")
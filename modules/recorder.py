@@ -0,0 +1,206 @@
+"""Record and replay the HTTP traffic to SO, WDQS and the Wikidata API
+
+In record mode every response is stored in a SQLite file keyed by the method,
+URL and body of the request. In replay mode the stored responses are served
+instantly without touching the network, so the crawl and the lexeme pipeline
+can run offline. The mode is set with lexso --http record|replay or the
+environment variables LEXSO_HTTP and LEXSO_HTTP_STORE.
+
+httpx clients get the mode through client() and async_client(), and
+WikibaseIntegrator through a patch of requests.Session.send."""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import zlib
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import httpx
+
+modes = ("live", "record", "replay")
+# Headers that no longer describe the stored body once it has been decoded
+dropped_headers = ("content-encoding", "content-length", "transfer-encoding", "connection")
+
+
+class NotRecordedError(LookupError):
+    """The request was not found in the store in replay mode"""
+
+
+def normalize_url(url: str) -> str:
+    """Sort the query parameters so that the order does not change the key"""
+    parts = urlsplit(url)
+    return urlunsplit(parts._replace(query=urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))))
+
+
+def request_key(method: str, url: str, body: Optional[bytes]) -> str:
+    digest = hashlib.sha256(f"{method.upper()} {normalize_url(url)}\n".encode("utf-8"))
+    digest.update(body or b"")
+    return digest.hexdigest()
+
+
+class ResponseStore:
+    """Responses in one SQLite file with zlib compressed bodies"""
+    path: str
+
+    def __init__(self, path: str = "data/http.sqlite"):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, method TEXT, "
+                                "url TEXT, status INTEGER, headers TEXT, body BLOB)")
+
+    def __len__(self):
+        with self.lock:
+            return self.connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def get(self, key: str) -> Optional[Tuple[int, Dict[str, str], bytes]]:
+        with self.lock:
+            row = self.connection.execute("SELECT status, headers, body FROM responses WHERE key = ?",
+                                          (key,)).fetchone()
+        if row is None:
+            return None
+        return row[0], json.loads(row[1]), zlib.decompress(row[2])
+
+    def put(self, key: str, method: str, url: str, status: int, headers: Dict[str, str], body: bytes):
+        headers = {name: value for name, value in headers.items() if name.lower() not in dropped_headers}
+        with self.lock:
+            self.connection.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                                    (key, method, url, status, json.dumps(headers), zlib.compress(body, 6)))
+            self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+
+mode = os.environ.get("LEXSO_HTTP", "live")
+store: Optional[ResponseStore] = None
+
+
+def configure(mode_: str = "live", path: str = None):
+    """Set the mode of all clients created after this and of WBI"""
+    global mode, store
+    if mode_ not in modes:
+        raise ValueError(f"Unknown mode {mode_}, expected one of {', '.join(modes)}")
+    mode = mode_
+    store = None
+    if mode != "live":
+        store = ResponseStore(path or os.environ.get("LEXSO_HTTP_STORE", "data/http.sqlite"))
+        install_requests()
+
+
+def replaying() -> bool:
+    """True if no requests reach the network, so there is no need to sleep between them"""
+    return mode == "replay"
+
+
+def _httpx_response(request, stored):
+    status, headers, body = stored
+    return httpx.Response(status, headers=headers, content=body, request=request)
+
+
+class RecordingTransport(httpx.BaseTransport):
+    """httpx transport that records or replays the responses of the wrapped transport"""
+    def __init__(self, transport=None, store_: ResponseStore = None, mode_: str = None):
+        self.transport = transport or httpx.HTTPTransport()
+        self.store = store_ if store_ is not None else store
+        self.mode = mode_ or mode
+
+    def handle_request(self, request):
+        key = request_key(request.method, str(request.url), request.read())
+        if self.mode == "replay":
+            stored = self.store.get(key)
+            if stored is None:
+                raise NotRecordedError(f"{request.method} {request.url} was not recorded")
+            return _httpx_response(request, stored)
+        response = self.transport.handle_request(request)
+        body = response.read()
+        self.store.put(key, request.method, str(request.url), response.status_code, dict(response.headers), body)
+        return _httpx_response(request, (response.status_code, dict(response.headers), body))
+
+    def close(self):
+        self.transport.close()
+
+
+class AsyncRecordingTransport(httpx.AsyncBaseTransport):
+    def __init__(self, transport=None, store_: ResponseStore = None, mode_: str = None):
+        self.transport = transport or httpx.AsyncHTTPTransport()
+        self.store = store_ if store_ is not None else store
+        self.mode = mode_ or mode
+
+    async def handle_async_request(self, request):
+        key = request_key(request.method, str(request.url), await request.aread())
+        if self.mode == "replay":
+            stored = self.store.get(key)
+            if stored is None:
+                raise NotRecordedError(f"{request.method} {request.url} was not recorded")
+            return _httpx_response(request, stored)
+        response = await self.transport.handle_async_request(request)
+        body = await response.aread()
+        self.store.put(key, request.method, str(request.url), response.status_code, dict(response.headers), body)
+        return _httpx_response(request, (response.status_code, dict(response.headers), body))
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+
+def client(**kwargs):
+    """httpx.Client in the configured mode"""
+    if mode != "live":
+        limits = kwargs.pop("limits", httpx.Limits(max_connections=100, max_keepalive_connections=20))
+        kwargs["transport"] = RecordingTransport(httpx.HTTPTransport(limits=limits))
+    return httpx.Client(**kwargs)
+
+
+def async_client(**kwargs):
+    """httpx.AsyncClient in the configured mode"""
+    if mode != "live":
+        limits = kwargs.pop("limits", httpx.Limits(max_connections=100, max_keepalive_connections=20))
+        kwargs["transport"] = AsyncRecordingTransport(httpx.AsyncHTTPTransport(limits=limits))
+    return httpx.AsyncClient(**kwargs)
+
+
+_original_send = None
+
+
+def install_requests():
+    """Route requests, which WikibaseIntegrator uses, through the store"""
+    global _original_send
+    try:
+        import requests
+    except ImportError:
+        # WBI is not installed
+        return
+    if _original_send is not None:
+        return
+    _original_send = requests.Session.send
+
+    def send(session, request, **kwargs):
+        if mode == "live" or store is None:
+            return _original_send(session, request, **kwargs)
+        body = request.body.encode("utf-8") if isinstance(request.body, str) else request.body
+        key = request_key(request.method, request.url, body)
+        if mode == "replay":
+            stored = store.get(key)
+            if stored is None:
+                raise NotRecordedError(f"{request.method} {request.url} was not recorded")
+        else:
+            response = _original_send(session, request, **kwargs)
+            stored = response.status_code, dict(response.headers), response.content
+            store.put(key, request.method, request.url, *stored)
+        response = requests.Response()
+        response.status_code, headers, response._content = stored
+        response.headers = requests.structures.CaseInsensitiveDict(headers)
+        response.url = request.url
+        response.request = request
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        return response
+
+    requests.Session.send = send
+
+
+if mode != "live":
+    configure(mode)
@@ -0,0 +1,174 @@
+"""Run a heavy WDQS query as concurrent sub-queries over ranges of lexeme ids
+
+WDQS cancels every query after 60 seconds, and the query for all Swedish
+lexemes without an SO identifier with its two MINUS is close to that limit.
+ShardedQuery splits the L-id space into ranges and runs the query once per
+range with a FILTER on the number of the lexeme, at most parallelism at a
+time. A range that times out is split in two and both halves are run, down to
+min_width ids, so the query adapts to how dense the ranges are. The rows of
+all ranges are merged into one stream without duplicates.
+
+The upper bound of the ids is the highest L-id on Wikidata, read with a MAX
+query before the ranges are made, unless stop is given. Without stop the last
+range has no upper bound, so lexemes created after the bound was read are
+not dropped either.
+
+The query must contain {shard} where the FILTER goes, after the pattern that
+binds the lexeme variable."""
+import asyncio
+import logging
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+import config
+
+logger = logging.getLogger(__name__)
+
+default_endpoint_url = "https://query.wikidata.org/sparql"
+# used to plan the ranges if the highest L-id can't be read
+default_stop = 2000000
+highest_id_query = """SELECT (MAX(xsd:integer(STRAFTER(STR(?lexeme), "/entity/L"))) AS ?highest)
+WHERE { ?lexeme a ontolex:LexicalEntry. }"""
+
+
+class QueryTimeout(Exception):
+    """A range of min_width ids still timed out"""
+
+
+def is_timeout(status_code: int, text: str) -> bool:
+    """WDQS answers a query that hit the limit with 500 and the Java exception in the body"""
+    return status_code in (500, 502, 503, 504) and "TimeoutException" in text
+
+
+def shard_filter(variable: str, low: int, high: Optional[int] = None) -> str:
+    """The range filter, without an upper bound if high is None"""
+    number = f'xsd:integer(STRAFTER(STR(?{variable}), "/entity/L"))'
+    if high is None:
+        return f"FILTER({number} >= {low})"
+    return f"FILTER({number} >= {low} && {number} < {high})"
+
+
+def row_key(binding: Dict) -> Tuple:
+    return tuple(sorted((name, value.get("value")) for name, value in binding.items()))
+
+
+class ShardedQuery:
+    """A SPARQL query run in ranges of L-ids [start, stop), or from start and up if stop is None"""
+    query: str
+    variable: str
+
+    def __init__(self, query: str, variable: str = "lexemeId", start: int = 1, stop: Optional[int] = None,
+                 shards: int = 8, parallelism: int = 4, min_width: int = 1000, endpoint_url: str = None,
+                 client=None, retries: int = 3, retry_delay: float = 1.0):
+        if "{shard}" not in query:
+            raise ValueError("The query must contain {shard} where the range filter goes")
+        self.query = query
+        self.variable = variable
+        self.start = start
+        self.stop = stop
+        self.open_ended = stop is None
+        self.shards = shards
+        self.parallelism = parallelism
+        self.min_width = min_width
+        self.endpoint_url = endpoint_url or getattr(config, "sparql_endpoint_url", default_endpoint_url)
+        self.client = client
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.requests = 0
+        self.splits = 0
+
+    def ranges(self) -> List[Tuple[int, int]]:
+        width = -(-(self.stop - self.start) // self.shards)
+        return [(low, min(low + width, self.stop)) for low in range(self.start, self.stop, width)]
+
+    async def __post(self, client, semaphore: asyncio.Semaphore, query: str, name: str) -> Optional[List[Dict]]:
+        """The bindings of the query or None if it timed out"""
+        import httpx
+        for attempt in range(self.retries + 1):
+            try:
+                async with semaphore:
+                    self.requests += 1
+                    response = await client.post(self.endpoint_url, data={"query": query, "format": "json"},
+                                                 headers={"Accept": "application/sparql-results+json"})
+                if is_timeout(response.status_code, response.text):
+                    return None
+                if response.status_code == 429 and attempt < self.retries:
+                    delay = float(response.headers.get("Retry-After", self.retry_delay * 2 ** attempt))
+                    logger.warning(f"WDQS asked us to wait {delay} seconds")
+                    await asyncio.sleep(delay)
+                    continue
+                response.raise_for_status()
+                return response.json()["results"]["bindings"]
+            except httpx.TimeoutException:
+                return None
+            except httpx.HTTPError as e:
+                if attempt == self.retries:
+                    raise
+                logger.warning(f"The query of {name} failed with {e}, retrying")
+                await asyncio.sleep(self.retry_delay * 2 ** attempt)
+
+    async def __highest_id(self, client, semaphore: asyncio.Semaphore) -> Optional[int]:
+        try:
+            bindings = await self.__post(client, semaphore, highest_id_query, "the highest L-id")
+        except Exception as e:
+            logger.warning(f"Could not read the highest L-id: {e}")
+            return None
+        if not bindings or "highest" not in bindings[0]:
+            return None
+        return int(bindings[0]["highest"]["value"])
+
+    async def __run(self, client, semaphore: asyncio.Semaphore, queue: asyncio.Queue, low: int, high: int):
+        # the last range of an open ended query has no upper bound, high is only used to split it
+        open_ended = self.open_ended and high >= self.stop
+        name = f"L{low}-" if open_ended else f"L{low}-L{high}"
+        query = self.query.replace("{shard}", shard_filter(self.variable, low, None if open_ended else high))
+        bindings = await self.__post(client, semaphore, query, name)
+        if bindings is not None:
+            await queue.put(bindings)
+            return
+        if high - low <= self.min_width:
+            raise QueryTimeout(f"The query of {name} timed out")
+        middle = (low + high) // 2
+        self.splits += 1
+        logger.info(f"The query of {name} timed out, splitting it at L{middle}")
+        await asyncio.gather(self.__run(client, semaphore, queue, low, middle),
+                             self.__run(client, semaphore, queue, middle, high))
+
+    async def __run_all(self, client, queue: asyncio.Queue):
+        semaphore = asyncio.Semaphore(self.parallelism)
+        try:
+            if self.open_ended:
+                highest = await self.__highest_id(client, semaphore)
+                self.stop = highest + 1 if highest is not None and highest >= self.start else default_stop
+                logger.info(f"Running the query in {self.shards} ranges up to L{self.stop} and above")
+            await asyncio.gather(*[self.__run(client, semaphore, queue, low, high) for low, high in self.ranges()])
+        finally:
+            await queue.put(None)
+
+    async def stream(self) -> AsyncIterator[Dict]:
+        """The bindings of all ranges as they arrive, every row once"""
+        from modules import recorder
+        client = self.client or recorder.async_client(headers={"User-Agent": config.user_agent}, timeout=65)
+        queue: asyncio.Queue = asyncio.Queue()
+        seen = set()
+        task = None
+        try:
+            task = asyncio.create_task(self.__run_all(client, queue))
+            while (bindings := await queue.get()) is not None:
+                for binding in bindings:
+                    key = row_key(binding)
+                    if key not in seen:
+                        seen.add(key)
+                        yield binding
+            # raise the error of a failed range
+            await task
+        finally:
+            if task is not None and not task.done():
+                task.cancel()
+            if self.client is None:
+                await client.aclose()
+
+    def rows(self) -> List[Dict]:
+        """Run the query and return all bindings"""
+        async def collect():
+            return [binding async for binding in self.stream()]
+        return asyncio.run(collect())
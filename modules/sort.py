@@ -0,0 +1,166 @@
+"""Sort the extracted JSONL by SO id into shards that can be joined and searched
+
+The extractor writes the records in the order os.listdir returns the pages.
+sort_jsonl reads a file in runs of at most run_size records, writes every run
+sorted to a temporary file and merges the runs into shards of at most
+shard_bytes, so memory is bounded by the run size and not the file. Every
+shard has a sparse index with the key and byte offset of every index_every'th
+record, and the manifest lists the first and last key of every shard, so a
+record is found by two binary searches and reading at most index_every lines.
+
+Superlemmas are sorted by their SO id like 100095_2, the id the joins and
+the P9837 values use, and articles by their page id. The keys have the
+numbers in the ids zero padded, so snr99 sorts before snr100 and the keys of
+all shards compare as plain strings."""
+import heapq
+import json
+import os
+import re
+import tempfile
+from bisect import bisect_left
+from typing import Dict, Iterator, List
+
+from modules.pages import entry_id, entry_id_field
+
+# The field of every kind of record that it is sorted by
+key_fields = {"articles": "page_id", "superlemmas": entry_id_field, "idioms": "id_"}
+
+
+def field_value(record: Dict, field: str):
+    """The value a record is sorted by, superlemmas without an SO id by their page"""
+    return entry_id(record) if field == entry_id_field else record.get(field)
+
+
+def sort_key(id_) -> str:
+    """snr123 -> snr000000000123"""
+    return re.sub(r"\d+", lambda match: match.group(0).zfill(12), str(id_ or ""))
+
+
+def _write_run(lines: List[tuple], directory: str) -> str:
+    lines.sort(key=lambda line: line[0])
+    with tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=directory, suffix=".run",
+                                     delete=False) as f:
+        for key, line in lines:
+            f.write(f"{key}\t{line}")
+    return f.name
+
+
+def _read_run(path: str) -> Iterator[tuple]:
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            key, line = line.split("\t", 1)
+            yield key, line
+
+
+def sort_jsonl(path: str, directory: str, name: str, field: str = None,
+               run_size: int = 100000, shard_bytes: int = 64 * 1024 * 1024,
+               index_every: int = 256) -> Dict:
+    """Write the records of path sorted by key to shards in directory
+    and return the manifest that is also written to {name}.json there"""
+    field = field or key_fields[name]
+    os.makedirs(directory, exist_ok=True)
+    for file in os.listdir(directory):
+        if file.startswith(f"{name}_") and file.endswith(".jsonl"):
+            os.remove(os.path.join(directory, file))
+    runs = []
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            lines = []
+            for line in f:
+                if not line.strip():
+                    continue
+                if not line.endswith("\n"):
+                    line += "\n"
+                lines.append((sort_key(field_value(json.loads(line), field)), line))
+                if len(lines) >= run_size:
+                    runs.append(_write_run(lines, directory))
+                    lines = []
+            if lines or not runs:
+                runs.append(_write_run(lines, directory))
+        # the merge is stable so records with the same key keep the order of the input
+        merged = heapq.merge(*(_read_run(run) for run in runs), key=lambda line: line[0])
+        shards = _write_shards(merged, directory, name, shard_bytes, index_every)
+    finally:
+        for run in runs:
+            os.remove(run)
+    manifest = {"name": name, "source": path, "field": field, "index_every": index_every, "shards": shards}
+    with open(os.path.join(directory, f"{name}.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1, ensure_ascii=False)
+    return manifest
+
+
+def _write_shards(lines: Iterator[tuple], directory: str, name: str,
+                  shard_bytes: int, index_every: int) -> List[Dict]:
+    shards: List[Dict] = []
+    f = None
+    shard = None
+    for key, line in lines:
+        if f is None or (shard["bytes"] >= shard_bytes and key != shard["last_key"]):
+            # records with the same key are never split between shards
+            if f is not None:
+                f.close()
+            shard = {"file": f"{name}_{len(shards):04d}.jsonl", "first_key": key, "last_key": key,
+                     "records": 0, "bytes": 0, "index": []}
+            shards.append(shard)
+            f = open(os.path.join(directory, shard["file"]), "wb")
+        if shard["records"] % index_every == 0:
+            shard["index"].append([key, shard["bytes"]])
+        data = line.encode("utf-8")
+        f.write(data)
+        shard["last_key"] = key
+        shard["records"] += 1
+        shard["bytes"] += len(data)
+    if f is not None:
+        f.close()
+    return shards
+
+
+class ShardedJsonl:
+    """Read the shards written by sort_jsonl in key order or seek to a key"""
+    directory: str
+    manifest: Dict
+
+    def __init__(self, directory: str, name: str):
+        self.directory = directory
+        with open(os.path.join(directory, f"{name}.json"), "r", encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        self.field = self.manifest["field"]
+        self.shards = self.manifest["shards"]
+        self.last_keys = [shard["last_key"] for shard in self.shards]
+
+    def __len__(self):
+        return sum(shard["records"] for shard in self.shards)
+
+    def __iter__(self) -> Iterator[Dict]:
+        return self.iter_from()
+
+    def iter_from(self, key: str = None) -> Iterator[Dict]:
+        """Records in key order starting at the first with a key >= key"""
+        key = sort_key(key) if key is not None else None
+        first = 0 if key is None else bisect_left(self.last_keys, key)
+        for number in range(first, len(self.shards)):
+            shard = self.shards[number]
+            offset = 0
+            if key is not None and number == first:
+                keys = [entry[0] for entry in shard["index"]]
+                # the record is after the last sampled key that is smaller
+                position = bisect_left(keys, key) - 1
+                offset = shard["index"][position][1] if position >= 0 else 0
+            with open(os.path.join(self.directory, shard["file"]), "rb") as f:
+                f.seek(offset)
+                for line in f:
+                    record = json.loads(line)
+                    if key is not None and number == first and sort_key(field_value(record, self.field)) < key:
+                        continue
+                    yield record
+
+    def get(self, id_) -> List[Dict]:
+        """All records with the id, articles share the page id of their page and
+        superlemmas are found by their SO id"""
+        key = sort_key(id_)
+        records = []
+        for record in self.iter_from(id_):
+            if sort_key(field_value(record, self.field)) != key:
+                break
+            records.append(record)
+        return records
@@ -1,22 +1,39 @@
 import asyncio
-import gzip
 import os
 import time
 from typing import List
 
-import httpx
-import pandas as pd
-from bs4 import SoupStrainer, BeautifulSoup
-from httpx import Limits, ConnectTimeout, ReadTimeout, ConnectError, HTTPStatusError
-from pydantic import BaseModel, Field, ValidationError
-from tqdm.asyncio import tqdm
+from pydantic import BaseModel, Field, PrivateAttr, ValidationError
 
 import config
-from config import max_ids_to_scrape
+from modules.pages import PageStore, canonical_id
+
+
+def article_body(html_content: str) -> str:
+    """Strain the articleBody region out of a SO page and minify it, see modules/minify.py"""
+    from bs4 import SoupStrainer, BeautifulSoup
+    from modules.minify import minify_soup
+    # Define the tag and attributes you want to extract
+    strainer = SoupStrainer(attrs={"itemprop": "articleBody"})
+
+    # Parse the HTML content with BeautifulSoup
+    soup = BeautifulSoup(html_content, 'lxml', parse_only=strainer)
+    return minify_soup(soup)
+
+
+def retryable_status(status_code: int) -> bool:
+    """SO answers 429 or 5xx when it blocks us, other status codes like 404 do not change on retry"""
+    return status_code == 429 or status_code >= 500
+
+
+def extract_page(html: str, page_id: str):
+    """Run by the extraction workers of the streaming crawl"""
+    from models.extractor import Extractor
+    return Extractor().extract_page(html, page_id)
 
 
 class Identifier(BaseModel):
-    id_: int
+    id_: str  # the canonical page id, 167464_1 and 167464 are the same page
     entry: str
 
     def __eq__(self, other):
@@ -44,8 +61,15 @@ class Identifier(BaseModel):
 
 class IdentifierModel(BaseModel):
     fetched: int = 0
-    timeout: int = 0
+    timeout: int = 0  # timeouts, connection errors and other failures that are worth retrying
+    missing: int = 0  # pages that SO answered with e.g. 404
+    extracted: int = 0
     identifiers: List[Identifier] = Field(..., description="List of Identifier objects")
+    _store: PageStore = PrivateAttr(default_factory=PageStore)
+
+    @property
+    def store(self) -> PageStore:
+        return self._store
 
     @classmethod
     def from_csv(cls, csv_file: str) -> 'IdentifierModel':
@@ -55,19 +79,23 @@ class IdentifierModel(BaseModel):
         :param csv_file: Path to the CSV file
         :return: An instance of IdentifierModel
         """
+        import pandas as pd
         try:
             # Read the CSV file, only the first two columns
-            df = pd.read_csv(csv_file, delimiter='\t', header=None, usecols=[0, 1], names=['id_', 'entry'])
+            df = pd.read_csv(csv_file, delimiter='\t', header=None, usecols=[0, 1], names=['id_', 'entry'],
+                             dtype=str, quoting=3, keep_default_na=False)
 
             # Ensure the columns have been read correctly
             if df.shape[1] < 2:
                 raise ValueError("The CSV file does not contain at least two columns")
 
-            # Create a set of unique Identifier instances from the DataFrame
-            unique_identifiers = {Identifier(id_=row['id_'], entry=row['entry']) for _, row in df.iterrows()}
+            # Create one Identifier per page, the id variants of a page are aliases
+            unique_identifiers = {}
+            for id_, entry in zip(df['id_'], df['entry']):
+                unique_identifiers.setdefault(canonical_id(id_), entry)
 
             # Create an instance of IdentifierModel
-            return cls(identifiers=list(unique_identifiers))
+            return cls(identifiers=[Identifier(id_=id_, entry=entry) for id_, entry in unique_identifiers.items()])
         except Exception as e:
             raise ValueError(f"Failed to read identifiers from CSV: {e}")
 
@@ -78,84 +106,240 @@ class IdentifierModel(BaseModel):
         :param identifier: Identifier object containing the id and entry
         :return: Path to the saved HTML file
         """
-        # Ensure the output directory exists
-        output_dir = 'data/html'
-        os.makedirs(output_dir, exist_ok=True)
-
+        from httpx import Limits, TransportError, HTTPStatusError
+        from modules import recorder
         # File path for the gzipped HTML file
-        file_path = os.path.join(output_dir, f"{identifier.id_}.html.gz")
+        file_path = self.store.path(identifier.id_)
 
-        if not os.path.exists(file_path):
+        if identifier.id_ not in self.store:
             """They seem to have some kind of blocking against scraping. 
             When I ask for 1000 pages I get ~900 timeouts the first try
             Then if I ask immediately again I get 100% timeouts.
             Then I wait 20 seconds and ask again and then I get 100 pages and the rest is blocked
             
             So the best cause of action is to fetch 100, wait 15-20 seconds then fetch the next 100 and so forth"""
-            async with httpx.AsyncClient(limits=Limits(max_connections=5, #max_keepalive_connections=2
-                                                       )) as client:
+            async with recorder.async_client(limits=Limits(max_connections=5, #max_keepalive_connections=2
+                                                           )) as client:
                 try:
                     response = await client.get(identifier.url)
                     response.raise_for_status()
 
-                    # HTML content as string
-                    html_content = response.text
-                    # Define the tag and attributes you want to extract
-                    strainer = SoupStrainer(attrs={"itemprop": "articleBody"})
-
-                    # Parse the HTML content with BeautifulSoup
-                    soup = BeautifulSoup(html_content, 'lxml', parse_only=strainer)
-                    html = str(soup)
-                    # Write the HTML content gzipped to the file
-                    with gzip.open(file_path, 'wt', encoding='utf-8') as f:
-                        f.write(html)
+                    html = article_body(response.text)
+                    # Write the HTML content gzipped to the file unless we already have it under another id
+                    self.store.write(identifier.id_, html)
                     self.fetched += 1
                     return file_path
-                except (ConnectTimeout, ReadTimeout,
-                        HTTPStatusError
-                        ):
+                except TransportError:
                     # print("got timeout")
                     self.timeout += 1
+                except HTTPStatusError as e:
+                    if retryable_status(e.response.status_code):
+                        self.timeout += 1
+                    else:
+                        self.missing += 1
 
     async def fetch_all_html(self, start, stop):
         """
         Fetch and save HTML for all identifiers.
         """
+        from tqdm.asyncio import tqdm
         ids = self.identifiers[start:stop]
         tasks = [self.fetch_url(id_) for id_ in ids]
         return await tqdm.gather(*tasks)
 
+    async def fetch_html(self, identifier: Identifier, client, archive: bool = False) -> str | None:
+        """
+        Fetch the articleBody html for a given identifier without storing it
+        unless archive is True. Pages already archived are read from disk.
+
+        :return: The html or None if we got a timeout or the page is missing
+        """
+        from httpx import TransportError, HTTPStatusError
+        if identifier.id_ in self.store:
+            return self.store.read(identifier.id_)
+        try:
+            response = await client.get(identifier.url)
+            response.raise_for_status()
+        except TransportError:
+            self.timeout += 1
+            return None
+        except HTTPStatusError as e:
+            if retryable_status(e.response.status_code):
+                self.timeout += 1
+            else:
+                self.missing += 1
+            return None
+        html = article_body(response.text)
+        if archive:
+            self.store.write(identifier.id_, html)
+        self.fetched += 1
+        return html
+
+    async def stream_extract(self, start: int, stop: int, workers: int = 2, queue_size: int = 50,
+                             archive: bool = False, batch_size: int = 100, sleep: int = 15):
+        """
+        Fetch the identifiers in batches and hand each page through a bounded
+        queue to a pool of extraction processes that write straight to the JSONL files.
+        Parsing overlaps with the network wait and the sleep between the batches.
+        """
+        import httpx
+        from concurrent.futures import ProcessPoolExecutor
+        from models.extractor import Extractor, JsonlSink
+        from modules import recorder
+        from modules.pages import ProcessedHashes, content_hash
+        processed = ProcessedHashes(Extractor().hashes_txt.format(config.version))
+        queued = set()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        loop = asyncio.get_running_loop()
+
+        async def produce(client):
+            for batch_start in range(start, stop, batch_size):
+                fetched = self.fetched
+                ids = self.identifiers[batch_start:min(batch_start + batch_size, stop)]
+                print(f"Start = {batch_start}, stop = {batch_start + len(ids)}")
+
+                async def fetch(identifier):
+                    html = await self.fetch_html(identifier, client, archive=archive)
+                    if html is None:
+                        return
+                    # pages with the same content as one already extracted or queued are not parsed again
+                    hash_ = content_hash(html)
+                    if hash_ not in processed and hash_ not in queued:
+                        queued.add(hash_)
+                        await queue.put((identifier.id_, html, hash_))
+
+                await asyncio.gather(*[fetch(identifier) for identifier in ids])
+                if self.fetched > fetched and batch_start + batch_size < stop and not recorder.replaying():
+                    print(f"Sleeping {sleep} sec to avoid timeouts")
+                    await asyncio.sleep(sleep)
+            for _ in range(workers):
+                await queue.put(None)
+
+        async def consume(pool, sink):
+            while (item := await queue.get()) is not None:
+                page_id, html, hash_ = item
+                extracted = await loop.run_in_executor(pool, extract_page, html, page_id)
+                sink.write(extracted)
+                if extracted["quarantine"] and page_id not in self.store:
+                    # keep the html so that lexso extract --retry can process the page again
+                    self.store.write(page_id, html)
+                if not any(entry["article"] is None for entry in extracted["quarantine"]):
+                    # only after the page is written, a page that failed or was still
+                    # in the queue when the run stopped is extracted again
+                    processed.add(hash_)
+                self.extracted += 1
+
+        with ProcessPoolExecutor(max_workers=workers) as pool, JsonlSink() as sink:
+            async with recorder.async_client(limits=httpx.Limits(max_connections=5)) as client:
+                await asyncio.gather(produce(client), *[consume(pool, sink) for _ in range(workers)])
+        print(f"Fetched {self.fetched} pages, got {self.timeout} timeouts "
+              f"and extracted {self.extracted} pages")
+
 
-# Example usage:
-# Assuming you have a CSV file named 'P9837.csv' in the 'data' directory
-try:
+def crawl(start: int = 100, stop: int = None, csv_file: str = 'data/P9837.csv'):
+    """Fetch the html of all identifiers in batches of 100 from start to stop
+    sleeping between the batches to avoid getting blocked"""
+    from modules import recorder
+    if stop is None:
+        stop = config.max_ids_to_scrape
+    try:
+        print("Loading identifiers from file")
+        identifier_model = IdentifierModel.from_csv(csv_file)
+        print(f"Starting fetch of html for all {len(identifier_model.identifiers)} identifiers")
+        # Fetch and save all HTML pages asynchronously
+        run = True
+        batch_stop = min(start + 100, stop)
+        fetched = 0
+        timeout = 0
+        while run:
+            print(f"Start = {start}, stop = {batch_stop}")
+            asyncio.run(identifier_model.fetch_all_html(start=start, stop=batch_stop))
+            new_fetched = identifier_model.fetched
+            new_timeout = identifier_model.timeout
+            print(f"Fetched {new_fetched - fetched} pages and got {new_timeout - timeout} timouts")
+            if new_fetched > fetched and not recorder.replaying():
+                print("Sleeping 15 sec to avoid timeouts")
+                time.sleep(15)
+            start += 100
+            # don't fetch into the range of the next worker
+            batch_stop = min(start + 100, stop)
+            fetched = new_fetched
+            timeout = new_timeout
+            if start >= stop:
+                run = False
+                print(f"Stopped at {stop}")
+
+    except ValidationError as e:
+        print("Validation error:", e)
+    except ValueError as e:
+        print("Error:", e)
+
+
+def crawl_leased(lease_table: str = "data/leases.sqlite", worker: str = None, start: int = 0, stop: int = None,
+                 csv_file: str = 'data/P9837.csv', html_directory: str = 'data/html', range_size: int = 500,
+                 lease_seconds: float = 600, batch_size: int = 100, sleep: int = 15, retry_seconds: float = 60):
+    """Fetch the ranges of identifiers leased from a table shared with other workers.
+    Run one per egress host or process, each storing in its own html directory
+    if they don't share a disk, and merge the directories with lexso merge.
+    A range where identifiers timed out is released and can be leased again after
+    retry_seconds, then only the pages that are not stored yet are fetched. Pages
+    that SO answers with e.g. 404 are missing and don't keep a range from being done.
+    When no range is free the worker polls every retry_seconds until all are done"""
+    from modules import recorder
+    from modules.leases import LeaseTable, default_worker
+    worker = worker or default_worker()
+    identifier_model = IdentifierModel.from_csv(csv_file)
+    identifier_model._store = PageStore(html_directory)
+    if stop is None:
+        stop = len(identifier_model.identifiers)
+    leases = LeaseTable(lease_table)
+    print(f"{leases.create_ranges(start, stop, range_size)} ranges in {lease_table}, working as {worker}")
+    while True:
+        lease = leases.acquire(worker, lease_seconds)
+        if lease is None:
+            progress = leases.progress()
+            if progress["done"] == progress["ranges"]:
+                break
+            # ranges released for retry or leased by other workers that may crash
+            print(f"No free ranges, {progress}. Polling again in {retry_seconds} sec")
+            time.sleep(retry_seconds)
+            continue
+        range_start, range_stop = lease
+        print(f"Leased {range_start} to {range_stop}")
+        timeout = identifier_model.timeout
+        for batch_start in range(range_start, range_stop, batch_size):
+            fetched = identifier_model.fetched
+            asyncio.run(identifier_model.fetch_all_html(start=batch_start,
+                                                        stop=min(batch_start + batch_size, range_stop)))
+            if not leases.renew(range_start, worker, lease_seconds):
+                print(f"Lost the lease on {range_start} to another worker")
+                break
+            if identifier_model.fetched > fetched and not recorder.replaying():
+                print(f"Sleeping {sleep} sec to avoid timeouts")
+                time.sleep(sleep)
+        else:
+            if identifier_model.timeout > timeout:
+                print(f"Got {identifier_model.timeout - timeout} timeouts in {range_start} to {range_stop}, "
+                      f"releasing it to retry in {retry_seconds} sec")
+                leases.release(range_start, worker, retry_seconds)
+            else:
+                leases.complete(range_start, worker)
+    print(f"All ranges are done, {leases.progress()}. Fetched {identifier_model.fetched} pages, "
+          f"{identifier_model.missing} were missing and got {identifier_model.timeout} timeouts")
+    leases.close()
+
+
+def crawl_and_extract(start: int = 100, stop: int = None, csv_file: str = 'data/P9837.csv',
+                      workers: int = 2, queue_size: int = 50, archive: bool = False):
+    """Fetch the identifiers and extract them in the same pass"""
+    if stop is None:
+        stop = config.max_ids_to_scrape
     print("Loading identifiers from file")
-    identifier_model = IdentifierModel.from_csv('data/P9837.csv')
-    print(f"Starting fetch of html for all {len(identifier_model.identifiers)} identifiers")
-    # Fetch and save all HTML pages asynchronously
-    run = True
-    start = 100
-    stop = 200
-    fetched = 0
-    timeout = 0
-    while run:
-        print(f"Start = {start}, stop = {stop}")
-        asyncio.run(identifier_model.fetch_all_html(start=start, stop=stop))
-        new_fetched = identifier_model.fetched
-        new_timeout =  identifier_model.timeout
-        print(f"Fetched {new_fetched - fetched} pages and got {new_timeout - timeout} timouts")
-        if new_fetched > fetched:
-            print("Sleeping 15 sec to avoid timeouts")
-            time.sleep(15)
-        start += 100
-        stop = start + 100
-        fetched = new_fetched
-        timeout = new_timeout
-        if start >= config.max_ids_to_scrape:
-            run = False
-            print(f"Stopped at {config.max_ids_to_scrape}")
-
-except ValidationError as e:
-    print("Validation error:", e)
-except ValueError as e:
-    print("Error:", e)
+    identifier_model = IdentifierModel.from_csv(csv_file)
+    print(f"Starting streaming fetch and extraction of {len(identifier_model.identifiers)} identifiers")
+    asyncio.run(identifier_model.stream_extract(start=start, stop=stop, workers=workers,
+                                                queue_size=queue_size, archive=archive))
+
+
+if __name__ == "__main__":
+    crawl()
@@ -0,0 +1,17 @@
+from unittest import TestCase
+
+from benchmark import run, synthetic_data
+
+
+class TestBenchmark(TestCase):
+    def test_synthetic_data(self):
+        bindings, rows = synthetic_data(100)
+        assert len(bindings) == 100
+        assert len({binding["lemma"]["value"] for binding in bindings}) == 100
+        assert 70 < len(rows) < 100
+
+    def test_run(self):
+        report = run(lexemes=300, max_edits=20, error_rate=0.05, use_wbi=False)
+        assert report["lexemes"] == 300
+        assert report["edits"] == 20
+        assert set(report["seconds"]) == {"fetch", "load", "match", "upload"}
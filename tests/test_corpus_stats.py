@@ -0,0 +1,28 @@
+import os
+from unittest import TestCase
+
+from models.extractor import Extractor
+from modules.corpus_stats import corpus_report, markdown
+
+test_data = os.path.join(os.path.dirname(os.path.dirname(__file__)), "test_data")
+
+
+class TestCorpusStats(TestCase):
+    def test_corpus_report(self):
+        superlemmas = []
+        articles = []
+        for name in ("test1.html", "test2.html"):
+            with open(os.path.join(test_data, name), "r", encoding="utf-8") as file:
+                extracted = Extractor().extract_page(file.read(), name)
+            superlemmas += extracted["superlemmas"]
+            articles += extracted["articles"]
+        articles.append({"year_of_publication": "", "lemmalist": []})
+        report = corpus_report(superlemmas, articles, chunk_size=1)
+        assert report["entries"] == len(superlemmas)
+        assert sum(category["entries"] for category in report["by_lexical_category"]) == len(superlemmas)
+        assert report["year_of_publication"] == {"2021": 2, "unknown": 1}
+        assert report["articles"] == 3
+        assert report["idioms"] == sum(len(superlemma["lexem"]["idioms"]) for superlemma in superlemmas)
+        assert report["with_pronunciation"] == sum(1 for superlemma in superlemmas if superlemma["pronunciation"])
+        assert sum(report["inflections_histogram"].values()) == len(superlemmas)
+        assert "| 2021 | 2 |" in markdown(report)
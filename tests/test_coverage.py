@@ -0,0 +1,43 @@
+from unittest import TestCase
+
+from modules.coverage import coverage_report
+from modules.dump import lexeme_record
+
+
+def record(id_, category, so_ids=(), so_no_value=False, forms=1, senses=0, senses_with_p5137=0, examples=0):
+    return {"id": id_, "lemma": "", "lexical_category": category,
+            "forms": [{"id": f"{id_}-F{n}", "representation": ""} for n in range(forms)],
+            "so_ids": list(so_ids), "so_no_value": so_no_value, "senses": senses,
+            "senses_with_p5137": senses_with_p5137, "forms_with_an_example": examples}
+
+
+class TestCoverage(TestCase):
+    def test_coverage_report(self):
+        records = [
+            record("L1", "Q1084", so_ids=["146010"], forms=8, senses=2, senses_with_p5137=1, examples=1),
+            record("L2", "Q1084", forms=8),
+            record("L3", "Q24905", so_no_value=True, forms=5, senses=1, senses_with_p5137=1),
+            # written before senses were added to the snapshot
+            {"id": "L4", "lemma": "", "lexical_category": "Q34698", "forms": [], "so_ids": [], "so_no_value": False},
+        ]
+        report = coverage_report(records, chunk_size=2)
+        assert report["lexemes"] == 4
+        assert report["forms"] == 21
+        assert report["forms_without_an_example"] == 20
+        assert report["senses_with_p5137_per_lexeme"] == 0.5
+        assert report["so_coverage"] == 0.5
+        assert [category["lexical_category"] for category in report["by_lexical_category"]] == [
+            "Q1084", "Q24905", "Q34698"]
+        assert report["by_lexical_category"][0]["so_coverage"] == 0.5
+
+    def test_lexeme_record(self):
+        entity = {
+            "id": "L1", "lemmas": {"sv": {"value": "honung"}}, "lexicalCategory": "Q1084", "forms": [],
+            "claims": {"P5831": [{"mainsnak": {"snaktype": "value"}, "qualifiers": {"P5830": [
+                {"snaktype": "value", "datavalue": {"value": {"id": "L1-F1"}}}]}}]},
+            "senses": [{"claims": {"P5137": [{"mainsnak": {"snaktype": "value",
+                                                           "datavalue": {"value": {"id": "Q10987"}}}}]}},
+                       {"claims": {}}],
+        }
+        result = lexeme_record(entity)
+        assert (result["senses"], result["senses_with_p5137"], result["forms_with_an_example"]) == (2, 1, 1)
@@ -0,0 +1,33 @@
+from unittest import TestCase
+
+from modules.diff import diff_versions, summarize
+
+
+def superlemma(id_, value, inflections, hyphenation=""):
+    return {"id_": id_, "value": value, "hyphenation": hyphenation,
+            "lemvar": {"id_": "lnr" + id_, "value": value,
+                       "inflections": [{"id_": f"boj{id_}", "value": inflections}]}}
+
+
+old = [
+    ("superlemma", superlemma("1", "honung", "honungen")),
+    ("superlemma", superlemma("2", "len", "lent")),
+    ("idiom", {"id_": "inr1", "value": "len som honung"}),
+]
+new = [
+    ("superlemma", superlemma("1", "honung", "honungen", hyphenation="hon|ung")),
+    ("superlemma", superlemma("3", "kår", "kåren")),
+    ("idiom", {"id_": "inr1", "value": "len som honung"}),
+]
+
+
+class TestDiff(TestCase):
+    def test_diff_versions(self):
+        changes = list(diff_versions(iter(old), iter(new)))
+        assert {(c["type"], c["id"], c["change"]) for c in changes} == {
+            ("superlemma", "1", "changed"),
+            ("superlemma", "3", "added"),
+            ("superlemma", "2", "removed"),
+        }
+        assert changes[0]["fields"] == ["hyphenation"]
+        assert summarize(changes)["superlemma"] == {"added": 1, "removed": 1, "changed": 1}
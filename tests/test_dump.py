@@ -0,0 +1,59 @@
+import bz2
+import gzip
+import json
+import os
+import tempfile
+from unittest import TestCase
+
+from models.wikidata import LexemeLanguage
+from modules.dump import read_dump
+
+
+def lexeme(id_, lemma, language="Q9027", claims=None):
+    return {
+        "type": "lexeme", "id": id_, "language": language, "lexicalCategory": "Q1084",
+        "lemmas": {"sv": {"language": "sv", "value": lemma}},
+        "forms": [{"id": f"{id_}-F1", "representations": {"sv": {"language": "sv", "value": lemma + "en"}}}],
+        "claims": claims or {},
+    }
+
+
+entities = [
+    lexeme("L1", "honung"),
+    lexeme("L2", "honey", language="Q1860"),
+    lexeme("L3", "len", claims={"P9837": [{"mainsnak": {"snaktype": "value", "property": "P9837",
+                                                        "datavalue": {"value": "146010", "type": "string"}}}]}),
+    lexeme("L4", "xyzzy", claims={"P9837": [{"mainsnak": {"snaktype": "novalue", "property": "P9837"}}]}),
+]
+
+
+def write_dump(path, open_):
+    with open_(path, "wt", encoding="utf-8") as f:
+        f.write("[\n")
+        f.write(",\n".join(json.dumps(entity, separators=(",", ":")) for entity in entities))
+        f.write("\n]\n")
+
+
+class TestDump(TestCase):
+    def test_read_dump(self):
+        with tempfile.TemporaryDirectory() as directory:
+            for name, open_ in (("dump.json.gz", gzip.open), ("dump.json.bz2", bz2.open)):
+                path = os.path.join(directory, name)
+                write_dump(path, open_)
+                for processes in (1, 2):
+                    records = list(read_dump(path, processes=processes))
+                    assert [record["id"] for record in records] == ["L1", "L3", "L4"]
+                    assert records[0]["forms"] == [{"id": "L1-F1", "representation": "honungen"}]
+                    assert records[1]["so_ids"] == ["146010"]
+                    assert records[2]["so_no_value"]
+
+    def test_snapshot(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "dump.json.gz")
+            write_dump(path, gzip.open)
+            snapshot = os.path.join(directory, "lexemes_sv.jsonl")
+            language = LexemeLanguage("sv")
+            assert language.write_snapshot_from_dump(path, snapshot) == 3
+            language.load_lexemes_without_so_id_from_snapshot(snapshot)
+            assert [lexeme.id for lexeme in language.lexemes] == ["L1"]
+            assert language.lexemes[0].forms[0].representation == "honungen"
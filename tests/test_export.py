@@ -0,0 +1,45 @@
+from datetime import datetime
+from unittest import TestCase
+
+from models.plan import PlannedEdit
+from modules.export import quickstatements, wbeditentity
+
+edits = [
+    PlannedEdit(lexeme_id="L1", lemma="len", lexical_category="Q34698", action="value", so_id="146010"),
+    PlannedEdit(lexeme_id="L2", lemma="xyzzy", lexical_category="Q1084", action="novalue"),
+    PlannedEdit(lexeme_id="L3", lemma="rum", lexical_category="Q1084", action="skip"),
+]
+
+
+class TestExport(TestCase):
+    def test_quickstatements(self):
+        lines = [line.split("\t/*")[0] for line in quickstatements(edits, date=datetime(2024, 6, 1))]
+        assert lines == [
+            'L1\tP9837\t"146010"',
+            "L1\tP1343\tQ108312794",
+            "L2\tP9837\tnovalue\tP585\t+2024-06-01T00:00:00Z/11",
+        ]
+
+    def test_wbeditentity(self):
+        requests = list(wbeditentity(edits, date=datetime(2024, 6, 1)))
+        assert [request["id"] for request in requests] == ["L1", "L2"]
+        assert requests[0]["data"]["claims"][0]["mainsnak"]["datavalue"]["value"] == "146010"
+        novalue = requests[1]["data"]["claims"][0]
+        assert novalue["mainsnak"]["snaktype"] == "novalue"
+        assert novalue["qualifiers"]["P585"][0]["datavalue"]["value"]["time"] == "+2024-06-01T00:00:00Z"
+
+    def test_wbeditentity_with_current_entities(self):
+        source = {"mainsnak": {"snaktype": "value", "property": "P1343",
+                               "datavalue": {"value": {"entity-type": "item", "id": "Q108312794"}}}}
+        entities = {
+            # already described by SO like WBI would find it
+            "L1": {"id": "L1", "claims": {"P1343": [source]}},
+            # got P9837 after the plan was made
+            "L2": {"id": "L2", "claims": {"P9837": [{"mainsnak": {"snaktype": "novalue"}}]}},
+        }
+        requests = list(wbeditentity(edits, date=datetime(2024, 6, 1), entities=entities.get))
+        assert [request["id"] for request in requests] == ["L1"]
+        assert [claim["mainsnak"]["property"] for claim in requests[0]["data"]["claims"]] == ["P9837"]
+        assert list(quickstatements(edits, entities=entities.get))[0].startswith('L1\tP9837\t"146010"')
+        # a deleted lexeme is skipped
+        assert list(wbeditentity(edits[:1], entities={}.get)) == []
@@ -0,0 +1,33 @@
+from unittest import TestCase
+
+from bs4 import BeautifulSoup
+
+from models.extractor import Extractor, SeeAlso
+from models.graph import SeeAlsoGraph
+
+
+class TestSeeAlsoGraph(TestCase):
+    def test_queries(self):
+        graph = SeeAlsoGraph.from_edges([("1", "2"), ("2", "3"), ("1", "2"), ("3", "1"), ("4", "5"), ("6", "6")])
+        assert graph.edge_count == 4
+        assert graph.neighbors("1") == ["2"]
+        assert graph.reverse_neighbors("1") == ["3"]
+        assert graph.k_hop("1", 2) == {"2": 1, "3": 2}
+        assert graph.neighbors("unknown") == []
+        report = graph.components_report()
+        assert report["components"] == 2
+        assert report["largest"] == [3, 2]
+
+    def test_see_also_target(self):
+        with open('test_data/test2.html', 'r', encoding='utf-8') as file:
+            html = file.read()
+        extracted = Extractor().extract_page(html, page_id="146010")
+        targets = [see_also["target_id"] for see_also in extracted["superlemmas"][0]["lexem"]["see_alsos"]]
+        assert "179969" in targets
+        graph = SeeAlsoGraph.from_edges(("146010", target) for target in targets)
+        assert "179969" in graph.neighbors("146010")
+
+    def test_see_also_to_a_homograph(self):
+        soup = BeautifulSoup('<a class="hvid" id="xnr1" href="/so/?id=167464_1&pz=5">fil</a>', "html.parser")
+        assert SeeAlso.from_soup(soup.a).target_id == "167464"
+        assert SeeAlso.from_soup(BeautifulSoup('<a id="xnr2">fil</a>', "html.parser").a).target_id == ""
@@ -0,0 +1,41 @@
+from unittest import TestCase
+
+from models.extractor import Extractor
+from models.join import FormJoin, split_forms
+
+
+class TestFormJoin(TestCase):
+    def test_split_forms(self):
+        assert split_forms("lent lena") == {"lent", "lena"}
+        assert split_forms("honung­en, -er") == {"honungen"}
+
+    def test_homographs_are_scored_by_their_forms(self):
+        join = FormJoin()
+        # both homographs are on page 118899
+        join.add_superlemma({"id_": "snr1", "page_id": "118899", "so_id": "118899_1",
+                             "lexical_category": "substantiv", "lemvar": {"value": "fil", "inflections": [{"value": "filen", "values": ["filen", "filer"]}]}})
+        join.add_superlemma({"id_": "snr2", "page_id": "118899", "so_id": "118899_2",
+                             "lexical_category": "substantiv", "lemvar": {"value": "fil", "inflections": [{"value": "filen", "values": ["filen", "filar"]}]}})
+        scores = join.entry_scores("fil", ["fil", "filen", "filar", "filarna"])
+        assert scores["118899_2"] > scores["118899_1"]
+        assert join.entry_scores("okänd", ["okänd"]) == {}
+
+    def test_homographs_on_a_page_get_their_number(self):
+        pages = []
+        for name in ("test1.html", "test2.html"):
+            with open(f"test_data/{name}", "r", encoding="utf-8") as file:
+                pages.append(file.read())
+        e = Extractor()
+        extracted = e.extract_page("".join(pages), "100095")
+        assert {superlemma["id_"]: superlemma["so_id"] for superlemma in extracted["superlemmas"]} == {
+            "snr65554": "100095_1", "snr86634": "100095_2"}
+        assert [superlemma["so_id"] for superlemma in e.extract_page(pages[0], "131121")["superlemmas"]] == ["131121"]
+
+    def test_extracted_superlemma(self):
+        with open('test_data/test2.html', 'r', encoding='utf-8') as file:
+            html = file.read()
+        e = Extractor(html=html)
+        e.__extract_articles__()
+        join = FormJoin()
+        join.add_superlemma(e.articles[0].lemmalist[0].model_dump())
+        assert join.forms[0] == {"len", "lent", "lena"}
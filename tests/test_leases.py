@@ -0,0 +1,91 @@
+import os
+import tempfile
+from typing import Dict
+from unittest import TestCase
+
+from modules.leases import LeaseTable
+
+
+class TestLeaseTable(TestCase):
+    def test_leases(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "leases.sqlite")
+            first, second = LeaseTable(path), LeaseTable(path)
+            assert first.create_ranges(0, 250, size=100) == 3
+            # a second worker does not create the ranges again
+            assert second.create_ranges(0, 250, size=100) == 3
+            assert first.acquire("a") == (0, 100)
+            assert second.acquire("b") == (100, 200)
+            # the lease of c expires at once as if c crashed
+            assert first.acquire("c", seconds=-1) == (200, 250)
+            assert second.acquire("b") == (200, 250)
+            assert not first.renew(200, "c")
+            assert first.complete(0, "a")
+            assert second.progress() == {"ranges": 3, "done": 1, "leased": 2, "free": 0}
+            assert first.acquire("a") is None
+            # a range with timeouts returns to the pool undone
+            assert second.release(100, "b", delay=-1)
+            assert first.acquire("a") == (100, 200)
+            assert not second.complete(100, "b")
+            first.close()
+            second.close()
+
+
+def record_pages(directory: str, statuses: Dict[str, int]) -> str:
+    """Write a word list with the ids and store their responses for replay, returns the path of the list"""
+    from modules.recorder import ResponseStore, request_key
+    csv_file = os.path.join(directory, "so.csv")
+    with open(csv_file, "w", encoding="UTF-8") as f:
+        f.writelines(f"{id_}\tord\n" for id_ in statuses)
+    store = ResponseStore(os.path.join(directory, "http.sqlite"))
+    for id_, status in statuses.items():
+        url = f"https://svenska.se/so/?id={id_}"
+        store.put(request_key("GET", url, b""), "GET", url, status, {},
+                  f"<div itemprop='articleBody'>{id_}</div>".encode())
+    store.close()
+    return csv_file
+
+
+class TestCrawlLeased(TestCase):
+    def test_missing_pages_and_waiting_for_other_workers(self):
+        from modules import recorder
+        from modules.pages import PageStore
+        from scrape_data import crawl_leased
+        with tempfile.TemporaryDirectory() as directory:
+            csv_file = record_pages(directory, {"1": 200, "2": 200, "3": 404, "4": 200})
+            lease_table = os.path.join(directory, "leases.sqlite")
+            other = LeaseTable(lease_table)
+            other.create_ranges(0, 4, size=2)
+            # the other worker crashes with the first range
+            assert other.acquire("b", seconds=0.2) == (0, 2)
+            recorder.configure("replay", os.path.join(directory, "http.sqlite"))
+            try:
+                crawl_leased(lease_table=lease_table, worker="a", csv_file=csv_file,
+                             html_directory=os.path.join(directory, "html"), range_size=2, retry_seconds=0.1)
+            finally:
+                recorder.configure("live")
+            # the range with the missing page is done and the range of b was taken over
+            assert other.progress() == {"ranges": 2, "done": 2, "leased": 0, "free": 0}
+            pages = PageStore(os.path.join(directory, "html"))
+            assert [id_ in pages for id_ in ("1", "2", "3", "4")] == [True, True, False, True]
+            other.close()
+
+
+class TestCrawl(TestCase):
+    def test_crawl_stops_at_stop(self):
+        from modules import recorder
+        from modules.pages import PageStore
+        from scrape_data import crawl
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as directory:
+            csv_file = record_pages(directory, {str(number): 200 for number in range(1, 131)})
+            os.chdir(directory)
+            recorder.configure("replay", os.path.join(directory, "http.sqlite"))
+            try:
+                crawl(start=0, stop=110, csv_file=csv_file)
+                pages = PageStore()
+                # the last batch ends at stop and not after 100 more identifiers
+                assert [str(number) in pages for number in (1, 110, 111, 130)] == [True, True, False, False]
+            finally:
+                recorder.configure("live")
+                os.chdir(cwd)
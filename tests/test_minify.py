@@ -0,0 +1,19 @@
+import os
+from unittest import TestCase
+
+from models.extractor import Extractor
+from modules.minify import minify
+
+test_data = os.path.join(os.path.dirname(os.path.dirname(__file__)), "test_data")
+
+
+class TestMinify(TestCase):
+    def test_extraction_is_unchanged(self):
+        for name in ("test1.html", "test2.html"):
+            with open(os.path.join(test_data, name), "r", encoding="utf-8") as file:
+                html = file.read()
+            minified = minify(html)
+            assert len(minified) < len(html) / 4
+            assert "tracklink" not in minified
+            assert Extractor().extract_page(minified, "1") == Extractor().extract_page(html, "1")
+            assert minify(minified) == minified
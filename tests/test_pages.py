@@ -0,0 +1,37 @@
+import tempfile
+from unittest import TestCase
+
+from modules.pages import PageStore, alias_table, canonical_id, unique_pages
+
+
+class TestPages(TestCase):
+    def test_canonical_id(self):
+        assert canonical_id("167464_1") == "167464"
+        assert canonical_id(100001) == "100001"
+        assert alias_table(["167464_1", "167464", "167464_1", "100001"]) == {
+            "167464": ["167464_1", "167464"], "100001": ["100001"]}
+        assert list(unique_pages(["167464_1", "100001", "167464"])) == ["167464", "100001"]
+
+    def test_page_store(self):
+        with tempfile.TemporaryDirectory() as directory:
+            store = PageStore(directory)
+            assert store.write("1", "<div>rum</div>")
+            # same content under another id is only recorded as an alias
+            assert not store.write("2", "<div>rum</div>")
+            assert store.write("3", "<div>kår</div>")
+            store = PageStore(directory)
+            assert "2" in store and "4" not in store
+            assert store.alias_of("2") == "1"
+            assert store.alias_of("1") is None
+            assert store.read("2") == "<div>rum</div>"
+
+    def test_merge(self):
+        with tempfile.TemporaryDirectory() as first, tempfile.TemporaryDirectory() as second:
+            store, worker = PageStore(first), PageStore(second)
+            store.write("1", "<div>rum</div>")
+            worker.write("1", "<div>rum</div>")
+            worker.write("2", "<div>kår</div>")
+            worker.write("3", "<div>kår</div>")
+            assert store.merge(worker) == 2
+            assert store.read("3") == "<div>kår</div>"
+            assert store.alias_of("3") == "2"
@@ -0,0 +1,74 @@
+import os
+import tempfile
+from unittest import TestCase
+
+from lexso import plan_edits
+from models.join import FormJoin
+from models.plan import EditPlan
+from models.trie import LemmaTrie
+from models.so import SOEntry
+from models.wikidata import Form, Lexeme
+
+
+class TestPlan(TestCase):
+    def test_plan_edits(self):
+        dictionary_data = {
+            "absolut": [SOEntry(id="100095_1", lemma="absolut", lexical_category="adj."),
+                        SOEntry(id="100095_2", lemma="absolut", lexical_category="adv.")],
+            "alkoholförbud": [SOEntry(id="100896", lemma="alkoholförbud", lexical_category="")],
+        }
+        lexemes = [
+            Lexeme(id="L3", lemma="absolut", lexical_category="Q380057"),
+            Lexeme(id="L2", lemma="alkoholförbud", lexical_category="Q1084"),
+            Lexeme(id="L10", lemma="xyzzy", lexical_category="Q1084"),
+        ]
+        plan = plan_edits(lexemes=lexemes, dictionary_data=dictionary_data)
+        assert [edit.action for edit in plan.edits] == ["value", "skip", "novalue"]
+        assert plan.edits[0].so_id == "100095_2"
+        assert plan.edits[0].candidates == ["100095_1", "100095_2"]
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "plan.jsonl")
+            plan.write(path)
+            read = EditPlan.read(path)
+        assert [edit.lexeme_id for edit in read.edits] == ["L2", "L3", "L10"]
+        assert len(read.filter(actions=["value"])) == 1
+        assert len(read.filter(actions=["value", "novalue"], lexeme_ids=["L10"])) == 1
+
+    def test_homographs_on_the_same_page(self):
+        join = FormJoin()
+        for so_id, plural in (("118899_1", "filer"), ("118899_2", "filar")):
+            join.add_superlemma({"id_": so_id, "page_id": "118899", "so_id": so_id, "lexical_category": "subst.",
+                                 "lemvar": {"value": "fil", "inflections": [{"values": ["filen", plural]}]}})
+        dictionary_data = {"fil": [SOEntry(id="118899_1", lemma="fil", lexical_category="subst."),
+                                   SOEntry(id="118899_2", lemma="fil", lexical_category="subst.")]}
+        lexeme = Lexeme(id="L1", lemma="fil", lexical_category="Q1084",
+                        forms=[Form(id="L1-F1", representation="filar")])
+        plan = plan_edits(lexemes=[lexeme], dictionary_data=dictionary_data, form_join=join)
+        assert (plan.edits[0].action, plan.edits[0].so_id) == ("value", "118899_2")
+
+    def test_no_decision_falls_back_to_the_senses(self):
+        dictionary_data = {"fil": [SOEntry(id="118899_1", lemma="fil", lexical_category="subst."),
+                                   SOEntry(id="118899_2", lemma="fil", lexical_category="subst.")]}
+        lexeme = Lexeme(id="L1", lemma="fil", lexical_category="Q1084")
+        # no extracted forms for fil
+        plan = plan_edits(lexemes=[lexeme], dictionary_data=dictionary_data, form_join=FormJoin())
+        assert plan.edits[0].action == "skip"
+        assert plan.edits[0].reason == "multiple entries with the same lexical category"
+        plan = plan_edits(lexemes=[lexeme], dictionary_data=dictionary_data, form_join=FormJoin(),
+                          sense_scores={"L1": {"118899_1": 0.1, "118899_2": 0.4}})
+        assert (plan.edits[0].action, plan.edits[0].so_id) == ("value", "118899_2")
+        assert plan.edits[0].reason == "chosen by similarity of glosses and definitions"
+
+    def test_compounds_are_matched_by_their_headword(self):
+        trie = LemmaTrie.build([("honorär", "adj."), ("konsul", "subst."), ("abort", "subst."), ("metod", "subst.")])
+        dictionary_data = {
+            "honorärkonsul": [SOEntry(id="131121", lemma="honorärkonsul", lexical_category="", headword="honorär"),
+                              SOEntry(id="141231", lemma="honorärkonsul", lexical_category="", headword="konsul")],
+            "abortmetod": [SOEntry(id="100070", lemma="abortmetod", lexical_category="", headword="abort")],
+        }
+        lexemes = [Lexeme(id="L1", lemma="honorärkonsul", lexical_category="Q1084"),
+                   Lexeme(id="L2", lemma="abortmetod", lexical_category="Q1084")]
+        plan = plan_edits(lexemes=lexemes, dictionary_data=dictionary_data, lemma_trie=trie)
+        assert (plan.edits[0].action, plan.edits[0].so_id) == ("value", "141231")
+        assert plan.edits[1].action == "skip"
+        assert plan.edits[1].reason == "compound split as abort|metod does not end in its headword abort"
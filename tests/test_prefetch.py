@@ -0,0 +1,32 @@
+from unittest import TestCase
+
+import httpx
+
+from modules.prefetch import EntityPrefetcher, has_claim
+
+
+def mock_api(request: httpx.Request) -> httpx.Response:
+    """Stand-in for wbgetentities where L3 has been deleted and L2 got a P9837 statement"""
+    entities = {}
+    for id_ in request.url.params["ids"].split("|"):
+        if id_ == "L3":
+            entities[id_] = {"id": id_, "missing": ""}
+        else:
+            claims = {"P9837": [{"mainsnak": {"snaktype": "value"}}]} if id_ == "L2" else {}
+            entities[id_] = {"id": id_, "type": "lexeme", "claims": claims}
+    return httpx.Response(200, json={"entities": entities})
+
+
+class TestEntityPrefetcher(TestCase):
+    def test_get(self):
+        ids = [f"L{number}" for number in range(1, 121)]
+        prefetcher = EntityPrefetcher(ids, cache_size=60, api_url="http://localhost/w/api.php",
+                                      client=httpx.Client(transport=httpx.MockTransport(mock_api)))
+        assert prefetcher.get("L1")["id"] == "L1"
+        assert has_claim(prefetcher.get("L2"), "P9837")
+        assert prefetcher.get("L3") is None
+        assert prefetcher.requests == 1
+        for id_ in ids:
+            prefetcher.get(id_)
+        assert prefetcher.requests == 3
+        assert len(prefetcher.cache) == 60
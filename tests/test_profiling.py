@@ -0,0 +1,33 @@
+import os
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+from models.extractor import Extractor
+from modules.profiling import SamplingProfiler, stage_of
+
+test_data = os.path.join(os.path.dirname(os.path.dirname(__file__)), "test_data")
+
+
+class TestProfiling(TestCase):
+    def test_stage_of(self):
+        assert stage_of((("lexso.py", "main"), ("models/extractor.py", "from_soup"),
+                         ("site-packages/bs4/element.py", "find"))) == "from_soup"
+        assert stage_of((("models/extractor.py", "__extract_articles__"), ("site-packages/bs4/__init__.py", "__init__"),
+                         ("site-packages/bs4/builder/_lxml.py", "feed"),
+                         ("site-packages/bs4/element.py", "__init__"))) == "parse"
+        assert stage_of((("lexso.py", "main"),)) == "other"
+
+    def test_profile(self):
+        with open(os.path.join(test_data, "test1.html"), "r", encoding="utf-8") as file:
+            html = file.read()
+        with SamplingProfiler(interval=0.001) as profiler:
+            for _ in range(50):
+                Extractor().extract_page(html, "1")
+        assert profiler.samples
+        with TemporaryDirectory() as directory:
+            paths = profiler.write(os.path.join(directory, "extract"))
+            with open(paths[0], "r", encoding="utf-8") as f:
+                stack, count = f.readline().rsplit(" ", 1)
+            assert int(count) > 0
+            assert stack.split(";")[0] in {path.split(".")[-2] for path in paths[1:]}
+        assert "parse" in profiler.summary()
@@ -0,0 +1,86 @@
+import asyncio
+import gzip
+import os
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+from jsonlines import jsonlines
+
+import config
+from models.extractor import Extractor
+from modules.pages import PageStore, ProcessedHashes, content_hash
+from scrape_data import Identifier, IdentifierModel
+
+test_data = os.path.join(os.path.dirname(os.path.dirname(__file__)), "test_data")
+
+
+def write_page(directory, page_id, html):
+    with gzip.open(os.path.join(directory, f"{page_id}.html.gz"), "wt", encoding="utf-8") as f:
+        f.write(html)
+
+
+def read(path):
+    if not os.path.exists(path):
+        return []
+    with jsonlines.open(path) as reader:
+        return list(reader)
+
+
+class TestQuarantine(TestCase):
+    def test_quarantine_and_retry(self):
+        with open(os.path.join(test_data, "test1.html"), "r", encoding="utf-8") as file:
+            html = file.read()
+        with TemporaryDirectory() as directory:
+            html_directory = os.path.join(directory, "html")
+            os.makedirs(html_directory)
+            write_page(html_directory, "1", html.replace("snr65554", "snr1"))
+            write_page(html_directory, "2", html.replace("snr65554", "snr2").replace("lemvarhuvud", "x"))
+            with open(os.path.join(html_directory, "3.html.gz"), "wb") as f:
+                f.write(b"not gzip")
+            extractor = Extractor(**{name: os.path.join(directory, f"{name}_{{}}")
+                                     for name in ("articles_jsonl", "superlemmas_jsonl", "idioms_jsonl",
+                                                  "hashes_txt", "quarantine_jsonl")})
+            quarantine = extractor.quarantine_jsonl.format(config.version)
+            superlemmas = extractor.superlemmas_jsonl.format(config.version)
+            extractor.process_and_dump_individual_files(html_directory)
+            entries = sorted(read(quarantine), key=lambda entry: entry["page_id"])
+            assert [(entry["page_id"], entry["article"]) for entry in entries] == [("2", 0), ("3", None)]
+            assert entries[0]["error"] == "ValueError: no lemvarhuvud found"
+            assert "extractor.py" in entries[0]["location"]
+            assert [superlemma["id_"] for superlemma in read(superlemmas)] == ["snr1"]
+
+            write_page(html_directory, "2", html.replace("snr65554", "snr2"))
+            write_page(html_directory, "3", html.replace("snr65554", "snr3"))
+            extractor.retry_quarantined(html_directory)
+            assert read(quarantine) == []
+            assert sorted(superlemma["id_"] for superlemma in read(superlemmas)) == ["snr1", "snr2", "snr3"]
+
+    def test_extract_page(self):
+        extracted = Extractor().extract_page("<div class='artikel so'><div class='superlemma'></div></div>", "4")
+        assert extracted["articles"] == []
+        assert extracted["quarantine"][0]["error"] == "ValueError: id cannot be empty"
+
+    def test_stream_and_retry(self):
+        with open(os.path.join(test_data, "test1.html"), "r", encoding="utf-8") as file:
+            html = file.read()
+        failing = html.replace("snr65554", "snr2").replace("lemvarhuvud", "x")
+        cwd = os.getcwd()
+        with TemporaryDirectory() as directory:
+            os.chdir(directory)
+            try:
+                model = IdentifierModel(identifiers=[Identifier(id_=id_, entry="") for id_ in ("1", "2")])
+                model._store = PageStore("html")
+                model.store.write("1", html.replace("snr65554", "snr1"))
+                model.store.write("2", failing)
+                asyncio.run(model.stream_extract(0, 2, workers=1, sleep=0))
+                extractor = Extractor()
+                superlemmas = extractor.superlemmas_jsonl.format(config.version)
+                assert [superlemma["id_"] for superlemma in read(superlemmas)] == ["snr1"]
+                assert [entry["page_id"] for entry in read(extractor.quarantine_jsonl.format(config.version))] == ["2"]
+
+                model.store.write("2", html.replace("snr65554", "snr2"))
+                extractor.retry_quarantined("html")
+                assert sorted(superlemma["id_"] for superlemma in read(superlemmas)) == ["snr1", "snr2"]
+                assert content_hash(failing) in ProcessedHashes(extractor.hashes_txt.format(config.version))
+            finally:
+                os.chdir(cwd)
@@ -0,0 +1,47 @@
+from unittest import TestCase
+
+from modules.dump import form_record
+from modules.reconcile import FieldIndex, fields, reconcile
+
+
+def record(id_, lemma, so_ids, forms):
+    return {"id": id_, "lemma": lemma, "so_ids": so_ids,
+            "forms": [{"id": f"{id_}-F{number}", "representation": representation, **extra}
+                      for number, (representation, extra) in enumerate(forms, start=1)]}
+
+
+class TestReconcile(TestCase):
+    def test_hyphenation(self):
+        index = FieldIndex(fields["hyphenation"])
+        index.add_superlemma({"value": "honung", "page_id": "1", "hyphenation": "honung·en"})
+        index.add_superlemma({"value": "kår", "page_id": "2", "hyphenation": "kå·ren"})
+        index.add_superlemma({"value": "len", "page_id": "3", "hyphenation": "len·a"})
+        records = [
+            record("L1", "honung", ["1"], [("honung", {}), ("honungen", {})]),
+            record("L2", "kår", ["2_1"], [("kåren", {"statements": {"P5279": ["kår‧en"]}})]),
+            record("L3", "len", ["3"], [("lena", {"statements": {"P5279": ["len·a"]}})]),
+            record("L4", "honung", [], [("honungen", {})]),
+        ]
+        statements = list(reconcile(records, index, planned={"L4": "1"}))
+        assert [(s.entity_id, s.action, s.value) for s in statements] == [
+            ("L1-F2", "add", "honung‧en"),
+            ("L2-F1", "conflict", "kå‧ren"),
+            ("L4-F1", "add", "honung‧en"),
+        ]
+        assert statements[1].current == ["kår‧en"]
+
+    def test_homographs_on_a_page(self):
+        index = FieldIndex(fields["hyphenation"])
+        index.add_superlemma({"value": "fil", "page_id": "100095", "so_id": "100095_1", "hyphenation": "fi·len"})
+        index.add_superlemma({"value": "fil", "page_id": "100095", "so_id": "100095_2", "hyphenation": "fil·en"})
+        assert index.lookup("100095_2", "fil") == ["fil‧en"]
+        # a bare page id does not say which homograph
+        assert index.lookup("100095", "fil") == []
+        records = [record("L1", "fil", ["100095_2"], [("filen", {})])]
+        assert [(s.value, s.so_id) for s in reconcile(records, index)] == [("fil‧en", "100095_2")]
+
+    def test_form_record(self):
+        form = {"id": "L1-F1", "representations": {"sv": {"value": "honungen"}},
+                "claims": {"P5279": [{"mainsnak": {"snaktype": "value",
+                                                   "datavalue": {"value": "honung‧en"}}}]}}
+        assert form_record(form)["statements"] == {"P5279": ["honung‧en"]}
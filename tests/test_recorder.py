@@ -0,0 +1,53 @@
+import asyncio
+import os
+import tempfile
+from unittest import TestCase
+
+import httpx
+
+from benchmark import StandIn, synthetic_data
+from modules import recorder
+from modules.recorder import AsyncRecordingTransport, NotRecordedError, RecordingTransport, ResponseStore
+
+
+def so_page(request: httpx.Request) -> httpx.Response:
+    return httpx.Response(200, text=f"<div itemprop='articleBody'>{request.url.params['id']}</div>")
+
+
+class TestRecorder(TestCase):
+    def test_httpx(self):
+        with tempfile.TemporaryDirectory() as directory:
+            store = ResponseStore(os.path.join(directory, "http.sqlite"))
+            url = "https://svenska.se/so/?id=146010"
+            with httpx.Client(transport=RecordingTransport(httpx.MockTransport(so_page), store, "record")) as client:
+                assert "146010" in client.get(url).text
+            assert len(store) == 1
+
+            def offline(request):
+                raise AssertionError("replay must not reach the network")
+            with httpx.Client(transport=RecordingTransport(httpx.MockTransport(offline), store, "replay")) as client:
+                assert "146010" in client.get(url).text
+                with self.assertRaises(NotRecordedError):
+                    client.get("https://svenska.se/so/?id=1")
+
+            async def replay():
+                transport = AsyncRecordingTransport(httpx.MockTransport(offline), store, "replay")
+                async with httpx.AsyncClient(transport=transport) as client:
+                    return (await client.get(url)).text
+            assert "146010" in asyncio.run(replay())
+
+    def test_requests(self):
+        import requests
+        bindings, _ = synthetic_data(10)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "http.sqlite")
+            try:
+                with StandIn(bindings) as stand_in:
+                    recorder.configure("record", path)
+                    sparql = f"{stand_in.url}/sparql"
+                    recorded = requests.post(sparql, data={"query": "select * limit 5 offset 0"}).json()
+                recorder.configure("replay", path)
+                assert requests.post(sparql, data={"query": "select * limit 5 offset 0"}).json() == recorded
+                assert len(recorded["results"]["bindings"]) == 5
+            finally:
+                recorder.configure("live")
@@ -0,0 +1,34 @@
+import tempfile
+from unittest import TestCase
+
+from models.search import IdiomIndex, tokenize
+
+documents = [
+    {"id": "inr907973", "type": "idiom", "value": "len som en barn­rumpa/persika",
+     "definition": "mycket len", "example": "efter rakningen var han len som en barn­rumpa om hakan"},
+    {"id": "inr908304", "type": "idiom", "value": "len som honung", "definition": "", "example": ""},
+    {"id": "kcnr513278", "type": "kernel", "value": "ett sött, tjock­flytande ämne som bina framställer",
+     "lemma": "honung"},
+]
+
+
+class TestIdiomIndex(TestCase):
+    def test_tokenize(self):
+        assert tokenize("Len som en barn­rumpa/persika") == ["len", "som", "en", "barnrumpa", "persika"]
+
+    def test_search(self):
+        with tempfile.TemporaryDirectory() as directory:
+            IdiomIndex.build(documents, directory=directory)
+            index = IdiomIndex(directory)
+            assert [d["id"] for d in index.search("len som")] == ["inr907973", "inr908304"]
+            assert [d["id"] for d in index.search("som len", phrase=True)] == []
+            assert [d["id"] for d in index.search("len som honung", phrase=True)] == ["inr908304"]
+            # phrases don't match across fields
+            assert index.search("persika mycket", phrase=True) == []
+            # the second word of a phrase can't be the first word of a document
+            assert index.search("honung len", phrase=True) == []
+            with self.assertRaises(ValueError):
+                index.search(" ".join(["len"] * 17), phrase=True)
+            assert [d["id"] for d in index.search("tjockflyt", prefix=True)] == ["kcnr513278"]
+            assert index.prefix_terms("b") == ["barnrumpa", "bina"]
+            assert index.search("saknas") == []
@@ -0,0 +1,33 @@
+from unittest import TestCase
+
+import numpy as np
+
+from models.senses import SenseAlignment, pair_cosines, tfidf
+
+
+def superlemma(so_id, lemma, kernels):
+    return {"value": lemma, "page_id": so_id.split("_")[0], "so_id": so_id,
+            "lexem": {"kernels": [{"id_": f"kcnr{so_id[-1]}{n}", "value": kernel} for n, kernel in enumerate(kernels)]}}
+
+
+class TestSenseAlignment(TestCase):
+    def test_pair_cosines(self):
+        offsets, terms, weights = tfidf([["sött", "ämne"], ["sött", "ämne"], ["fågel"]])
+        cosines = pair_cosines(offsets, terms, weights, np.array([0, 0]), np.array([1, 2]))
+        assert np.allclose(cosines, [1.0, 0.0])
+
+    def test_entry_scores(self):
+        alignment = SenseAlignment()
+        # homographs on the same page
+        alignment.add_superlemma(superlemma("118899_1", "fil", ["körfält på en väg"]))
+        alignment.add_superlemma(superlemma("118899_2", "fil",
+                                            ["verktyg av stål för att fila", "ett slags filmjölk"]))
+        alignment.add_lexeme({"id": "L1", "lemma": "fil", "glosses": [
+            {"id": "L1-S1", "gloss": "verktyg av härdat stål"}]})
+        alignment.add_lexeme({"id": "L2", "lemma": "fil", "glosses": [
+            {"id": "L2-S1", "gloss": "körfält på en väg eller gata"}]})
+        scores = alignment.entry_scores()
+        assert scores["L1"]["118899_2"] > scores["L1"].get("118899_1", 0.0)
+        assert scores["L2"]["118899_1"] > scores["L2"].get("118899_2", 0.0)
+        top = alignment.top(k=1)
+        assert [(line["sense_id"], line["kernel_id"]) for line in top] == [("L1-S1", "kcnr20"), ("L2-S1", "kcnr10")]
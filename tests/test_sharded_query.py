@@ -0,0 +1,55 @@
+import re
+from unittest import TestCase
+
+import httpx
+
+from modules.sharded_query import QueryTimeout, ShardedQuery
+
+query = "select ?lexemeId ?lemma WHERE { ?lexemeId wikibase:lemma ?lemma. {shard} }"
+
+
+def binding(number):
+    return {"lexemeId": {"type": "uri", "value": f"http://www.wikidata.org/entity/L{number}"},
+            "lemma": {"type": "literal", "value": f"ord{number}"}}
+
+
+def stand_in(max_rows, highest=999):
+    """WDQS with lexemes L1 to L999 that times out when a range has more than max_rows of them,
+    the MAX query answers highest as if lexemes were created after it"""
+    def handle(request: httpx.Request) -> httpx.Response:
+        text = httpx.QueryParams(request.content.decode("utf-8"))["query"]
+        if "MAX(" in text:
+            return httpx.Response(200, json={"head": {"vars": ["highest"]}, "results": {"bindings": [
+                {"highest": {"type": "literal", "value": str(highest)}}]}})
+        low, high = re.search(r">= (\d+)(?: && .* < (\d+))?\)", text).groups()
+        numbers = range(max(int(low), 1), min(int(high or 1000), 1000))
+        if len(numbers) > max_rows:
+            return httpx.Response(500, text="java.util.concurrent.TimeoutException")
+        # L5 has two lemmas so WDQS returns it twice
+        bindings = [binding(number) for number in numbers] + ([binding(5)] if 5 in numbers else [])
+        return httpx.Response(200, json={"head": {"vars": ["lexemeId", "lemma"]},
+                                         "results": {"bindings": bindings}})
+    return httpx.AsyncClient(transport=httpx.MockTransport(handle))
+
+
+class TestShardedQuery(TestCase):
+    def test_split_on_timeout(self):
+        sharded = ShardedQuery(query, start=1, stop=2000, shards=4, parallelism=2, min_width=10,
+                               endpoint_url="http://localhost/sparql", client=stand_in(max_rows=200))
+        rows = sharded.rows()
+        assert sorted(int(row["lexemeId"]["value"].rsplit("L", 1)[1]) for row in rows) == list(range(1, 1000))
+        assert sharded.splits > 0
+
+    def test_timeout_at_min_width(self):
+        sharded = ShardedQuery(query, start=1, stop=2000, shards=2, min_width=100,
+                               endpoint_url="http://localhost/sparql", client=stand_in(max_rows=10))
+        with self.assertRaises(QueryTimeout):
+            sharded.rows()
+
+    def test_open_ended(self):
+        # the highest L-id is stale, the last range has no upper bound so L901 to L999 are not dropped
+        sharded = ShardedQuery(query, shards=4, min_width=10, endpoint_url="http://localhost/sparql",
+                               client=stand_in(max_rows=400, highest=900))
+        rows = sharded.rows()
+        assert sorted(int(row["lexemeId"]["value"].rsplit("L", 1)[1]) for row in rows) == list(range(1, 1000))
+        assert sharded.stop == 901
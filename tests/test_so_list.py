@@ -0,0 +1,75 @@
+import asyncio
+import os
+import tempfile
+from unittest import TestCase
+
+import httpx
+
+from get_so_list import WordListEnumerator, diff_ids, parse_response
+
+# Stand-in for the scroll list of admin-ajax.php with 3 words per page, rows as in data/P9837.csv
+words = [("100001", "A", " subst.", "A"), ("100002", "a-", " förled", "a-"), ("100003", "abakus", " subst.", "abakus"),
+         ("105542", "absolutbelopp", "", "belopp"), ("100005", "abborre", " subst.", "abborre")]
+
+
+def link(id_: str, lemma: str, category: str, headword: str) -> str:
+    """The markup of a link in the scroll list, see test_data/test1.html"""
+    last = (f'<span class="wordclass plain">{category}</span>' if category
+            else f'<span class="mdr plain"> ({headword})</span>')
+    return (f'<a class="slank debug_searchfn" href="https://svenska.se/so/?id={id_}&amp;pz=5">'
+            f'<span class="dig plain">   </span><span class="plain">{lemma}</span>{last}'
+            f'<span class="dig plain"></span> </a><br/>')
+
+
+def page(unik: int) -> str:
+    links = "".join(link(*word) for word in words[max(unik - 1, 0):unik + 2])
+    if unik + 2 >= len(words):
+        return links if unik < len(words) else ""
+    return f'{links}<div class="pilned"><a unik="{unik + 2}"></a></div>'
+
+
+def stub(request: httpx.Request) -> httpx.Response:
+    unik = int(dict(pair.split("=") for pair in request.content.decode().split("&"))["unik"])
+    # the first page has no previous link to skip
+    html = page(unik) if unik else '<a class="slank" href="?id=0"></a>' + page(0)
+    return httpx.Response(200, text=html)
+
+
+class TestWordList(TestCase):
+    def enumerate(self, enumerator, max_pages):
+        async def run():
+            async with httpx.AsyncClient(transport=httpx.MockTransport(stub)) as client:
+                await enumerator.enumerate(max_pages=max_pages, client=client)
+        asyncio.run(run())
+
+    def test_enumerate_and_resume(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, "so.csv")
+            self.enumerate(WordListEnumerator(output=output, url_="http://localhost/"), max_pages=1)
+            enumerator = WordListEnumerator(output=output, url_="http://localhost/")
+            self.enumerate(enumerator, max_pages=10)
+            with open(output, encoding="UTF-8") as f:
+                assert f.read().splitlines() == ["\t".join(word) for word in words]
+            assert enumerator.rows == len(words)
+            existing = os.path.join(directory, "P9837.csv")
+            with open(existing, "w", encoding="UTF-8") as f:
+                f.write("100001\tA\tsubst.\tA\n100000\tgammalt\tsubst.\tgammalt\n")
+            assert diff_ids(existing, output) == (["100002", "100003", "100005", "105542"], ["100000"])
+
+    def test_enumerate_again_after_a_complete_run(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, "so.csv")
+            self.enumerate(WordListEnumerator(output=output, url_="http://localhost/"), max_pages=10)
+            assert not os.path.exists(output + ".checkpoint")
+            enumerator = WordListEnumerator(output=output, url_="http://localhost/")
+            self.enumerate(enumerator, max_pages=10)
+            assert enumerator.pages == 3 and enumerator.rows == len(words)
+            with open(output, encoding="UTF-8") as f:
+                assert f.read().splitlines() == ["\t".join(word) for word in words]
+
+    def test_parse_response(self):
+        with open("test_data/test1.html", encoding="utf-8") as f:
+            rows, unik = parse_response(f.read())
+        assert rows[:3] == [["131121", "honorär", " adj.", "honorär"], ["131121", "honorärkonsul", "", "honorär"],
+                            ["141231", "honorärkonsul", "", "konsul"]]
+        assert unik == "131130"
@@ -0,0 +1,45 @@
+import json
+import os
+import random
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+from modules.sort import ShardedJsonl, sort_jsonl, sort_key
+
+
+class TestSort(TestCase):
+    def test_sort_jsonl(self):
+        numbers = list(range(1, 1001))
+        random.Random(1).shuffle(numbers)
+        with TemporaryDirectory() as directory:
+            path = os.path.join(directory, "idioms_1.jsonl")
+            with open(path, "w", encoding="utf-8") as f:
+                for number in numbers:
+                    f.write(json.dumps({"id_": f"inr{number}", "value": "ord" * 10}) + "\n")
+            sorted_directory = os.path.join(directory, "sorted")
+            manifest = sort_jsonl(path, sorted_directory, "idioms", run_size=100,
+                                  shard_bytes=10000, index_every=16)
+            assert len(manifest["shards"]) > 1
+            assert not [file for file in os.listdir(sorted_directory) if file.endswith(".run")]
+            shards = ShardedJsonl(sorted_directory, "idioms")
+            assert [record["id_"] for record in shards] == [f"inr{number}" for number in range(1, 1001)]
+            assert shards.get("inr500") == [{"id_": "inr500", "value": "ord" * 10}]
+            assert shards.get("inr1001") == []
+            assert next(shards.iter_from("inr999"))["id_"] == "inr999"
+            assert sort_key("inr99") < sort_key("inr100")
+
+    def test_superlemmas_by_so_id(self):
+        superlemmas = [{"id_": "snr86634", "page_id": "100095", "so_id": "100095_2"},
+                       {"id_": "snr3", "page_id": "99"},
+                       {"id_": "snr65554", "page_id": "100095", "so_id": "100095_1"}]
+        with TemporaryDirectory() as directory:
+            path = os.path.join(directory, "superlemmas_1.jsonl")
+            with open(path, "w", encoding="utf-8") as f:
+                f.writelines(json.dumps(superlemma) + "\n" for superlemma in superlemmas)
+            sorted_directory = os.path.join(directory, "sorted")
+            assert sort_jsonl(path, sorted_directory, "superlemmas")["field"] == "so_id"
+            shards = ShardedJsonl(sorted_directory, "superlemmas")
+            assert [record["id_"] for record in shards] == ["snr3", "snr65554", "snr86634"]
+            assert [record["id_"] for record in shards.get("100095_2")] == ["snr86634"]
+            # a superlemma dumped without an SO id is found by its page
+            assert [record["id_"] for record in shards.get("99")] == ["snr3"]
@@ -0,0 +1,37 @@
+import tempfile
+from unittest import TestCase
+
+from models.trie import LemmaTrie
+
+lemmas = [
+    ("ingenjör", "subst."),
+    ("kår", "subst."),
+    ("skår", "subst."),
+    ("brandkår", "subst."),
+    ("saxofon", "subst."),
+    ("solo", "subst."),
+    ("lätt-", "förled"),
+    ("springa", "verb"),
+    ("alkoholförbud", ""),
+]
+
+
+class TestLemmaTrie(TestCase):
+    def test_lookup(self):
+        trie = LemmaTrie.build(lemmas)
+        assert trie.lookup("kår") == ["subst."]
+        assert trie.lookup("lätt") == ["förled"]
+        assert "alkoholförbud" not in trie
+        assert trie.with_prefix("kå") == ["kår"]
+        assert sorted(trie.with_suffix("kår")) == ["brandkår", "kår", "skår"]
+        assert trie.suffix_count("kår") == 3
+
+    def test_segment(self):
+        with tempfile.TemporaryDirectory() as directory:
+            LemmaTrie.build(lemmas).save(directory)
+            trie = LemmaTrie.load(directory)
+            assert trie.segment("ingenjörskår") == ["ingenjör", "s", "kår"]
+            assert trie.segment("saxofonsolo") == ["saxofon", "solo"]
+            assert trie.segment("lättspringa") == ["lätt", "springa"]
+            assert trie.segment("okänt") is None
+            assert trie.head("ingenjörskår") == ("kår", ["subst."])